@@ -83,6 +83,16 @@ with app.app_context(): # Asegurarse de que se ejecuta en el contexto de la apli
     init_encuestas_db()
     print("APP: init_encuestas_db() finalizado.")
 
+    # Índices de búsqueda y listados de documentos (tablas creadas antes de existir)
+    from db.bienestar.documentos.setup import ensure_documents_indexes
+    print("APP: Verificando índices de documentos")
+    ensure_documents_indexes()
+
+    # Esquema de marketing (una vez por proceso) y stock materializado (se reconstruye si está vacío)
+    from db.marketing.stock_ledger import init_stock_ledger
+    print("APP: Verificando esquema y stock materializado de marketing")
+    init_stock_ledger()
+
     # Inicializar el módulo PDF (crear directorios y el procesador)
     # print("APP: Llamando a init_pdf_module()") # COMENTADO: Inicialización del sistema local
     # init_pdf_module(app) # COMENTADO: Inicialización del sistema local
@@ -95,6 +105,12 @@ with app.app_context(): # Asegurarse de que se ejecuta en el contexto de la apli
     init_pdf_s3_db()
     print("APP: init_pdf_s3_db() finalizado.")
 
+    # Tabla de la cola de trabajos de procesamiento de PDFs
+    from db.pdf_manager.jobs import init_pdf_jobs_db
+    print("APP: Llamando a init_pdf_jobs_db()")
+    init_pdf_jobs_db()
+    print("APP: init_pdf_jobs_db() finalizado.")
+
 # Authentication routes
 @app.route('/api/auth/login', methods=['POST'])
 def login():
@@ -246,6 +262,14 @@ def verify_table():
     tabla_info = verificar_tabla_usuarios()
     return jsonify(tabla_info)
 
+@app.route('/api/verify/db-pool', methods=['GET'])
+def verify_db_pool():
+    """
+    Endpoint para consultar las estadísticas del pool de conexiones MySQL
+    (hits, misses, esperas, conexiones en uso/inactivas). Útil para diagnóstico.
+    """
+    return jsonify(MySQLConnection.pool_stats())
+
 @app.route('/api/usuarios', methods=['GET'])
 def list_usuarios():
     """
@@ -0,0 +1,312 @@
+"""
+Descarga y previsualización de documentos.
+
+Sirve el archivo físico de un documento sin cargarlo entero en memoria del worker:
+- Archivos locales (legacy): send_file con wsgi.file_wrapper (sendfile en gunicorn).
+- Objetos de S3, descarga completa (GET sin Range ni condiciones): redirect a
+  una URL firmada de corta duración. El único worker sync de gunicorn no queda
+  ocupado mientras un cliente lento descarga el archivo.
+- Objetos de S3 con Range o GET condicional: GetObject reenviado por bloques.
+
+Se soporta Range (206, un solo rango), GET condicional
+(If-None-Match / If-Modified-Since -> 304) e If-Range, de modo que el
+visor abre PDFs/XLSX grandes por partes y las descargas se pueden reanudar.
+"""
+
+import os
+import logging
+import unicodedata
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlparse, unquote, quote
+
+from botocore.exceptions import ClientError
+from flask import Response, redirect, request, send_file
+from werkzeug.security import safe_join
+
+from utils.upload_utils import upload_manager, UploadType
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+DOWNLOAD_CONFIG = {
+    # Tamaño de cada bloque leído de S3 y escrito al cliente
+    'chunk_size': int(os.getenv('DOCUMENT_DOWNLOAD_CHUNK_KB', 256)) * 1024,
+    # Validez de la URL firmada a la que se redirigen las descargas completas
+    'redirect_ttl': int(os.getenv('DOCUMENT_DOWNLOAD_URL_TTL', 300)),
+    # Directorios donde pueden quedar archivos subidos antes de la migración a S3
+    'local_dirs': [
+        os.path.join(_BACKEND_DIR, 'uploads', 'documentos'),
+        os.path.join(_BACKEND_DIR, 'uploads'),
+        os.path.join(_BACKEND_DIR, '..', 'frontend', 'public', 'uploads'),
+    ],
+}
+
+
+@dataclass
+class ArchivoDocumento:
+    """Ubicación física del archivo de un documento: ruta local o key de S3"""
+    local_path: Optional[str] = None
+    s3_key: Optional[str] = None
+
+
+# ==========================================
+# RESOLUCIÓN DE LA UBICACIÓN
+# ==========================================
+
+def buscar_archivo_local(nombre: str) -> Optional[str]:
+    """Ruta del archivo en los directorios legacy (None si no existe o sale del directorio)"""
+    if not nombre:
+        return None
+    for directorio in DOWNLOAD_CONFIG['local_dirs']:
+        ruta = safe_join(os.path.normpath(directorio), nombre)
+        if ruta and os.path.isfile(ruta):
+            return ruta
+    return None
+
+
+def s3_key_desde_ruta(ruta: str) -> Optional[str]:
+    """
+    Key de S3 a partir de la ruta guardada en BD:
+    s3://bucket/key, https://bucket.s3.<region>.amazonaws.com/key
+    o https://s3.<region>.amazonaws.com/bucket/key
+    """
+    if not ruta:
+        return None
+    bucket = upload_manager.bucket_name
+    url = urlparse(ruta)
+    path = unquote(url.path).lstrip('/')
+
+    if url.scheme == 's3':
+        return path if url.netloc == bucket and path else None
+    if url.scheme not in ('http', 'https') or not url.netloc.endswith('amazonaws.com'):
+        return None
+    if url.netloc.startswith(f"{bucket}.s3"):
+        return path or None
+    if url.netloc.startswith('s3.') and path.startswith(f"{bucket}/"):
+        return path[len(bucket) + 1:] or None
+    return None
+
+
+def resolver_archivo(ruta_archivo: Optional[str], nombre_archivo: Optional[str] = None) -> Optional[ArchivoDocumento]:
+    """Ubicación del archivo de un documento según ruta_archivo/nombre_archivo de BD"""
+    s3_key = s3_key_desde_ruta(ruta_archivo or '')
+    if s3_key:
+        return ArchivoDocumento(s3_key=s3_key)
+
+    # Archivos legacy: '/uploads/<archivo>' o solo el nombre físico
+    for nombre in (os.path.basename(ruta_archivo or ''), nombre_archivo):
+        local_path = buscar_archivo_local(nombre)
+        if local_path:
+            return ArchivoDocumento(local_path=local_path)
+    return None
+
+
+def resolver_nombre_archivo(nombre: str) -> ArchivoDocumento:
+    """Ubicación de un archivo pedido por nombre (ruta /files): local si existe, si no S3"""
+    local_path = buscar_archivo_local(nombre)
+    if local_path:
+        return ArchivoDocumento(local_path=local_path)
+    return ArchivoDocumento(s3_key=f"{UploadType.DOCUMENTOS.value}/{upload_manager.sanitize_filename(nombre)}")
+
+
+# ==========================================
+# RESPUESTAS
+# ==========================================
+
+def enviar_archivo(archivo: ArchivoDocumento, download_name: Optional[str] = None,
+                   mimetype: Optional[str] = None, as_attachment: bool = False) -> Optional[Response]:
+    """
+    Respuesta HTTP con el archivo (200, 206, 302, 304 o 416 según la petición).
+    Devuelve None si el archivo no existe.
+    """
+    if archivo.local_path:
+        response = send_file(
+            archivo.local_path,
+            mimetype=mimetype or None,
+            as_attachment=as_attachment,
+            download_name=download_name or os.path.basename(archivo.local_path),
+            conditional=True,
+            etag=True
+        )
+    elif _es_descarga_completa():
+        response = _redirigir_objeto_s3(archivo.s3_key, download_name, mimetype, as_attachment)
+        if response is None:
+            return None
+        # La URL firmada caduca: no guardar el redirect
+        response.cache_control.private = True
+        response.cache_control.no_store = True
+        return response
+    else:
+        response = _enviar_objeto_s3(archivo.s3_key, download_name, mimetype, as_attachment)
+        if response is None:
+            return None
+
+    # El documento requiere permisos: nada de cachés compartidas, pero sí revalidación (304)
+    response.cache_control.public = False
+    response.cache_control.max_age = None
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def es_descarga_nueva(response: Response) -> bool:
+    """
+    True si la respuesta inicia una descarga: 200, redirect a S3 o el primer
+    rango (bytes 0-). Los rangos siguientes del visor, las reanudaciones y los
+    304 no cuentan.
+    """
+    if request.method == 'HEAD':
+        return False
+    if response.status_code in (200, 302):
+        return True
+    return response.status_code == 206 and response.headers.get('Content-Range', '').startswith('bytes 0-')
+
+
+def _es_descarga_completa() -> bool:
+    """GET del archivo entero, sin Range ni condiciones que evaluar"""
+    return (
+        request.method == 'GET'
+        and request.range is None
+        and not request.headers.get('If-None-Match')
+        and request.if_modified_since is None
+    )
+
+
+def _redirigir_objeto_s3(s3_key: str, download_name: Optional[str], mimetype: Optional[str],
+                         as_attachment: bool) -> Optional[Response]:
+    """Redirect a una URL firmada con el mismo nombre y tipo que tendría la respuesta reenviada"""
+    client = upload_manager.s3_client
+    params = {'Bucket': upload_manager.bucket_name, 'Key': s3_key}
+    try:
+        # HEAD: un archivo que no existe sigue siendo un 404 de la API, no un error XML de S3
+        objeto = client.head_object(**params)
+        params['ResponseContentType'] = mimetype or objeto.get('ContentType') or 'application/octet-stream'
+        params['ResponseContentDisposition'] = _content_disposition(
+            download_name or os.path.basename(s3_key), as_attachment
+        )
+        url = client.generate_presigned_url(
+            'get_object', Params=params, ExpiresIn=DOWNLOAD_CONFIG['redirect_ttl']
+        )
+    except ClientError as e:
+        return _error_s3(e, s3_key)
+    return redirect(url, code=302)
+
+
+def _enviar_objeto_s3(s3_key: str, download_name: Optional[str], mimetype: Optional[str],
+                      as_attachment: bool) -> Optional[Response]:
+    client = upload_manager.s3_client
+    params = {'Bucket': upload_manager.bucket_name, 'Key': s3_key}
+    params.update(_condiciones_s3())
+
+    rango = request.range
+    con_rango = rango is not None and rango.units == 'bytes' and len(rango.ranges) == 1
+    if con_rango:
+        # Varios rangos en una petición (multipart/byteranges) se sirven como 200 completo
+        params['Range'] = rango.to_header()
+        params.update(_condicion_if_range())
+
+    operacion = client.head_object if request.method == 'HEAD' else client.get_object
+    try:
+        objeto = operacion(**params)
+    except ClientError as e:
+        estado = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        codigo = e.response.get('Error', {}).get('Code')
+        if estado == 304:
+            cabeceras = e.response['ResponseMetadata'].get('HTTPHeaders', {})
+            response = Response(status=304)
+            for cabecera in ('etag', 'last-modified'):
+                if cabecera in cabeceras:
+                    response.headers[cabecera] = cabeceras[cabecera]
+            return response
+        if estado == 412 and con_rango:
+            # If-Range no coincide: el archivo cambió, se envía completo
+            for clave in ('Range', 'IfMatch', 'IfUnmodifiedSince'):
+                params.pop(clave, None)
+            try:
+                objeto = operacion(**params)
+            except ClientError as e2:
+                return _error_s3(e2, s3_key)
+        elif codigo == 'InvalidRange' or estado == 416:
+            return _rango_no_satisfacible(s3_key)
+        else:
+            return _error_s3(e, s3_key)
+
+    response = Response(
+        _leer_por_bloques(objeto.get('Body')),
+        status=206 if objeto.get('ContentRange') else 200,
+        mimetype=mimetype or objeto.get('ContentType') or 'application/octet-stream',
+        direct_passthrough=True
+    )
+    response.headers['Content-Length'] = str(objeto.get('ContentLength', 0))
+    if objeto.get('ContentRange'):
+        response.headers['Content-Range'] = objeto['ContentRange']
+    if objeto.get('ETag'):
+        response.headers['ETag'] = objeto['ETag']
+    if objeto.get('LastModified'):
+        response.last_modified = objeto['LastModified']
+    response.headers['Content-Disposition'] = _content_disposition(
+        download_name or os.path.basename(s3_key), as_attachment
+    )
+    if objeto.get('Body') is not None:
+        response.call_on_close(objeto['Body'].close)
+    return response
+
+
+def _condiciones_s3() -> dict:
+    """If-None-Match / If-Modified-Since del cliente, evaluados por S3"""
+    condiciones = {}
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        condiciones['IfNoneMatch'] = if_none_match
+    elif request.if_modified_since:
+        condiciones['IfModifiedSince'] = request.if_modified_since
+    return condiciones
+
+
+def _condicion_if_range() -> dict:
+    """If-Range: el rango solo vale si el objeto no cambió (S3 responde 412 si cambió)"""
+    if_range = request.if_range
+    if if_range.etag:
+        return {'IfMatch': f'"{if_range.etag}"'}
+    if if_range.date:
+        return {'IfUnmodifiedSince': if_range.date}
+    return {}
+
+
+def _leer_por_bloques(body):
+    if body is None:
+        return
+    for bloque in body.iter_chunks(DOWNLOAD_CONFIG['chunk_size']):
+        yield bloque
+
+
+def _rango_no_satisfacible(s3_key: str) -> Response:
+    response = Response(status=416)
+    try:
+        cabecera = upload_manager.s3_client.head_object(Bucket=upload_manager.bucket_name, Key=s3_key)
+        response.headers['Content-Range'] = f"bytes */{cabecera['ContentLength']}"
+    except ClientError:
+        pass
+    return response
+
+
+def _error_s3(error: ClientError, s3_key: str) -> Optional[Response]:
+    estado = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    if estado in (403, 404):
+        logger.warning(f"Archivo no encontrado en S3: {s3_key}")
+        return None
+    raise error
+
+
+def _content_disposition(nombre: str, as_attachment: bool) -> str:
+    """Content-Disposition con nombre ASCII de respaldo y nombre UTF-8 (RFC 6266)"""
+    tipo = 'attachment' if as_attachment else 'inline'
+    ascii_nombre = unicodedata.normalize('NFKD', nombre).encode('ascii', 'ignore').decode('ascii')
+    ascii_nombre = ascii_nombre.replace('\\', '_').replace('"', '_') or 'archivo'
+    if ascii_nombre == nombre:
+        return f'{tipo}; filename="{nombre}"'
+    return f"{tipo}; filename=\"{ascii_nombre}\"; filename*=UTF-8''{quote(nombre, safe='')}"
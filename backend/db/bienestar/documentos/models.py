@@ -7,6 +7,7 @@ from datetime import datetime
 from typing import List, Dict, Optional, Union
 from ...mysql_connection import MySQLConnection
 from .queries import *
+from .search import build_search
 
 
 class DocumentCategory:
@@ -383,9 +384,12 @@ class Document:
             List[Dict]: Lista de documentos encontrados
         """
         try:
-            search_pattern = f"%{search_term}%"
-            query = SEARCH_DOCUMENTS
-            params = [search_pattern, search_pattern, search_pattern]
+            # Texto completo (ver search.py); sin palabras buscables no hay resultados
+            search = build_search(search_term)
+            if not search:
+                return []
+            query = SEARCH_DOCUMENTS.format(search_score=search.score, search_where=search.where)
+            params = search.score_params + search.where_params
             
             if limit:
                 query += " LIMIT %s OFFSET %s"
@@ -609,11 +613,13 @@ class Document:
             query = SEARCH_DOCUMENTS_WITH_FILTERS
             params = []
             
-            # Agregar filtros dinámicamente
-            if search_term:
-                query += " AND (d.titulo LIKE %s OR d.descripcion LIKE %s OR e.nombre LIKE %s)"
-                search_pattern = f"%{search_term}%"
-                params.extend([search_pattern, search_pattern, search_pattern])
+            # Agregar filtros dinámicamente (texto completo, ver search.py)
+            search = build_search(search_term)
+            if search:
+                query = query.replace("SELECT DISTINCT d.*,", f"SELECT DISTINCT d.*, {search.score} AS relevance_score,", 1)
+                params.extend(search.score_params)
+                query += f" AND {search.where}"
+                params.extend(search.where_params)
             
             if categoria_id:
                 query += " AND d.categoria_id = %s"
@@ -628,7 +634,10 @@ class Document:
                 query += f" AND de.etiqueta_id IN ({placeholders})"
                 params.extend(tag_ids)
             
-            query += " ORDER BY d.created_at DESC"
+            if search:
+                query += " ORDER BY relevance_score DESC, d.created_at DESC"
+            else:
+                query += " ORDER BY d.created_at DESC"
             
             if limit:
                 query += " LIMIT %s OFFSET %s"
@@ -0,0 +1,93 @@
+"""
+Paginación de listados de documentos.
+
+- El total se obtiene con COUNT(DISTINCT d.id) (sin traer filas) y se cachea
+  unos segundos por combinación de filtros; las escrituras lo invalidan.
+- Además de page/offset, los listados ordenados por fecha aceptan un cursor
+  opaco sobre (created_at, id); ver db.keyset.
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+from ... import keyset
+from ...cache import TTLCache
+from ...mysql_connection import MySQLConnection
+
+
+PAGINATION_CONFIG = {
+    'count_ttl': int(os.getenv('DOCUMENT_COUNT_CACHE_TTL', 30)),
+    'count_cache_size': int(os.getenv('DOCUMENT_COUNT_CACHE_SIZE', 512)),
+}
+
+# Índices de los listados (tabla, nombre, columnas); ver setup.ensure_documents_indexes
+LISTING_INDEXES = [
+    ('documentos', 'idx_documentos_estado_fecha', 'estado, created_at, id'),
+]
+
+# Total de resultados por (FROM, WHERE, parámetros)
+document_counts = TTLCache(
+    ttl=PAGINATION_CONFIG['count_ttl'],
+    maxsize=PAGINATION_CONFIG['count_cache_size'],
+    name='documentos_count'
+)
+
+
+def count_documents(db_ops: MySQLConnection, from_sql: str, where_sql: str, params: List) -> int:
+    """
+    Número de documentos distintos que cumplen los filtros.
+
+    Args:
+        from_sql: cláusula FROM con alias d para documentos (solo los JOIN que usan los filtros)
+        where_sql: cláusula WHERE (puede estar vacía)
+        params: parámetros de where_sql
+    """
+    def cargar():
+        result = db_ops.execute_query(
+            f"SELECT COUNT(DISTINCT d.id) AS total {from_sql} {where_sql}",
+            tuple(params)
+        )
+        return int(result[0]['total']) if result else None
+
+    total = document_counts.get_or_load((from_sql, where_sql, tuple(params)), cargar)
+    return total or 0
+
+
+def invalidate_counts():
+    """Descarta los totales cacheados (llamar tras crear, editar o eliminar documentos)"""
+    document_counts.invalidate()
+
+
+# ==========================================
+# CURSOR (created_at, id)
+# ==========================================
+
+def encode_cursor(row: Dict) -> str:
+    """Cursor que apunta justo después del documento `row`"""
+    return keyset.encode_cursor(row['created_at'], row['id'])
+
+
+def keyset_condition(cursor: str, descending: bool = True, alias: str = 'd') -> Tuple[str, List]:
+    """Condición WHERE sobre {alias}.created_at, {alias}.id; ver db.keyset"""
+    return keyset.keyset_condition(cursor, f"{alias}.created_at", f"{alias}.id", descending)
+
+
+def pagination_info(total: int, page: int, limit: int, rows: List[Dict],
+                    cursor_enabled: bool = False, has_more: Optional[bool] = None) -> Dict:
+    """
+    Bloque 'pagination' de la respuesta.
+
+    Args:
+        cursor_enabled: el listado está ordenado por (created_at, id) y admite cursor
+        has_more: con cursor, si se leyó una fila más que el límite (None con page/offset)
+    """
+    has_next = page * limit < total if has_more is None else has_more
+    return {
+        'total': total,
+        'page': page,
+        'limit': limit,
+        'pages': (total + limit - 1) // limit if total > 0 else 1,
+        'has_next': has_next,
+        'has_prev': page > 1,
+        'next_cursor': encode_cursor(rows[-1]) if cursor_enabled and has_next and rows else None
+    }
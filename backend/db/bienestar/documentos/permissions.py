@@ -74,10 +74,18 @@ ROLE_PERMISSIONS = {
 def get_user_from_token():
     """
     Extrae y valida el usuario desde el token JWT en la request.
+    El token verificado y el usuario se cachean en login (ver verificar_token y
+    obtener_usuario_por_id); dentro de la misma request se resuelve una sola vez.
     
     Returns:
         dict/None: Información del usuario si el token es válido, None si no
     """
+    if 'auth_user' in g:
+        return g.auth_user
+    g.auth_user = _resolver_usuario()
+    return g.auth_user
+
+def _resolver_usuario():
     try:
         # Obtener token del header Authorization
         auth_header = request.headers.get('Authorization')
@@ -26,7 +26,8 @@ CREATE TABLE IF NOT EXISTS etiquetas_documentos (
   nombre VARCHAR(50) NOT NULL UNIQUE,
   color VARCHAR(7) NOT NULL DEFAULT '#2e3954',
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  FULLTEXT KEY ft_etiquetas_nombre (nombre)
 );
 """
 
@@ -49,7 +50,10 @@ CREATE TABLE IF NOT EXISTS documentos (
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   FOREIGN KEY (categoria_id) REFERENCES categorias_documentos(id),
-  FOREIGN KEY (subido_por) REFERENCES usuarios(id)
+  FOREIGN KEY (subido_por) REFERENCES usuarios(id),
+  KEY idx_documentos_estado_fecha (estado, created_at, id),
+  FULLTEXT KEY ft_documentos_titulo (titulo),
+  FULLTEXT KEY ft_documentos_titulo_descripcion (titulo, descripcion)
 );
 """
 
@@ -188,15 +192,15 @@ WHERE d.id = %s
 GROUP BY d.id
 """
 
+# Plantilla: search_score y search_where salen de search.build_search
+# (parámetros: score_params y después where_params); las etiquetas se buscan en la propia condición
 SEARCH_DOCUMENTS = """
-SELECT DISTINCT d.*, c.nombre as categoria_nombre, u.nombre as subido_por_nombre 
+SELECT d.*, c.nombre as categoria_nombre, u.nombre as subido_por_nombre, {search_score} AS relevance_score
 FROM documentos d
 JOIN categorias_documentos c ON d.categoria_id = c.id
 JOIN usuarios u ON d.subido_por = u.id
-LEFT JOIN documento_etiquetas de ON d.id = de.documento_id
-LEFT JOIN etiquetas_documentos e ON de.etiqueta_id = e.id
-WHERE (d.titulo LIKE %s OR d.descripcion LIKE %s OR e.nombre LIKE %s)
-ORDER BY d.created_at DESC
+WHERE {search_where}
+ORDER BY relevance_score DESC, d.created_at DESC
 """
 
 SEARCH_DOCUMENTS_WITH_FILTERS = """
@@ -2,7 +2,8 @@ import os
 import uuid
 import logging
 from datetime import datetime
-from flask import request, jsonify, send_from_directory, current_app, abort, redirect
+from flask import request, jsonify, current_app, abort
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 from urllib.parse import unquote
 import shutil
@@ -10,14 +11,19 @@ import shutil
 from . import documentos_bp
 from .models import Document, DocumentCategory, DocumentTag, DocumentAudit
 from .utils import FileValidator, FileManager, DocumentUtils, SearchHelper
+from .search import build_search
+from .pagination import count_documents, invalidate_counts, keyset_condition, pagination_info
+from .suggestions import suggestion_index
+from .downloads import resolver_archivo, resolver_nombre_archivo, enviar_archivo, es_descarga_nueva
 from .queries import (
     GET_ALL_DOCUMENTS, GET_DOCUMENTS_BY_CATEGORY, GET_DOCUMENTS_BY_TAG,
     GET_DOCUMENT_BY_ID, GET_DOCUMENT_WITH_TAGS, SEARCH_DOCUMENTS,
     INSERT_DOCUMENT, UPDATE_DOCUMENT, DELETE_DOCUMENT, UPDATE_DOCUMENT_STATUS,
     GET_ALL_DOCUMENT_CATEGORIES, GET_ALL_TAGS,
-    ADD_TAG_TO_DOCUMENT, LOG_DOCUMENT_ACTION, INCREMENT_DOWNLOADS
+    ADD_TAG_TO_DOCUMENT, LOG_DOCUMENT_ACTION
 )
 from ...mysql_connection import MySQLConnection
+from ...event_sink import event_sink
 from ...login import verificar_token, obtener_usuario_por_id
 from .permissions import require_permission, require_auth, get_current_user, has_permission, get_user_from_token
 
@@ -104,6 +110,65 @@ def copy_file_to_backend(ruta_archivo):
         logger.error(f"❌ Error al copiar archivo: {str(e)}")
         return False
 
+def register_download(documento_id, detalle):
+    """Encola el incremento del contador de descargas y la auditoría de la descarga."""
+    usuario = get_current_user() or {}
+    client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR', '127.0.0.1'))
+    user_agent = request.headers.get('User-Agent', 'Unknown')
+    
+    # Contador y auditoría se escriben por lotes en segundo plano (db/event_sink.py),
+    # fuera del camino de la descarga
+    event_sink.incrementar('documentos', 'descargas', documento_id)
+    event_sink.insertar(
+        LOG_DOCUMENT_ACTION,
+        (
+            documento_id,
+            usuario.get('id', 149),  # usuario_id admin si no hay sesión
+            'download',
+            client_ip,
+            user_agent,
+            detalle
+        )
+    )
+
+def documents_changed(documento_id):
+    """Actualiza los datos derivados de documentos (totales cacheados y sugerencias) tras una escritura."""
+    invalidate_counts()
+    suggestion_index.refresh_document(documento_id)
+
+def assign_tags_to_document(tx, documento_id, etiquetas):
+    """
+    Asigna etiquetas a un documento dentro de una transacción abierta.
+    Descarta IDs no enteros o inexistentes con una sola consulta y crea todas
+    las relaciones en un único executemany.
+    
+    Args:
+        tx (MySQLTransaction): Transacción en curso
+        documento_id (int): ID del documento
+        etiquetas (list): IDs de etiquetas solicitados
+        
+    Returns:
+        int: Número de etiquetas asignadas
+    """
+    etiqueta_ids = list(dict.fromkeys(e for e in (etiquetas or []) if isinstance(e, int)))
+    if not etiqueta_ids:
+        return 0
+    
+    placeholders = ', '.join(['%s'] * len(etiqueta_ids))
+    existentes = tx.execute(
+        f"SELECT id FROM etiquetas_documentos WHERE id IN ({placeholders})",
+        tuple(etiqueta_ids)
+    )
+    ids_validos = [row['id'] for row in existentes]
+    
+    ignoradas = set(etiqueta_ids) - set(ids_validos)
+    if ignoradas:
+        logger.warning(f"Etiquetas inexistentes ignoradas para el documento {documento_id}: {sorted(ignoradas)}")
+    
+    if ids_validos:
+        tx.execute_many(ADD_TAG_TO_DOCUMENT, [(documento_id, etiqueta_id) for etiqueta_id in ids_validos])
+    return len(ids_validos)
+
 # === ENDPOINTS DE DOCUMENTOS ===
 
 @documentos_bp.route('/upload', methods=['POST'])
@@ -233,6 +298,9 @@ def upload_document():
                                 fetch=False
                             )
             
+            # Totales de paginación y sugerencias
+            documents_changed(documento_id)
+            
             # Registrar auditoría
             db_ops.execute_query(
                 LOG_DOCUMENT_ACTION,
@@ -278,6 +346,7 @@ def upload_document():
 def download_document(documento_id):
     """
     Endpoint para descargar documentos.
+    Soporta Range (descargas reanudables) y GET condicional.
     
     Args:
         documento_id (int): ID del documento
@@ -300,51 +369,22 @@ def download_document(documento_id):
         if doc_data['estado'] != 'activo':
             return jsonify({'success': False, 'error': 'Documento no disponible'}), 403
         
-        # Verificar que el archivo existe en el sistema centralizado
-        from ...utils.upload_utils import UploadManager, UploadType
-        
-        # Construir ruta en sistema centralizado usando la ruta_archivo de BD
-        ruta_archivo = doc_data.get('ruta_archivo', '')
-        if ruta_archivo.startswith('/uploads/'):
-            # Es una ruta centralizada, convertir a ruta física
-            filename = os.path.basename(ruta_archivo)
-            file_path = UploadManager.get_upload_path(UploadType.DOCUMENTOS, filename)
-        else:
-            # Fallback a método legacy
-            upload_dir = get_upload_dir()
-            file_path = os.path.join(upload_dir, doc_data['nombre_archivo'])
+        archivo = resolver_archivo(doc_data.get('ruta_archivo'), doc_data.get('nombre_archivo'))
+        response = enviar_archivo(
+            archivo,
+            download_name=doc_data.get('nombre_original') or doc_data.get('nombre_archivo'),
+            mimetype=doc_data.get('tipo_mime'),
+            as_attachment=True
+        ) if archivo else None
         
-        if not os.path.exists(file_path):
+        if response is None:
             return jsonify({'success': False, 'error': 'Archivo no encontrado en el servidor'}), 404
         
-        # Incrementar contador de descargas
-        db_ops.execute_query(
-            "UPDATE documentos SET descargas = descargas + 1 WHERE id = %s",
-            (documento_id,),
-            fetch=False
-        )
-        
-        # Registrar auditoría
-        db_ops.execute_query(
-            LOG_DOCUMENT_ACTION,
-            (
-                documento_id,
-                149,  # usuario_id admin
-                'download',
-                '127.0.0.1',  # ip_address (placeholder)
-                'Sistema',    # user_agent (placeholder)
-                'Documento descargado'
-            ),
-            fetch=False
-        )
+        # Solo cuenta el inicio de una descarga (no cada rango ni las revalidaciones)
+        if es_descarga_nueva(response):
+            register_download(documento_id, 'Documento descargado')
         
-        # Enviar archivo
-        return send_from_directory(
-            upload_dir,
-            doc_data['nombre_archivo'],
-            as_attachment=True,
-            download_name=doc_data['nombre_original']
-        )
+        return response
         
     except Exception as e:
         logger.error(f"Error en download_document: {str(e)}")
@@ -355,6 +395,8 @@ def serve_file(filename):
     """
     Endpoint para servir archivos directamente (para preview/viewer).
     A diferencia de download, este NO fuerza la descarga.
+    Busca primero en los directorios locales legacy y después en S3;
+    soporta Range para que el visor cargue el archivo por partes.
     
     Args:
         filename (str): Nombre del archivo a servir (puede estar URL-encoded)
@@ -366,34 +408,15 @@ def serve_file(filename):
         # Decodificar el nombre del archivo desde URL encoding
         decoded_filename = unquote(filename)
         
-        # Usar sistema centralizado
-        from ...utils.upload_utils import UploadManager, UploadType
-        
-        try:
-            # Primero intentar con sistema centralizado
-            file_path = UploadManager.get_upload_path(UploadType.DOCUMENTOS, decoded_filename)
-            
-            if os.path.exists(file_path):
-                file_dir = os.path.dirname(file_path)
-                file_name = os.path.basename(file_path)
-                logger.info(f"✅ Sirviendo archivo desde sistema centralizado: {file_path}")
-                return send_from_directory(file_dir, file_name, as_attachment=False)
-            
-            # Fallback a sistema legacy
-            upload_dir = get_upload_dir()
-            legacy_file_path = os.path.join(upload_dir, decoded_filename)
-            
-            if os.path.exists(legacy_file_path):
-                logger.info(f"⚠️ Sirviendo archivo desde sistema legacy: {legacy_file_path}")
-                return send_from_directory(upload_dir, decoded_filename, as_attachment=False)
-                
-        except Exception as e:
-            logger.error(f"Error accediendo archivo centralizado: {str(e)}")
+        response = enviar_archivo(resolver_nombre_archivo(decoded_filename), as_attachment=False)
+        if response is not None:
+            return response
         
-        # Si no se encuentra en ningún sistema
         logger.error(f"Archivo no encontrado: {decoded_filename}")
         abort(404)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error en serve_file: {str(e)}")
         abort(500)
@@ -429,9 +452,13 @@ def get_documents():
         documentos = []
         
         if search_term:
-            # Búsqueda por término
-            search_param = f'%{search_term}%'
-            documentos = db_ops.execute_query(SEARCH_DOCUMENTS, (search_param, search_param))
+            # Búsqueda por término (texto completo, ver search.py)
+            search = build_search(search_term)
+            if search:
+                documentos = db_ops.execute_query(
+                    SEARCH_DOCUMENTS.format(search_score=search.score, search_where=search.where),
+                    tuple(search.score_params + search.where_params)
+                )
         elif categoria_id and categoria_id.isdigit():
             # Filtrar por categoría
             documentos = db_ops.execute_query(GET_DOCUMENTS_BY_CATEGORY, (int(categoria_id),))
@@ -585,6 +612,9 @@ def update_document_status(documento_id):
             fetch=False
         )
         
+        # Totales de paginación y sugerencias
+        documents_changed(documento_id)
+        
         # Registrar auditoría
         db_ops.execute_query(
             LOG_DOCUMENT_ACTION,
@@ -634,6 +664,9 @@ def delete_document(documento_id):
             fetch=False
         )
         
+        # Totales de paginación y sugerencias
+        documents_changed(documento_id)
+        
         # Registrar auditoría
         db_ops.execute_query(
             LOG_DOCUMENT_ACTION,
@@ -686,52 +719,19 @@ def get_search_suggestions():
                 }
             })
         
-        db_ops = MySQLConnection()
-        search_pattern = f'%{search_term}%'
-        
-        # Sugerencias de títulos de documentos
-        document_suggestions = db_ops.execute_query(
-            """
-            SELECT DISTINCT titulo, categoria_id 
-            FROM documentos 
-            WHERE titulo LIKE %s AND estado = 'activo' 
-            ORDER BY descargas DESC, created_at DESC
-            LIMIT %s
-            """,
-            (search_pattern, limit)
-        ) or []
-        
-        # Sugerencias de categorías
-        category_suggestions = db_ops.execute_query(
-            """
-            SELECT DISTINCT nombre, color, icono
-            FROM categorias_documentos 
-            WHERE nombre LIKE %s 
-            ORDER BY nombre 
-            LIMIT 5
-            """,
-            (search_pattern,)
-        ) or []
-        
-        # Sugerencias de etiquetas
-        tag_suggestions = db_ops.execute_query(
-            """
-            SELECT DISTINCT nombre, color
-            FROM etiquetas_documentos 
-            WHERE nombre LIKE %s 
-            ORDER BY nombre 
-            LIMIT 5
-            """,
-            (search_pattern,)
-        ) or []
+        # Índice en memoria (suggestions.py); las ráfagas del mismo usuario se agrupan
+        current_user = get_current_user() or {}
+        data = suggestion_index.suggest(
+            search_term,
+            limit,
+            user_key=current_user.get('id') or request.remote_addr
+        )
+        if data is None:
+            return jsonify({'success': False, 'error': 'Índice de sugerencias no disponible'}), 503
         
         return jsonify({
             'success': True,
-            'data': {
-                'suggestions': [{'title': doc['titulo'], 'category_id': doc['categoria_id']} for doc in document_suggestions],
-                'categories': category_suggestions,
-                'tags': tag_suggestions
-            }
+            'data': data
         })
         
     except Exception as e:
@@ -753,8 +753,10 @@ def advanced_search():
         date_to (str): Fecha hasta (YYYY-MM-DD)
         file_types (str): Tipos de archivo separados por coma
         min_downloads (int): Número mínimo de descargas
+        sort (str): 'relevance' (por defecto) o 'recent' (más recientes primero)
         page (int): Página
         limit (int): Límite por página
+        cursor (str): Con sort=recent, continúa tras la última fila de la página anterior
         
     Returns:
         json: Resultados de búsqueda con ranking de relevancia
@@ -768,8 +770,10 @@ def advanced_search():
         date_to = request.args.get('date_to')
         file_types = request.args.get('file_types', '')
         min_downloads = int(request.args.get('min_downloads', 0))
+        sort = request.args.get('sort', 'relevance')
         page = int(request.args.get('page', 1))
         limit = min(int(request.args.get('limit', 20)), 100)
+        cursor = request.args.get('cursor')
         
         db_ops = MySQLConnection()
         
@@ -779,12 +783,7 @@ def advanced_search():
                'Sistema' as subido_por_nombre,
                GROUP_CONCAT(DISTINCT CONCAT(e.id, ':', e.nombre, ':', e.color) SEPARATOR '|') as etiquetas,
                (
-                 CASE 
-                   WHEN d.titulo LIKE %s THEN 3
-                   WHEN d.descripcion LIKE %s THEN 2  
-                   WHEN e.nombre LIKE %s THEN 1
-                   ELSE 0
-                 END + 
+                 {search_score} +
                  (d.descargas / 10) +
                  CASE WHEN d.es_publico = 1 THEN 0.5 ELSE 0 END
                ) as relevance_score
@@ -794,18 +793,21 @@ def advanced_search():
         LEFT JOIN etiquetas_documentos e ON de.etiqueta_id = e.id
         """
         
-        # Construir condiciones WHERE
+        # Construir condiciones WHERE (select_params: los del cálculo de relevancia)
         where_conditions = ["d.estado = 'activo'"]
         params = []
-        
-        # Agregar parámetros de búsqueda si existe término
-        if search_term:
-            search_pattern = f'%{search_term}%'
-            params.extend([search_pattern, search_pattern, search_pattern])
-            where_conditions.append("(d.titulo LIKE %s OR d.descripcion LIKE %s OR e.nombre LIKE %s)")
+        select_params = []
+        count_from = "FROM documentos d"
+        
+        # Búsqueda de texto completo (índices FULLTEXT, ver search.py)
+        search = build_search(search_term)
+        if search:
+            base_query = base_query.format(search_score=search.score)
+            select_params.extend(search.score_params)
+            where_conditions.append(search.where)
+            params.extend(search.where_params)
         else:
-            # Si no hay término de búsqueda, usar parámetros dummy para el scoring
-            params.extend(['', '', ''])
+            base_query = base_query.format(search_score='0')
         
         # Filtro por categorías
         if categories:
@@ -822,6 +824,7 @@ def advanced_search():
                 placeholders = ','.join(['%s'] * len(tag_ids))
                 where_conditions.append(f"de.etiqueta_id IN ({placeholders})")
                 params.extend(tag_ids)
+                count_from += " JOIN documento_etiquetas de ON d.id = de.documento_id"
         
         # Filtro por fechas
         if date_from:
@@ -839,9 +842,12 @@ def advanced_search():
             for file_type in types:
                 if file_type in ['pdf', 'doc', 'docx', 'txt', 'excel', 'xls', 'xlsx', 'image']:
                     if file_type == 'excel':
-                        type_conditions.append("d.tipo_mime LIKE '%spreadsheet%'")
+                        # Como parámetro: '%spreadsheet%' literal contiene un marcador %s
+                        type_conditions.append("d.tipo_mime LIKE %s")
+                        params.append('%spreadsheet%')
                     elif file_type == 'image':
-                        type_conditions.append("d.tipo_mime LIKE 'image/%'")
+                        type_conditions.append("d.tipo_mime LIKE %s")
+                        params.append('image/%')
                     else:
                         type_conditions.append("d.tipo_mime LIKE %s")
                         params.append(f'%{file_type}%')
@@ -854,26 +860,38 @@ def advanced_search():
             where_conditions.append("d.descargas >= %s")
             params.append(min_downloads)
         
-        # Construir query completa
-        if where_conditions:
-            base_query += " WHERE " + " AND ".join(where_conditions)
-        
-        base_query += " GROUP BY d.id ORDER BY relevance_score DESC, d.created_at DESC"
+        # Total con COUNT(DISTINCT d.id), cacheado por combinación de filtros
+        total = count_documents(db_ops, count_from, " WHERE " + " AND ".join(where_conditions), params)
         
-        # Ejecutar query para contar total
-        count_query = base_query.replace(
-            "SELECT d.*, c.nombre as categoria_nombre, c.color as categoria_color, c.icono as categoria_icono, 'Sistema' as subido_por_nombre, GROUP_CONCAT(DISTINCT CONCAT(e.id, ':', e.nombre, ':', e.color) SEPARATOR '|') as etiquetas, (",
-            "SELECT COUNT(DISTINCT d.id) as total FROM (SELECT d.id, ("
-        ).replace("ORDER BY relevance_score DESC, d.created_at DESC", ") as relevance_score FROM documentos d JOIN categorias_documentos c ON d.categoria_id = c.id LEFT JOIN documento_etiquetas de ON d.id = de.documento_id LEFT JOIN etiquetas_documentos e ON de.etiqueta_id = e.id GROUP BY d.id) counted_results")
+        # Orden por fecha: admite cursor (created_at, id) además de page
+        cursor_enabled = sort == 'recent'
+        if cursor and cursor_enabled:
+            try:
+                keyset_sql, keyset_params = keyset_condition(cursor, descending=True)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            where_conditions.append(keyset_sql)
+            params.extend(keyset_params)
         
-        # Obtener total (simplificado)
-        all_results = db_ops.execute_query(base_query, params) or []
-        total = len(all_results)
+        # Construir query completa
+        base_query += " WHERE " + " AND ".join(where_conditions)
+        if cursor_enabled:
+            base_query += " GROUP BY d.id ORDER BY d.created_at DESC, d.id DESC"
+        else:
+            base_query += " GROUP BY d.id ORDER BY relevance_score DESC, d.created_at DESC, d.id DESC"
         
-        # Aplicar paginación
-        offset = (page - 1) * limit
-        paginated_query = base_query + f" LIMIT {limit} OFFSET {offset}"
-        documentos = db_ops.execute_query(paginated_query, params) or []
+        if cursor and cursor_enabled:
+            # Una fila extra indica si hay página siguiente
+            documentos = db_ops.execute_query(base_query + " LIMIT %s", (*select_params, *params, limit + 1)) or []
+            has_more = len(documentos) > limit
+            documentos = documentos[:limit]
+        else:
+            offset = (page - 1) * limit
+            documentos = db_ops.execute_query(
+                base_query + " LIMIT %s OFFSET %s",
+                (*select_params, *params, limit, offset)
+            ) or []
+            has_more = None
         
         # Procesar etiquetas para cada documento
         for doc in documentos:
@@ -895,21 +913,15 @@ def advanced_search():
         return jsonify({
             'success': True,
             'data': documentos,
-            'pagination': {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'pages': (total + limit - 1) // limit if total > 0 else 1,
-                'has_next': page * limit < total,
-                'has_prev': page > 1
-            },
+            'pagination': pagination_info(total, page, limit, documentos, cursor_enabled, has_more),
             'search_info': {
                 'query': search_term,
                 'categories': categories,
                 'tags': tags,
                 'date_range': [date_from, date_to] if date_from or date_to else None,
                 'file_types': file_types.split(',') if file_types else [],
-                'min_downloads': min_downloads
+                'min_downloads': min_downloads,
+                'sort': 'recent' if cursor_enabled else 'relevance'
             }
         })
         
@@ -1008,6 +1020,8 @@ def create_category():
         if category_id:
             # Obtener la categoría creada
             nueva_categoria = category_model.get_by_id(category_id)
+            suggestion_index.refresh_categories()
+            
             return jsonify({
                 'success': True,
                 'message': 'Categoría creada exitosamente',
@@ -1072,6 +1086,8 @@ def update_category(category_id):
         if success:
             # Obtener la categoría actualizada
             categoria_actualizada = category_model.get_by_id(category_id)
+            suggestion_index.refresh_categories()
+            
             return jsonify({
                 'success': True,
                 'message': 'Categoría actualizada exitosamente',
@@ -1122,6 +1138,8 @@ def delete_category(category_id):
         success = category_model.delete(category_id)
         
         if success:
+            suggestion_index.refresh_categories()
+            
             return jsonify({
                 'success': True,
                 'message': 'Categoría eliminada exitosamente'
@@ -1224,6 +1242,8 @@ def create_tag():
         if tag_id:
             # Obtener la etiqueta creada
             nueva_etiqueta = tag_model.get_by_id(tag_id)
+            suggestion_index.refresh_tags()
+            
             return jsonify({
                 'success': True,
                 'message': 'Etiqueta creada exitosamente',
@@ -1312,6 +1332,8 @@ def update_tag(tag_id):
         if success:
             # Obtener la etiqueta actualizada
             etiqueta_actualizada = tag_model.get_by_id(tag_id)
+            suggestion_index.refresh_tags()
+            
             return jsonify({
                 'success': True,
                 'message': 'Etiqueta actualizada exitosamente',
@@ -1362,6 +1384,8 @@ def delete_tag(tag_id):
         success = tag_model.delete(tag_id)
         
         if success:
+            suggestion_index.refresh_tags()
+            
             return jsonify({
                 'success': True,
                 'message': 'Etiqueta eliminada exitosamente'
@@ -1387,7 +1411,7 @@ def download_document_api(document_id):
         document_id (int): ID del documento
         
     Returns:
-        file: Archivo descargado con headers de seguridad o redirect a S3
+        file: Archivo descargado con headers de seguridad (streaming desde S3 o archivo local)
     """
     try:
         db_ops = MySQLConnection()
@@ -1409,78 +1433,34 @@ def download_document_api(document_id):
             # Aquí se podría agregar validación de permisos de usuario más adelante
             logger.warning(f"Intento de acceso a documento privado ID: {document_id}")
         
-        # Incrementar contador de descargas de forma atómica
-        db_ops.execute_query(INCREMENT_DOWNLOADS, (document_id,), fetch=False)
+        archivo = resolver_archivo(doc_data.get('ruta_archivo'), doc_data.get('nombre_archivo'))
+        if archivo is None:
+            logger.error(f"Archivo físico no encontrado para documento {document_id}: {doc_data.get('ruta_archivo')}")
+            return jsonify({'success': False, 'error': 'Archivo no encontrado en el servidor'}), 404
         
-        # Registrar auditoría de descarga con información detallada
-        client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR', '127.0.0.1'))
-        user_agent = request.headers.get('User-Agent', 'Unknown')
+        # Nombre original para descarga (usar titulo si no hay nombre_archivo original)
+        download_filename = f"{doc_data['titulo']}.{doc_data['nombre_archivo'].split('.')[-1]}"
         
-        db_ops.execute_query(
-            LOG_DOCUMENT_ACTION,
-            (
-                document_id,
-                149,  # usuario_id admin (TODO: obtener usuario real de sesión)
-                'download',
-                client_ip,
-                user_agent,
-                f'Descarga de documento: {doc_data["titulo"]} (API)'
-            ),
-            fetch=False
+        # Archivos de S3: descarga completa por redirect a una URL firmada,
+        # Range/condicionales reenviados; los locales legacy se sirven con sendfile
+        response = enviar_archivo(
+            archivo,
+            download_name=download_filename,
+            mimetype=doc_data.get('tipo_mime') or 'application/octet-stream',
+            as_attachment=True
         )
+        if response is None:
+            return jsonify({'success': False, 'error': 'Archivo no encontrado en el servidor'}), 404
         
-        # Verificar si es una URL de S3 (nueva forma)
-        ruta_archivo = doc_data['ruta_archivo']
+        if es_descarga_nueva(response):
+            register_download(document_id, f'Descarga de documento: {doc_data["titulo"]} (API)')
+            logger.info(f"Descarga autorizada - Documento ID: {document_id}, IP: {request.remote_addr}")
         
-        if ruta_archivo and (ruta_archivo.startswith('https://') and 'amazonaws.com' in ruta_archivo):
-            # Es una URL de S3 - redirigir directamente
-            logger.info(f"📁 Redirigiendo descarga a S3: {ruta_archivo}")
-            
-            return redirect(ruta_archivo)
+        # Agregar headers de seguridad adicionales
+        response.headers['X-Frame-Options'] = 'DENY'
+        response.headers['X-XSS-Protection'] = '1; mode=block'
         
-        else:
-            # Es un archivo local (método anterior) - servir desde el servidor
-            logger.info(f"📁 Sirviendo archivo local: {ruta_archivo}")
-            
-            # Extraer el nombre real del archivo de la ruta_archivo
-            nombre_fisico = os.path.basename(ruta_archivo)  # 911f5f33-....txt
-            
-            upload_dir = get_upload_dir()
-            file_path = os.path.join(upload_dir, nombre_fisico)
-            
-            if not os.path.exists(file_path):
-                logger.error(f"Archivo físico no encontrado: {file_path}")
-                logger.error(f"Ruta en BD: {ruta_archivo}, Nombre físico: {nombre_fisico}")
-                return jsonify({'success': False, 'error': 'Archivo no encontrado en el servidor'}), 404
-            
-            # Obtener información del archivo para headers seguros
-            file_size = os.path.getsize(file_path)
-            mime_type = doc_data.get('tipo_mime', 'application/octet-stream')
-            
-            # Nombre original para descarga (usar titulo si no hay nombre_archivo original)
-            download_filename = f"{doc_data['titulo']}.{doc_data['nombre_archivo'].split('.')[-1]}"
-            
-            logger.info(f"Descarga autorizada - Documento ID: {document_id}, IP: {client_ip}")
-            
-            # Preparar respuesta con headers de seguridad
-            response = send_from_directory(
-                upload_dir,
-                nombre_fisico,  # Usar el nombre físico real del archivo
-                as_attachment=True,
-                download_name=download_filename,
-                mimetype=mime_type
-            )
-            
-            # Agregar headers de seguridad adicionales
-            response.headers['Content-Length'] = str(file_size)
-            response.headers['X-Content-Type-Options'] = 'nosniff'
-            response.headers['X-Frame-Options'] = 'DENY'
-            response.headers['X-XSS-Protection'] = '1; mode=block'
-            response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-            response.headers['Pragma'] = 'no-cache'
-            response.headers['Expires'] = '0'
-            
-            return response
+        return response
         
     except Exception as e:
         logger.error(f"Error en download_document_api: {str(e)}")
@@ -1518,6 +1498,7 @@ def get_documents_api():
         limit = min(int(request.args.get('limit', 20)), 100)  # Máximo 100 por página
         sort_field = request.args.get('sort', 'created_at')
         sort_order = request.args.get('order', 'desc')
+        cursor = request.args.get('cursor')
         
         # Validar parámetros de ordenamiento
         valid_sort_fields = ['titulo', 'created_at', 'descargas', 'tamaño_archivo']
@@ -1562,11 +1543,28 @@ def get_documents_api():
             where_conditions.append("d.grupo = %s")
             params.append(grupo)
         
-        # Filtro por búsqueda
-        if search_term:
-            where_conditions.append("(d.titulo LIKE %s OR d.descripcion LIKE %s OR e.nombre LIKE %s)")
-            search_param = f'%{search_term}%'
-            params.extend([search_param, search_param, search_param])
+        # Filtro por búsqueda (texto completo, ver search.py)
+        search = build_search(search_term)
+        if search:
+            where_conditions.append(search.where)
+            params.extend(search.where_params)
+        
+        # Total con COUNT(DISTINCT d.id), cacheado por combinación de filtros
+        where_sql = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+        count_from = "FROM documentos d"
+        if etiqueta_id and etiqueta_id.isdigit():
+            count_from += " JOIN documento_etiquetas de ON d.id = de.documento_id"
+        total = count_documents(db_ops, count_from, where_sql, params)
+        
+        # Ordenado por fecha se admite cursor (created_at, id) además de page
+        cursor_enabled = sort_field == 'created_at'
+        if cursor and cursor_enabled:
+            try:
+                keyset_sql, keyset_params = keyset_condition(cursor, descending=sort_order == 'desc')
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            where_conditions.append(keyset_sql)
+            params.extend(keyset_params)
         
         # Agregar WHERE clause si hay condiciones
         if where_conditions:
@@ -1575,17 +1573,18 @@ def get_documents_api():
         # GROUP BY para evitar duplicados por las etiquetas
         base_query += " GROUP BY d.id"
         
-        # Agregar ORDER BY
-        base_query += f" ORDER BY d.{sort_field} {sort_order.upper()}"
+        # Agregar ORDER BY (id como desempate: orden estable entre páginas)
+        base_query += f" ORDER BY d.{sort_field} {sort_order.upper()}, d.id {sort_order.upper()}"
         
-        # Ejecutar query para obtener todos los resultados (para contar total)
-        all_documents = db_ops.execute_query(base_query, params) or []
-        total = len(all_documents)
-        
-        # Aplicar paginación
-        offset = (page - 1) * limit
-        paginated_query = base_query + f" LIMIT {limit} OFFSET {offset}"
-        documentos = db_ops.execute_query(paginated_query, params) or []
+        if cursor and cursor_enabled:
+            # Una fila extra indica si hay página siguiente
+            documentos = db_ops.execute_query(base_query + " LIMIT %s", (*params, limit + 1)) or []
+            has_more = len(documentos) > limit
+            documentos = documentos[:limit]
+        else:
+            offset = (page - 1) * limit
+            documentos = db_ops.execute_query(base_query + " LIMIT %s OFFSET %s", (*params, limit, offset)) or []
+            has_more = None
         
         # Procesar etiquetas para cada documento
         for doc in documentos:
@@ -1607,14 +1606,7 @@ def get_documents_api():
         return jsonify({
             'success': True,
             'data': documentos,
-            'pagination': {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'pages': (total + limit - 1) // limit if total > 0 else 1,
-                'has_next': page * limit < total,
-                'has_prev': page > 1
-            },
+            'pagination': pagination_info(total, page, limit, documentos, cursor_enabled, has_more),
             'filters': {
                 'categoria': categoria_id,
                 'etiqueta': etiqueta_id,
@@ -1727,73 +1719,58 @@ def create_document_api():
         if grupo not in ['kossodo', 'kossomet', 'grupo_kossodo']:
             return jsonify({'success': False, 'error': 'Grupo empresarial no válido. Debe ser: kossodo, kossomet o grupo_kossodo'}), 400
         
-        # Crear documento usando el modelo
-        document_model = Document()
+        # Crear documento, etiquetas y auditoría en una sola transacción
         db_ops = MySQLConnection()
         
         try:
-            # Para documentos sin archivo, usar valores placeholder
-            db_ops.execute_query(
-                INSERT_DOCUMENT,
-                (
-                    titulo,
-                    descripcion,
-                    'placeholder.txt',  # nombre_archivo
-                    '',  # ruta_archivo (vacía para documentos sin archivo)
-                    0,   # tamaño_archivo
-                    'text/plain',  # tipo_mime
-                    categoria_id,
-                    149,   # subido_por (usuario_id admin)
-                    es_publico,
-                    'activo',  # estado
-                    grupo  # grupo empresarial
-                ),
-                fetch=False
-            )
-            
-            # Obtener el ID del documento recién creado buscando por título y timestamp reciente
-            result = db_ops.execute_query(
-                "SELECT id FROM documentos WHERE titulo = %s AND created_at >= DATE_SUB(NOW(), INTERVAL 1 MINUTE) ORDER BY created_at DESC LIMIT 1",
-                (titulo,)
-            )
-            document_id = result[0]['id'] if result else None
-            
-            if not document_id:
-                return jsonify({'success': False, 'error': 'Error al crear documento o encontrar ID'}), 500
-            
-            # Agregar etiquetas si se proporcionaron
-            if etiquetas:
-                for etiqueta_id in etiquetas:
-                    try:
-                        db_ops.execute_query(
-                            ADD_TAG_TO_DOCUMENT,
-                            (document_id, etiqueta_id),
-                            fetch=False
-                        )
-                    except Exception as tag_error:
-                        logger.warning(f"Error al asignar etiqueta {etiqueta_id} al documento {document_id}: {tag_error}")
-            
-            # Registrar auditoría
-            db_ops.execute_query(
-                LOG_DOCUMENT_ACTION,
-                (
-                    document_id,
-                    149,  # usuario_id admin
-                    'create',
-                    '127.0.0.1',  # ip_address (placeholder)
-                    'API',    # user_agent
-                    f'Documento creado: {titulo}'
-                ),
-                fetch=False
-            )
-            
-            # Obtener el documento creado con información básica
-            doc_result = db_ops.execute_query(
-                "SELECT id, titulo, descripcion, categoria_id, es_publico, estado, created_at FROM documentos WHERE id = %s",
-                (document_id,)
-            )
+            with db_ops.transaction() as tx:
+                # Para documentos sin archivo, usar valores placeholder
+                insert_result = tx.execute(
+                    INSERT_DOCUMENT,
+                    (
+                        titulo,
+                        descripcion,
+                        'placeholder.txt',  # nombre_archivo
+                        '',  # ruta_archivo (vacía para documentos sin archivo)
+                        0,   # tamaño_archivo
+                        'text/plain',  # tipo_mime
+                        categoria_id,
+                        149,   # subido_por (usuario_id admin)
+                        es_publico,
+                        'activo',  # estado
+                        grupo  # grupo empresarial
+                    ),
+                    fetch=False
+                )
+                document_id = insert_result['last_insert_id']
+                
+                if not document_id:
+                    raise RuntimeError('No se obtuvo el ID del documento creado')
+                
+                # Agregar etiquetas si se proporcionaron
+                assign_tags_to_document(tx, document_id, etiquetas)
+                
+                # Registrar auditoría
+                tx.execute(
+                    LOG_DOCUMENT_ACTION,
+                    (
+                        document_id,
+                        149,  # usuario_id admin
+                        'create',
+                        '127.0.0.1',  # ip_address (placeholder)
+                        'API',    # user_agent
+                        f'Documento creado: {titulo}'
+                    ),
+                    fetch=False
+                )
+                
+                # Obtener el documento creado con información básica
+                nuevo_documento = tx.fetch_one(
+                    "SELECT id, titulo, descripcion, categoria_id, es_publico, estado, created_at FROM documentos WHERE id = %s",
+                    (document_id,)
+                )
             
-            nuevo_documento = doc_result[0] if doc_result else None
+            documents_changed(document_id)
             
             return jsonify({
                 'success': True,
@@ -1895,6 +1872,9 @@ def update_document_api(document_id):
             except Exception as e:
                 logger.warning(f"Error al actualizar etiquetas del documento {document_id}: {e}")
         
+        # Totales de paginación y sugerencias
+        documents_changed(document_id)
+        
         # Registrar auditoría
         db_ops.execute_query(
             LOG_DOCUMENT_ACTION,
@@ -1953,6 +1933,9 @@ def delete_document_api(document_id):
         if success is None:
             return jsonify({'success': False, 'error': 'Error al eliminar documento'}), 500
         
+        # Totales de paginación y sugerencias
+        documents_changed(document_id)
+        
         # Registrar auditoría
         db_ops.execute_query(
             LOG_DOCUMENT_ACTION,
@@ -2203,68 +2186,49 @@ def create_document_with_file():
             user_id = current_user.get('id') if current_user else 149
             user_id = int(user_id) if user_id else 149
             
-            # Insertar documento en BD con URL de S3
-            documento_id = db_ops.execute_query(
-                INSERT_DOCUMENT,
-                (
-                    titulo,
-                    descripcion,
-                    file.filename,       # nombre_archivo original
-                    s3_url,              # ruta_archivo = URL de S3
-                    file_size,           # tamaño_archivo
-                    mime_type,           # tipo_mime
-                    categoria_id,
-                    user_id,             # subido_por
-                    es_publico,          # es_publico
-                    'activo',            # estado
-                    grupo                # grupo empresarial
-                ),
-                fetch=False
-            )
-            
-            if not documento_id:
-                # Si falla la BD, intentar eliminar el archivo de S3
-                try:
-                    UploadManager.delete_file(s3_url)
-                except:
-                    pass
-                return jsonify({'success': False, 'error': 'Error al guardar documento en base de datos'}), 500
-            
-            # Agregar etiquetas si se proporcionaron
-            if etiquetas:
-                for etiqueta_id in etiquetas:
-                    if isinstance(etiqueta_id, int):
-                        try:
-                            # Verificar que la etiqueta existe
-                            etiqueta = db_ops.execute_query(
-                                "SELECT id FROM etiquetas_documentos WHERE id = %s", 
-                                (etiqueta_id,)
-                            )
-                            
-                            if etiqueta:
-                                # Insertar relación documento-etiqueta
-                                db_ops.execute_query(
-                                    ADD_TAG_TO_DOCUMENT,
-                                    (documento_id, etiqueta_id),
-                                    fetch=False
-                                )
-                        except Exception as tag_error:
-                            logger.warning(f"Error al asignar etiqueta {etiqueta_id} al documento {documento_id}: {tag_error}")
-            
-            # Registrar auditoría
-            db_ops.execute_query(
-                LOG_DOCUMENT_ACTION,
-                (
-                    documento_id,
-                    user_id,
-                    'create_with_file',
-                    request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR', '127.0.0.1')),
-                    request.headers.get('User-Agent', 'API'),
-                    f'Documento creado con archivo en S3: {titulo}'
-                ),
-                fetch=False
-            )
+            # Documento, etiquetas y auditoría en una sola transacción
+            with db_ops.transaction() as tx:
+                # Insertar documento en BD con URL de S3
+                insert_result = tx.execute(
+                    INSERT_DOCUMENT,
+                    (
+                        titulo,
+                        descripcion,
+                        file.filename,       # nombre_archivo original
+                        s3_url,              # ruta_archivo = URL de S3
+                        file_size,           # tamaño_archivo
+                        mime_type,           # tipo_mime
+                        categoria_id,
+                        user_id,             # subido_por
+                        es_publico,          # es_publico
+                        'activo',            # estado
+                        grupo                # grupo empresarial
+                    ),
+                    fetch=False
+                )
+                documento_id = insert_result['last_insert_id']
+                
+                if not documento_id:
+                    raise RuntimeError('No se obtuvo el ID del documento creado')
+                
+                # Agregar etiquetas si se proporcionaron
+                etiquetas_asignadas = assign_tags_to_document(tx, documento_id, etiquetas)
+                
+                # Registrar auditoría
+                tx.execute(
+                    LOG_DOCUMENT_ACTION,
+                    (
+                        documento_id,
+                        user_id,
+                        'create_with_file',
+                        request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR', '127.0.0.1')),
+                        request.headers.get('User-Agent', 'API'),
+                        f'Documento creado con archivo en S3: {titulo}'
+                    ),
+                    fetch=False
+                )
             
+            documents_changed(documento_id)
             logger.info(f"✅ Documento creado con archivo S3 - ID: {documento_id}, Título: {titulo}, URL: {s3_url}")
             
             return jsonify({
@@ -2281,7 +2245,7 @@ def create_document_with_file():
                     'categoria_id': categoria_id,
                     'es_publico': es_publico,
                     'grupo': grupo,
-                    'etiquetas_asignadas': len([e for e in etiquetas if isinstance(e, int)])
+                    'etiquetas_asignadas': etiquetas_asignadas
                 }
             }), 201
             
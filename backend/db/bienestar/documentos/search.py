@@ -0,0 +1,106 @@
+"""
+Búsqueda de texto completo de documentos con índices FULLTEXT de MySQL.
+
+Sustituye los filtros LIKE '%termino%' (que recorren toda la tabla) por
+MATCH ... AGAINST en modo booleano:
+- Cada palabra del término es obligatoria y se busca como prefijo ("manu" -> "manual").
+- Se ignoran mayúsculas y tildes: el término se normaliza aquí y las columnas
+  usan una collation *_ci (insensible a acentos), igual que el índice.
+- La relevancia pondera el título sobre la descripción; las etiquetas cuentan
+  como coincidencia mediante su propio índice.
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+# Índices FULLTEXT que necesita el buscador (tabla, nombre, columnas); ver setup.ensure_documents_indexes
+FULLTEXT_INDEXES = [
+    ('documentos', 'ft_documentos_titulo', 'titulo'),
+    ('documentos', 'ft_documentos_titulo_descripcion', 'titulo, descripcion'),
+    ('etiquetas_documentos', 'ft_etiquetas_nombre', 'nombre'),
+]
+
+# innodb_ft_min_token_size por defecto: palabras más cortas no están en el índice
+MIN_TOKEN_SIZE = 3
+
+# Palabras vacías del español que no se exigen en la búsqueda
+STOPWORDS = {
+    'de', 'del', 'la', 'las', 'el', 'los', 'y', 'o', 'en', 'un', 'una', 'unos', 'unas',
+    'para', 'por', 'con', 'sin', 'al', 'que', 'se', 'su', 'sus', 'lo',
+}
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin tildes ('Formación' -> 'formacion'); conserva la ñ"""
+    texto = unicodedata.normalize('NFD', (texto or '').lower().replace('ñ', '\0'))
+    texto = ''.join(c for c in texto if unicodedata.category(c) != 'Mn')
+    return unicodedata.normalize('NFC', texto).replace('\0', 'ñ')
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Palabras normalizadas del texto (de 2+ letras), sin palabras vacías ni duplicados"""
+    tokens = []
+    for token in _TOKEN.findall(normalizar(texto)):
+        if len(token) > 1 and token not in STOPWORDS and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+@dataclass
+class SearchQuery:
+    """
+    Fragmentos SQL de una búsqueda: condición WHERE y expresión de relevancia
+    (con sus parámetros, en el orden en que aparecen en la consulta)
+    """
+    where: str
+    where_params: List = field(default_factory=list)
+    score: str = "0"
+    score_params: List = field(default_factory=list)
+
+
+def build_search(search_term: Optional[str], alias: str = 'd') -> Optional[SearchQuery]:
+    """
+    Condición de búsqueda sobre la tabla de documentos con alias `alias`.
+    Devuelve None si el término no tiene palabras buscables.
+    """
+    tokens = tokenizar(search_term or '')
+    if not tokens:
+        return None
+
+    indexables = [t for t in tokens if len(t) >= MIN_TOKEN_SIZE]
+    cortos = [t for t in tokens if len(t) < MIN_TOKEN_SIZE]
+
+    condiciones, params = [], []
+    score, score_params = "0", []
+
+    if indexables:
+        # +palabra* : obligatoria y por prefijo
+        boolean_query = ' '.join(f'+{t}*' for t in indexables)
+        condiciones.append(
+            f"(MATCH({alias}.titulo, {alias}.descripcion) AGAINST (%s IN BOOLEAN MODE)"
+            f" OR {alias}.id IN ("
+            f"SELECT de_ft.documento_id FROM documento_etiquetas de_ft"
+            f" JOIN etiquetas_documentos e_ft ON e_ft.id = de_ft.etiqueta_id"
+            f" WHERE MATCH(e_ft.nombre) AGAINST (%s IN BOOLEAN MODE)))"
+        )
+        params.extend([boolean_query, boolean_query])
+        score = (f"(MATCH({alias}.titulo) AGAINST (%s IN BOOLEAN MODE) * 3"
+                 f" + MATCH({alias}.titulo, {alias}.descripcion) AGAINST (%s IN BOOLEAN MODE))")
+        score_params = [boolean_query, boolean_query]
+
+    # Palabras por debajo del tamaño mínimo del índice: prefijo de palabra en el título
+    for token in cortos:
+        condiciones.append(f"({alias}.titulo LIKE %s OR {alias}.titulo LIKE %s)")
+        params.extend([f'{token}%', f'% {token}%'])
+
+    return SearchQuery(
+        where=' AND '.join(condiciones),
+        where_params=params,
+        score=score,
+        score_params=score_params
+    )
@@ -11,6 +11,8 @@ from .queries import (
     INSERT_DOCUMENT_CATEGORY,
     INSERT_TAG
 )
+from .search import FULLTEXT_INDEXES
+from .pagination import LISTING_INDEXES
 
 def setup_documents_database():
     """
@@ -59,6 +61,12 @@ def setup_documents_database():
             return False
         print("✓ Tabla documento_auditoria creada/verificada")
         
+        # Índices de búsqueda y listados (tablas creadas antes de que existieran)
+        if not ensure_documents_indexes(db_ops_setup):
+            print("Error al crear los índices de documentos")
+            return False
+        print("✓ Índices de búsqueda y listados creados/verificados")
+        
         print("✅ Todas las tablas del módulo de documentos creadas correctamente")
         return True
         
@@ -66,6 +74,38 @@ def setup_documents_database():
         print(f"❌ Error al configurar la base de datos de documentos: {e}")
         return False
 
+def ensure_documents_indexes(db_ops=None):
+    """
+    Crea los índices de búsqueda (FULLTEXT) y de listados que falten.
+    Idempotente: consulta information_schema y solo añade los ausentes.
+    
+    Returns:
+        bool: True si todos los índices existen al terminar
+    """
+    db_ops = db_ops or MySQLConnection()
+    existentes = db_ops.execute_query("""
+    SELECT DISTINCT TABLE_NAME, INDEX_NAME FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE()
+    """)
+    if existentes is None:
+        return False
+    existentes = {(fila['TABLE_NAME'], fila['INDEX_NAME']) for fila in existentes}
+    
+    indices = [(tabla, indice, columnas, 'FULLTEXT INDEX') for tabla, indice, columnas in FULLTEXT_INDEXES]
+    indices += [(tabla, indice, columnas, 'INDEX') for tabla, indice, columnas in LISTING_INDEXES]
+    
+    ok = True
+    for tabla, indice, columnas, tipo in indices:
+        if (tabla, indice) in existentes:
+            continue
+        result = db_ops.execute_query(f"ALTER TABLE {tabla} ADD {tipo} {indice} ({columnas})", fetch=False)
+        if result is None:
+            print(f"❌ No se pudo crear el índice {indice} en {tabla}")
+            ok = False
+        else:
+            print(f"✓ Índice {indice} creado en {tabla}")
+    return ok
+
 def seed_initial_documents_data():
     """
     Inserta datos iniciales para categorías y etiquetas de documentos.
@@ -0,0 +1,318 @@
+"""
+Índice en memoria para las sugerencias de búsqueda (autocompletado).
+
+Resuelve /api/search/suggestions sin consultar MySQL: títulos de documentos
+activos, categorías y etiquetas se guardan como listas ordenadas de
+(palabra normalizada, id) y cada prefijo se busca con bisect.
+Se carga completo la primera vez (tres consultas), se actualiza por
+documento al escribir y se recarga entero cada cierto tiempo para recoger
+cambios hechos por otros procesos.
+"""
+
+import os
+import time
+import bisect
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from ...cache import TTLCache
+from ...mysql_connection import MySQLConnection
+from .search import _TOKEN, normalizar, tokenizar
+
+logger = logging.getLogger(__name__)
+
+
+SUGGESTIONS_CONFIG = {
+    # Recarga completa periódica (cambios de otros workers o del CLI)
+    'ttl_seconds': int(os.getenv('DOCUMENT_SUGGEST_INDEX_TTL', 300)),
+    # Respuestas recientes por usuario: ráfagas de la misma consulta no recalculan
+    'user_cache_ttl': float(os.getenv('DOCUMENT_SUGGEST_USER_TTL', 10)),
+    'user_cache_size': int(os.getenv('DOCUMENT_SUGGEST_USER_CACHE_SIZE', 2048)),
+}
+
+_DOCUMENT_COLUMNS = "id, titulo, categoria_id, descargas, created_at"
+
+
+def tokens_consulta(query: str) -> List[str]:
+    """
+    Tokens de una consulta de autocompletado: las palabras completas pasan por
+    tokenizar(); la última, si no la sigue un espacio, es la que se está
+    escribiendo y se conserva tal cual como prefijo ("con" -> "contrato")
+    """
+    palabras = _TOKEN.findall(normalizar(query))
+    if not palabras or (query or '')[-1:].isspace():
+        return tokenizar(query)
+    tokens = tokenizar(' '.join(palabras[:-1]))
+    if palabras[-1] not in tokens:
+        tokens.append(palabras[-1])
+    return tokens
+
+
+def _palabras_indice(texto: str) -> List[str]:
+    """Todas las palabras normalizadas del texto, incluidas las vacías: la última
+    palabra de una consulta puede ser una de ellas ("sin" -> "sin gluten")"""
+    return list(dict.fromkeys(_TOKEN.findall(normalizar(texto))))
+
+
+class _SortedPrefixIndex:
+    """Lista ordenada de (palabra, id) con búsqueda por prefijo"""
+
+    def __init__(self):
+        self.keys: List[Tuple[str, int]] = []
+        self.words: Dict[int, List[str]] = {}
+
+    def add(self, item_id: int, texto: str):
+        self.remove(item_id)
+        palabras = _palabras_indice(texto)
+        self.words[item_id] = palabras
+        for palabra in palabras:
+            bisect.insort(self.keys, (palabra, item_id))
+
+    def remove(self, item_id: int):
+        for palabra in self.words.pop(item_id, []):
+            i = bisect.bisect_left(self.keys, (palabra, item_id))
+            if i < len(self.keys) and self.keys[i] == (palabra, item_id):
+                del self.keys[i]
+
+    def bulk_load(self, items):
+        """Carga completa a partir de (id, texto): un solo sort en vez de inserciones"""
+        self.words = {item_id: _palabras_indice(texto) for item_id, texto in items}
+        self.keys = sorted((palabra, item_id) for item_id, palabras in self.words.items() for palabra in palabras)
+
+    def prefix(self, prefijo: str) -> set:
+        """IDs con alguna palabra que empieza por `prefijo`"""
+        ids = set()
+        i = bisect.bisect_left(self.keys, (prefijo,))
+        while i < len(self.keys) and self.keys[i][0].startswith(prefijo):
+            ids.add(self.keys[i][1])
+            i += 1
+        return ids
+
+    def match(self, tokens: List[str]) -> set:
+        """IDs en los que cada token es prefijo de alguna palabra"""
+        resultado = None
+        for token in tokens:
+            ids = self.prefix(token)
+            resultado = ids if resultado is None else resultado & ids
+            if not resultado:
+                return set()
+        return resultado or set()
+
+
+class SuggestionIndex:
+    """
+    Sugerencias de títulos, categorías y etiquetas por prefijo de palabra.
+
+    - suggest(q) devuelve el mismo formato que la consulta SQL anterior.
+    - refresh_document(id) relee un documento (alta, edición, baja);
+      refresh_categories()/refresh_tags() recargan esas tablas (pequeñas).
+    - Un contador de generación evita que una carga completa iniciada antes
+      de una invalidación sobrescriba datos más nuevos.
+    - Tras un fork (gunicorn con preload_app) el hijo arranca con el índice vacío.
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, db: Optional[MySQLConnection] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else SUGGESTIONS_CONFIG['ttl_seconds']
+        self.db = db or MySQLConnection()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._cargado_en = 0.0
+        self._generacion = 0
+        self._reset()
+        self._respuestas = TTLCache(
+            ttl=SUGGESTIONS_CONFIG['user_cache_ttl'],
+            maxsize=SUGGESTIONS_CONFIG['user_cache_size'],
+            name='sugerencias_usuario'
+        )
+
+    def _reset(self):
+        self._cargado = False
+        self._documentos: Dict[int, Dict] = {}
+        self._categorias: Dict[int, Dict] = {}
+        self._etiquetas: Dict[int, Dict] = {}
+        self._idx_documentos = _SortedPrefixIndex()
+        self._idx_categorias = _SortedPrefixIndex()
+        self._idx_etiquetas = _SortedPrefixIndex()
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def suggest(self, query: str, limit: int = 10, user_key=None) -> Optional[Dict]:
+        """
+        Sugerencias para `query`. Con user_key, una consulta repetida por el mismo
+        usuario en pocos segundos devuelve la respuesta anterior.
+        Devuelve None si el índice no se pudo cargar.
+        """
+        tokens = tokens_consulta(query)
+        if user_key is not None:
+            clave = (user_key, ' '.join(tokens), limit)
+            return self._respuestas.get_or_load(clave, lambda: self._suggest(tokens, query, limit))
+        return self._suggest(tokens, query, limit)
+
+    def _suggest(self, tokens: List[str], query: str, limit: int) -> Optional[Dict]:
+        if not self._vigente():
+            return None
+        if not tokens:
+            return {'suggestions': [], 'categories': [], 'tags': []}
+
+        frase = normalizar(query).strip()
+        with self._lock:
+            documentos = [self._documentos[i] for i in self._idx_documentos.match(tokens)]
+            categorias = [self._categorias[i] for i in self._idx_categorias.match(tokens)]
+            etiquetas = [self._etiquetas[i] for i in self._idx_etiquetas.match(tokens)]
+
+        # Primero los títulos que empiezan por la frase; después los más descargados y recientes
+        documentos.sort(key=lambda d: (not d['_norm'].startswith(frase), -d['descargas'], -d['_ts'], d['id']))
+        categorias.sort(key=lambda c: c['_norm'])
+        etiquetas.sort(key=lambda e: e['_norm'])
+
+        titulos, vistos = [], set()
+        for doc in documentos:
+            if doc['titulo'] in vistos:
+                continue
+            vistos.add(doc['titulo'])
+            titulos.append({'title': doc['titulo'], 'category_id': doc['categoria_id']})
+            if len(titulos) >= limit:
+                break
+
+        return {
+            'suggestions': titulos,
+            'categories': [{'nombre': c['nombre'], 'color': c['color'], 'icono': c['icono']} for c in categorias[:5]],
+            'tags': [{'nombre': e['nombre'], 'color': e['color']} for e in etiquetas[:5]]
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'documentos': len(self._documentos),
+                'categorias': len(self._categorias),
+                'etiquetas': len(self._etiquetas),
+                'palabras': len(self._idx_documentos.keys),
+                'edad_segundos': round(time.monotonic() - self._cargado_en, 1) if self._cargado else None,
+                'respuestas_usuario': self._respuestas.stats(),
+            }
+
+    # ------------------------------------------------------------------
+    # Actualización
+    # ------------------------------------------------------------------
+
+    def refresh_document(self, documento_id: int):
+        """Relee un documento tras crearlo, editarlo o cambiar su estado"""
+        if not self._cargado:
+            return
+        filas = self.db.execute_query(
+            f"SELECT {_DOCUMENT_COLUMNS}, estado FROM documentos WHERE id = %s", (documento_id,)
+        )
+        if filas is None:
+            # No se pudo leer: recargar todo en la próxima consulta
+            self.invalidate()
+            return
+        with self._lock:
+            self._generacion += 1
+            if filas and filas[0]['estado'] == 'activo':
+                self._poner_documento(filas[0])
+            else:
+                self._documentos.pop(documento_id, None)
+                self._idx_documentos.remove(documento_id)
+        self._respuestas.invalidate()
+
+    def refresh_categories(self):
+        self._recargar_tabla('categorias')
+
+    def refresh_tags(self):
+        self._recargar_tabla('etiquetas')
+
+    def invalidate(self):
+        """Descarta el índice; la próxima consulta lo recarga completo"""
+        with self._lock:
+            self._generacion += 1
+            self._reset()
+        self._respuestas.invalidate()
+
+    def _vigente(self) -> bool:
+        with self._lock:
+            self._check_fork()
+            if self._cargado and time.monotonic() - self._cargado_en < self.ttl_seconds:
+                return True
+            generacion = self._generacion
+
+        documentos = self.db.execute_query(f"SELECT {_DOCUMENT_COLUMNS} FROM documentos WHERE estado = 'activo'")
+        categorias = self._consultar_tabla('categorias')
+        etiquetas = self._consultar_tabla('etiquetas')
+        if documentos is None or categorias is None or etiquetas is None:
+            return False
+
+        with self._lock:
+            if generacion != self._generacion:
+                # Hubo escrituras durante la carga: se usa el índice actual si existe
+                return self._cargado
+            self._reset()
+            for doc in documentos:
+                self._documentos[doc['id']] = self._preparar(doc, 'titulo')
+            self._idx_documentos.bulk_load((d['id'], d['titulo']) for d in documentos)
+            self._cargar_tabla('categorias', categorias)
+            self._cargar_tabla('etiquetas', etiquetas)
+            self._cargado = True
+            self._cargado_en = time.monotonic()
+        self._respuestas.invalidate()
+        logger.info(f"🔎 Índice de sugerencias cargado: {len(documentos)} documentos, "
+                    f"{len(categorias)} categorías, {len(etiquetas)} etiquetas")
+        return True
+
+    def _consultar_tabla(self, tabla: str) -> Optional[List[Dict]]:
+        if tabla == 'categorias':
+            return self.db.execute_query("SELECT id, nombre, color, icono FROM categorias_documentos")
+        return self.db.execute_query("SELECT id, nombre, color FROM etiquetas_documentos")
+
+    def _cargar_tabla(self, tabla: str, filas: List[Dict]):
+        """Requiere tener el lock"""
+        datos = {fila['id']: self._preparar(fila, 'nombre') for fila in filas}
+        indice = _SortedPrefixIndex()
+        indice.bulk_load((fila['id'], fila['nombre']) for fila in filas)
+        if tabla == 'categorias':
+            self._categorias, self._idx_categorias = datos, indice
+        else:
+            self._etiquetas, self._idx_etiquetas = datos, indice
+
+    def _recargar_tabla(self, tabla: str):
+        if not self._cargado:
+            return
+        filas = self._consultar_tabla(tabla)
+        if filas is None:
+            self.invalidate()
+            return
+        with self._lock:
+            self._generacion += 1
+            self._cargar_tabla(tabla, filas)
+        self._respuestas.invalidate()
+
+    def _poner_documento(self, fila: Dict):
+        """Requiere tener el lock"""
+        self._documentos[fila['id']] = self._preparar(fila, 'titulo')
+        self._idx_documentos.add(fila['id'], fila['titulo'])
+
+    @staticmethod
+    def _preparar(fila: Dict, campo: str) -> Dict:
+        datos = dict(fila)
+        datos.pop('estado', None)
+        datos['_norm'] = normalizar(fila[campo] or '')
+        if 'descargas' in fila:
+            datos['descargas'] = fila['descargas'] or 0
+            created_at = fila.get('created_at')
+            datos['_ts'] = created_at.timestamp() if isinstance(created_at, datetime) else 0
+        return datos
+
+    def _check_fork(self):
+        """Requiere tener el lock"""
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._generacion += 1
+            self._reset()
+
+
+# Índice compartido por el proceso
+suggestion_index = SuggestionIndex()
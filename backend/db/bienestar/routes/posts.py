@@ -9,10 +9,11 @@ from ..queries import (
     GET_ALL_POSTS, GET_POSTS_BY_STATUS, GET_POSTS_BY_CATEGORY,
     GET_POSTS_HIGHLIGHTED, GET_POST_BY_ID, SEARCH_POSTS,
     INSERT_POST, UPDATE_POST, UPDATE_POST_STATUS, UPDATE_POST_HIGHLIGHT,
-    INCREMENT_VIEWS, DELETE_POST, CHECK_EXISTING_POSTULACION, INSERT_POSTULACION,
+    DELETE_POST, CHECK_EXISTING_POSTULACION, INSERT_POSTULACION,
     GET_POSTULANTES_BY_POST_ID, UPDATE_POST_EMAIL_SENT
 )
 from ...mysql_connection import MySQLConnection # Importar la clase
+from ...event_sink import event_sink
 from ...bienestar import bienestar_bp
 # Importar funciones de login para verificación de token y obtención de datos de usuario
 from ...login import verificar_token, obtener_usuario_por_id # Asumiendo que están en el __init__ de login
@@ -142,7 +143,8 @@ def get_post(post_id):
         
         # Incrementar vistas si se ha solicitado y el post está publicado
         if increment_views and post_data[0]['estado'] == PostStatus.PUBLISHED.value:
-            db_ops.execute_query(INCREMENT_VIEWS, (post_id,), fetch=False) # MODIFICADO
+            # Se acumula en memoria y se escribe por lotes (db/event_sink.py)
+            event_sink.incrementar('posts_bienestar', 'vistas', post_id)
             post_data[0]['vistas'] += 1
         
         return jsonify({
@@ -183,96 +185,52 @@ def create_post():
         except ValueError:
             return jsonify({'success': False, 'error': 'El ID de categoría debe ser un número entero'}), 400
 
+        # Obtener el extracto del payload
+        extracto = data.get('extracto') # Asegurarse de que el frontend envía esto
+        if not extracto:
+            # Para la query INSERT_POST es obligatorio
+            return jsonify({'success': False, 'error': 'El campo extracto es requerido'}), 400
+
+        # Usar el campo 'autor' que viene del frontend para la query, que espera un string para el campo 'autor'
+        autor_nombre = data.get('autor', 'Autor Desconocido') # Tomar 'autor' del payload, o un default
+
         try:
             mysql_conn = MySQLConnection() # Crear instancia
             
-            # Verificar si la categoría existe
-            categoria = mysql_conn.execute_query("SELECT id FROM categorias_bienestar WHERE id = %s", (categoria_id,)) # CORREGIDO
-            
-            if not categoria:
-                return jsonify({'success': False, 'error': f'La categoría con ID {categoria_id} no existe'}), 400
-
-            # Obtener el extracto del payload
-            extracto = data.get('extracto') # Asegurarse de que el frontend envía esto
-            if not extracto:
-                # Considerar si el extracto es obligatorio
-                # Por ahora, si no viene, se podría poner un placeholder o fallar si es mandatorio
-                # Para la query INSERT_POST es obligatorio
-                return jsonify({'success': False, 'error': 'El campo extracto es requerido'}), 400
-
-            # Usar el campo 'autor' que viene del frontend para la query, que espera un string para el campo 'autor'
-            autor_nombre = data.get('autor', 'Autor Desconocido') # Tomar 'autor' del payload, o un default
-            
-            # La query INSERT_POST espera 9 parámetros:
-            # titulo, extracto, contenido, autor, fecha, estado, destacado, categoria_id, imagen_url
-            insert_result = mysql_conn.execute_query(
-                INSERT_POST,
-                (
-                    titulo,                   # 1. titulo
-                    extracto,                 # 2. extracto
-                    contenido,                # 3. contenido
-                    autor_nombre,             # 4. autor (el nombre del autor, string)
-                    datetime.now().isoformat(), # 5. fecha
-                    PostStatus.DRAFT.value,   # 6. estado
-                    False,                    # 7. destacado (por defecto al crear)
-                    categoria_id,             # 8. categoria_id
-                    imagen_url                # 9. imagen_url
-                ),
-                fetch=False
-            )
-            
-            if not insert_result or 'affected_rows' not in insert_result or insert_result['affected_rows'] == 0:
-                return jsonify({
-                    'success': False,
-                    'error': 'No se pudo crear el post'
-                }), 500
-            
-            # Obtener el ID del último insert
-            last_id_result = mysql_conn.execute_query("SELECT LAST_INSERT_ID() as id") # MODIFICADO
-            
-            # Imprimir debug info
-            print(f"DEBUG - last_id_result: {last_id_result}")
-            
-            if not last_id_result or len(last_id_result) == 0:
-                return jsonify({
-                    'success': False,
-                    'error': 'No se pudo obtener el ID del post creado'
-                }), 500
-            
-            last_id = last_id_result[0]['id']
-            
-            # Imprimir debug info
-            print(f"DEBUG - last_id: {last_id}")
-            
-            # Si el ID es 0 o nulo, es un error
-            if last_id == 0 or last_id is None:
-                # Intentar obtener el ID mediante otra consulta
-                print("DEBUG - Intentando obtener el ID mediante consulta alternativa")
+            # Verificación de categoría, inserción y lectura del post en una sola conexión
+            with mysql_conn.transaction() as tx:
+                # Verificar si la categoría existe
+                categoria = tx.fetch_one("SELECT id FROM categorias_bienestar WHERE id = %s", (categoria_id,))
                 
-                # Tratar de encontrar el post recién creado por su título y contenido
-                alt_query = """
-                SELECT id FROM posts_bienestar 
-                WHERE titulo = %s AND extracto = %s AND autor = %s
-                ORDER BY created_at DESC LIMIT 1
-                """
+                if not categoria:
+                    return jsonify({'success': False, 'error': f'La categoría con ID {categoria_id} no existe'}), 400
                 
-                alt_result = mysql_conn.execute_query(alt_query, (
-                    titulo,
-                    extracto,
-                    autor_nombre
-                ))
+                # La query INSERT_POST espera 9 parámetros:
+                # titulo, extracto, contenido, autor, fecha, estado, destacado, categoria_id, imagen_url
+                insert_result = tx.execute(
+                    INSERT_POST,
+                    (
+                        titulo,                   # 1. titulo
+                        extracto,                 # 2. extracto
+                        contenido,                # 3. contenido
+                        autor_nombre,             # 4. autor (el nombre del autor, string)
+                        datetime.now().isoformat(), # 5. fecha
+                        PostStatus.DRAFT.value,   # 6. estado
+                        False,                    # 7. destacado (por defecto al crear)
+                        categoria_id,             # 8. categoria_id
+                        imagen_url                # 9. imagen_url
+                    ),
+                    fetch=False
+                )
                 
-                print(f"DEBUG - alt_result: {alt_result}")
+                # El ID viene del mismo cursor que hizo el INSERT: no hace falta
+                # SELECT LAST_INSERT_ID() ni buscar el post por título
+                last_id = insert_result['last_insert_id']
+                if not insert_result['affected_rows'] or not last_id:
+                    raise RuntimeError('No se pudo crear el post')
                 
-                if alt_result and len(alt_result) > 0:
-                    last_id = alt_result[0]['id']
-                    print(f"DEBUG - ID alternativo encontrado: {last_id}")
-            
-            # Obtener el post recién creado
-            new_post = mysql_conn.execute_query(GET_POST_BY_ID, (last_id,)) # MODIFICADO
-            
-            # Imprimir debug info
-            print(f"DEBUG - new_post: {new_post}")
+                # Obtener el post recién creado
+                new_post = tx.execute(GET_POST_BY_ID, (last_id,))
             
             if not new_post or len(new_post) == 0:
                 # Si no podemos obtener el post, al menos devolvemos éxito pero con datos mínimos
@@ -4,6 +4,7 @@ Proporciona endpoints para listar, obtener y actualizar usuarios.
 """
 from flask import Blueprint, request, jsonify
 from ...mysql_connection import MySQLConnection
+from ...login import invalidar_usuario
 from ..queries import (
     GET_ALL_USERS, 
     GET_USER_BY_ID, 
@@ -160,6 +161,8 @@ def update_user(user_id):
                 'error': 'Error al actualizar el usuario'
             }), 500
         
+        invalidar_usuario(user_id)
+        
         # Obtener usuario actualizado
         updated_users = db_ops.execute_query(GET_USER_BY_ID, (user_id,))
         updated_user = user_schema(updated_users[0])
@@ -0,0 +1,110 @@
+"""
+Caché en memoria del proceso con expiración (TTL) e invalidación explícita.
+Pensado para respuestas de lectura frecuente que se invalidan al escribir;
+el TTL acota lo que puede quedar desactualizado por escrituras de otros procesos.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Diccionario acotado (LRU) cuyas entradas expiran tras ttl segundos.
+
+    - get_or_load(key, loader) ejecuta loader() solo si no hay valor vigente.
+      Si se invalida mientras loader() consulta la BD, el resultado no se guarda
+      (contador de generación), así una lectura lenta no reintroduce datos viejos.
+    - invalidate() vacía todo; invalidate(prefix=...) solo las claves tupla o
+      texto que empiezan por ese prefijo.
+    - Tras un fork (gunicorn con preload_app) el hijo arranca con la caché vacía.
+    """
+
+    def __init__(self, ttl=60.0, maxsize=256, name=None):
+        self.ttl = float(ttl)
+        self.maxsize = max(1, int(maxsize))
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._pid = os.getpid()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._check_fork()
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= time.monotonic():
+                if entry is not _MISSING:
+                    del self._data[key]
+                self._stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None, generation=None):
+        """Guarda un valor; con generation, solo si no hubo invalidaciones desde entonces"""
+        with self._lock:
+            self._check_fork()
+            if generation is not None and generation != self._generation:
+                return False
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return True
+
+    def get_or_load(self, key, loader, ttl=None):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        generation = self.generation()
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl=ttl, generation=generation)
+        return value
+
+    def generation(self):
+        with self._lock:
+            self._check_fork()
+            return self._generation
+
+    def invalidate(self, key=_MISSING, prefix=_MISSING):
+        with self._lock:
+            self._generation += 1
+            self._stats['invalidations'] += 1
+            if key is not _MISSING:
+                self._data.pop(key, None)
+            elif prefix is not _MISSING:
+                for k in [k for k in self._data if _starts_with(k, prefix)]:
+                    del self._data[k]
+            else:
+                self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data.update({'name': self.name, 'size': len(self._data), 'ttl': self.ttl})
+        total = data['hits'] + data['misses']
+        data['hit_ratio'] = round(data['hits'] / total, 4) if total else 0.0
+        return data
+
+    def _check_fork(self):
+        """Requiere tener el lock."""
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._data = OrderedDict()
+            self._generation += 1
+
+
+def _starts_with(key, prefix):
+    if isinstance(key, tuple):
+        prefix = prefix if isinstance(prefix, tuple) else (prefix,)
+        return key[:len(prefix)] == prefix
+    return isinstance(key, str) and key.startswith(prefix)
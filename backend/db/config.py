@@ -17,6 +17,15 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 3306))
 }
 
+# Configuración del pool de conexiones MySQL (ver db/connection_pool.py)
+DB_POOL_CONFIG = {
+    'max_size': int(os.getenv('DB_POOL_SIZE', 5)),
+    'wait_timeout': float(os.getenv('DB_POOL_WAIT_TIMEOUT', 10)),
+    'idle_timeout': float(os.getenv('DB_POOL_IDLE_TIMEOUT', 300)),
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+    'health_check_interval': float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+}
+
 # Secreto para JWT (usado en la autenticación)
 JWT_SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here-change-in-production')
 
@@ -30,6 +39,15 @@ def get_db_config():
     """
     return DB_CONFIG
 
+def get_db_pool_config():
+    """
+    Retorna la configuración del pool de conexiones.
+    
+    Returns:
+        dict: Tamaño máximo, timeouts y vida máxima de las conexiones.
+    """
+    return DB_POOL_CONFIG
+
 def get_jwt_secret():
     """
     Retorna el secreto para firmar tokens JWT.
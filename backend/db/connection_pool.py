@@ -0,0 +1,329 @@
+"""
+Pool de conexiones MySQL compartido por todo el proceso.
+Mantiene un número acotado de conexiones abiertas y las reutiliza entre
+llamadas a MySQLConnection, con verificación de salud, expiración por
+inactividad, tiempo de vida máximo y espera acotada cuando el pool está lleno.
+"""
+import os
+import time
+import threading
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+
+from .config import get_db_config, get_db_pool_config
+
+
+class PoolTimeoutError(Error):
+    """Se agotó el tiempo de espera por una conexión libre del pool."""
+
+
+class _IdleEntry:
+    """Conexión física inactiva junto con sus marcas de tiempo."""
+    __slots__ = ('conn', 'created_at', 'last_used', 'last_checked')
+
+    def __init__(self, conn, created_at):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = created_at
+        self.last_used = now
+        self.last_checked = now
+
+
+class PooledConnection:
+    """
+    Envoltorio de una conexión física prestada por el pool.
+    Expone la misma interfaz que la conexión de mysql.connector; close()
+    la devuelve al pool en lugar de cerrar el socket.
+    """
+
+    def __init__(self, pool, conn, created_at):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+        self._released = False
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._conn, self._created_at)
+        self._conn = None
+
+    def is_connected(self):
+        if self._released:
+            return False
+        try:
+            return self._conn.is_connected()
+        except Error:
+            return False
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise Error(msg="La conexión ya fue devuelta al pool")
+        return getattr(conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Red de seguridad: si el llamador nunca invocó close() (por ejemplo
+        # porque is_connected() devolvió False), liberar el cupo del pool.
+        try:
+            if not self._released and self._conn is not None:
+                self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones MySQL.
+
+    - max_size: número máximo de conexiones (en uso + inactivas).
+    - wait_timeout: segundos que espera acquire() por un cupo libre.
+    - idle_timeout: una conexión inactiva más tiempo que esto se descarta.
+    - max_lifetime: una conexión más antigua que esto se descarta al devolverse/pedirse.
+    - health_check_interval: si la conexión estuvo inactiva más que esto, se hace ping antes de entregarla.
+    """
+
+    def __init__(self, db_config, max_size=5, wait_timeout=10.0, idle_timeout=300.0,
+                 max_lifetime=1800.0, health_check_interval=30.0):
+        self.db_config = dict(db_config)
+        self.max_size = max(1, int(max_size))
+        self.wait_timeout = float(wait_timeout)
+        self.idle_timeout = float(idle_timeout)
+        self.max_lifetime = float(max_lifetime)
+        self.health_check_interval = float(health_check_interval)
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = deque()
+        self._in_use = 0
+        self._pid = os.getpid()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'health_check_failures': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def acquire(self, timeout=None):
+        """
+        Obtiene una conexión del pool (reutilizada o nueva).
+
+        Returns:
+            PooledConnection: conexión prestada; close() la devuelve al pool.
+
+        Raises:
+            PoolTimeoutError: si no hay cupo libre tras `timeout` segundos.
+            mysql.connector.Error: si falla la creación de una conexión nueva.
+        """
+        timeout = self.wait_timeout if timeout is None else timeout
+        deadline = None
+        waited = False
+        wait_started = None
+        expired = []
+
+        try:
+            with self._available:
+                self._check_fork()
+                while True:
+                    expired.extend(self._evict_expired_locked())
+                    entry = self._idle.pop() if self._idle else None
+                    if entry is not None:
+                        self._in_use += 1
+                        break
+                    if self._in_use < self.max_size:
+                        self._in_use += 1
+                        break
+
+                    # Pool lleno: esperar a que alguien devuelva una conexión
+                    if not waited:
+                        waited = True
+                        wait_started = time.monotonic()
+                        deadline = wait_started + timeout
+                        self._stats['waits'] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        self._stats['wait_time_total'] += time.monotonic() - wait_started
+                        raise PoolTimeoutError(
+                            msg=f"Sin conexiones libres en el pool tras {timeout:.1f}s "
+                                f"(max_size={self.max_size})"
+                        )
+                    self._available.wait(remaining)
+
+                if waited:
+                    self._stats['wait_time_total'] += time.monotonic() - wait_started
+        finally:
+            # Fuera del lock: cerrar las vencidas (un close lento no bloquea al resto)
+            for conn in expired:
+                self._close_quietly(conn)
+
+        # Fuera del lock: validar la conexión reutilizada o crear una nueva
+        try:
+            if entry is not None:
+                if self._is_healthy(entry):
+                    with self._lock:
+                        self._stats['hits'] += 1
+                    return PooledConnection(self, entry.conn, entry.created_at)
+                self._close_quietly(entry.conn)
+                with self._lock:
+                    self._stats['discarded'] += 1
+                    self._stats['health_check_failures'] += 1
+
+            conn = mysql.connector.connect(**self.db_config)
+            with self._lock:
+                self._stats['misses'] += 1
+                self._stats['created'] += 1
+            return PooledConnection(self, conn, time.monotonic())
+        except BaseException:
+            with self._available:
+                self._in_use -= 1
+                self._available.notify()
+            raise
+
+    def stats(self):
+        """Devuelve una copia de las estadísticas del pool."""
+        with self._lock:
+            data = dict(self._stats)
+            data.update({
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+                'pid': self._pid,
+            })
+        total = data['hits'] + data['misses']
+        data['hit_ratio'] = round(data['hits'] / total, 4) if total else 0.0
+        data['wait_time_avg'] = round(data['wait_time_total'] / data['waits'], 4) if data['waits'] else 0.0
+        data['wait_time_total'] = round(data['wait_time_total'], 4)
+        return data
+
+    def close_all(self):
+        """Cierra todas las conexiones inactivas (las que están en uso se cierran al devolverse)."""
+        with self._lock:
+            entries = list(self._idle)
+            self._idle.clear()
+        for entry in entries:
+            self._close_quietly(entry.conn)
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+
+    def _release(self, conn, created_at):
+        """Devuelve una conexión física al pool o la descarta si ya no sirve."""
+        keep = os.getpid() == self._pid
+        if keep:
+            try:
+                if not conn.is_connected():
+                    keep = False
+                elif conn.in_transaction:
+                    # Nunca devolver una transacción abierta (incluye los SELECT
+                    # sin commit, que dejarían un snapshot viejo en REPEATABLE READ)
+                    conn.rollback()
+            except Error:
+                keep = False
+        if keep and time.monotonic() - created_at >= self.max_lifetime:
+            keep = False
+
+        if not keep:
+            self._close_quietly(conn)
+
+        with self._available:
+            if os.getpid() != self._pid:
+                return
+            self._in_use = max(0, self._in_use - 1)
+            if keep:
+                self._idle.append(_IdleEntry(conn, created_at))
+            else:
+                self._stats['discarded'] += 1
+            self._available.notify()
+
+    def _is_healthy(self, entry):
+        now = time.monotonic()
+        if now - entry.created_at >= self.max_lifetime:
+            return False
+        if now - entry.last_checked < self.health_check_interval:
+            return True
+        try:
+            entry.conn.ping(reconnect=False)
+            entry.last_checked = now
+            return True
+        except Error:
+            return False
+
+    def _evict_expired_locked(self):
+        """
+        Saca del pool las conexiones inactivas vencidas. Requiere tener el lock.
+
+        Returns:
+            list: conexiones a cerrar por el llamador una vez liberado el lock.
+        """
+        if not self._idle:
+            return []
+        now = time.monotonic()
+        kept = deque()
+        expired = []
+        for entry in self._idle:
+            if (now - entry.last_used >= self.idle_timeout
+                    or now - entry.created_at >= self.max_lifetime):
+                expired.append(entry.conn)
+                self._stats['discarded'] += 1
+            else:
+                kept.append(entry)
+        self._idle = kept
+        return expired
+
+    def _check_fork(self):
+        """
+        Tras un fork (gunicorn con preload_app) los sockets heredados pertenecen
+        al proceso padre: se olvidan sin cerrarlos y el hijo arranca con un pool vacío.
+        """
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._idle = deque()
+            self._in_use = 0
+            for key in self._stats:
+                self._stats[key] = 0.0 if key == 'wait_time_total' else 0
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Devuelve el pool del proceso, creándolo en el primer uso."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(get_db_config(), **get_db_pool_config())
+    return _pool
+
+
+def get_pool_stats():
+    """Estadísticas del pool del proceso (hits, misses, esperas, etc.)."""
+    return get_pool().stats()
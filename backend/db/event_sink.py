@@ -0,0 +1,211 @@
+"""
+Buffer de escrituras "fire and forget" (contadores y filas de auditoría).
+
+Las peticiones no escriben en MySQL: acumulan el evento en memoria y un hilo
+lo vuelca por lotes cada pocos segundos o al llegar a N eventos. Los
+incrementos del mismo registro se suman antes de escribir (un solo
+UPDATE ... CASE por tabla), así las filas populares no compiten por el bloqueo.
+"""
+
+import os
+import re
+import time
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from db.mysql_connection import MySQLConnection
+
+logger = logging.getLogger(__name__)
+
+
+EVENT_SINK_CONFIG = {
+    # Volcado periódico (segundos)
+    'flush_interval': float(os.getenv('EVENT_SINK_FLUSH_SECONDS', 5)),
+    # Eventos pendientes que fuerzan un volcado inmediato
+    'max_events': int(os.getenv('EVENT_SINK_MAX_EVENTS', 200)),
+    # Filas de auditoría que se conservan si MySQL no responde (las más antiguas se descartan)
+    'max_buffer': int(os.getenv('EVENT_SINK_MAX_BUFFER', 10000)),
+    # IDs por sentencia UPDATE ... CASE
+    'batch_size': int(os.getenv('EVENT_SINK_BATCH_SIZE', 500)),
+}
+
+_IDENTIFICADOR = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class BufferedEventSink:
+    """
+    Acumula incrementos de contadores e INSERTs y los escribe en segundo plano.
+
+    - incrementar(tabla, columna, id) suma en memoria; el volcado hace un
+      UPDATE tabla SET columna = columna + CASE id WHEN ... END por lote de IDs.
+    - insertar(query, params) agrupa filas por sentencia y las escribe con executemany.
+    - Todo el volcado va en una transacción; si falla, los eventos vuelven al buffer.
+    - El hilo es daemon y se arranca por proceso (fork de gunicorn). Al salir
+      el worker, shutdown() hace un último volcado síncrono.
+    """
+
+    def __init__(self, config: Optional[Dict] = None, db: Optional[MySQLConnection] = None):
+        self.config = dict(EVENT_SINK_CONFIG, **(config or {}))
+        self.db = db or MySQLConnection()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pid = None
+        self._contadores: Dict[Tuple[str, str], Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self._filas: Dict[str, List[tuple]] = defaultdict(list)
+        self._pendientes = 0
+        self._stats = {'eventos': 0, 'volcados': 0, 'sentencias': 0, 'errores': 0, 'descartados': 0}
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def incrementar(self, tabla: str, columna: str, registro_id: int, cantidad: int = 1):
+        """Suma `cantidad` a tabla.columna del registro (se escribe en el próximo volcado)"""
+        if not (_IDENTIFICADOR.match(tabla) and _IDENTIFICADOR.match(columna)):
+            raise ValueError(f"Identificador inválido: {tabla}.{columna}")
+        self.ensure_started()
+        with self._lock:
+            self._contadores[(tabla, columna)][int(registro_id)] += cantidad
+            self._registrar_evento()
+
+    def insertar(self, query: str, params: tuple):
+        """Encola una fila para la sentencia INSERT indicada"""
+        self.ensure_started()
+        with self._lock:
+            self._filas[query].append(tuple(params))
+            self._registrar_evento()
+
+    def ensure_started(self):
+        """Arranca el hilo de volcado en este proceso si aún no está corriendo"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            if self._pid is not None:
+                # Hijo de un fork: lo pendiente pertenece al proceso padre
+                self._contadores.clear()
+                self._filas.clear()
+                self._pendientes = 0
+            self._pid = pid
+            self._stop.clear()
+            threading.Thread(target=self._flush_loop, name='event-sink-flush', daemon=True).start()
+            atexit.register(self.shutdown)
+            logger.info(f"🧵 Buffer de eventos iniciado (volcado cada {self.config['flush_interval']}s "
+                        f"o {self.config['max_events']} eventos)")
+
+    def flush(self) -> bool:
+        """Escribe lo pendiente; devuelve False si falló (los eventos se conservan)"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pendientes:
+                    return True
+                contadores, self._contadores = self._contadores, defaultdict(lambda: defaultdict(int))
+                filas, self._filas = self._filas, defaultdict(list)
+                pendientes, self._pendientes = self._pendientes, 0
+
+            try:
+                sentencias = 0
+                with self.db.transaction() as tx:
+                    for (tabla, columna), incrementos in sorted(contadores.items()):
+                        # Orden por ID: los volcados concurrentes de varios workers bloquean en el mismo orden
+                        ids = sorted(incrementos)
+                        for i in range(0, len(ids), self.config['batch_size']):
+                            lote = ids[i:i + self.config['batch_size']]
+                            query, params = self._update_case(tabla, columna, lote, incrementos)
+                            tx.execute(query, params, fetch=False)
+                            sentencias += 1
+                    for query, lote in filas.items():
+                        tx.execute_many(query, lote)
+                        sentencias += 1
+            except Exception as e:
+                logger.error(f"❌ Error volcando {pendientes} eventos: {str(e)}")
+                self._devolver(contadores, filas, pendientes)
+                return False
+
+            with self._lock:
+                self._stats['volcados'] += 1
+                self._stats['sentencias'] += sentencias
+            return True
+
+    def shutdown(self):
+        """Detiene el hilo y vuelca lo pendiente"""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        if not self.flush():
+            logger.error(f"❌ Se pierden {self._pendientes} eventos sin volcar al cerrar el worker")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self._stats)
+            data['pendientes'] = self._pendientes
+        return data
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+
+    def _registrar_evento(self):
+        """Requiere tener el lock"""
+        self._pendientes += 1
+        self._stats['eventos'] += 1
+        if self._pendientes >= self.config['max_events']:
+            self._wake.set()
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.config['flush_interval'])
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if not self.flush():
+                # MySQL caído: esperar un intervalo completo antes de reintentar
+                time.sleep(self.config['flush_interval'])
+
+    def _devolver(self, contadores, filas, pendientes):
+        """Reincorpora al buffer un volcado fallido (delante de lo llegado después)"""
+        with self._lock:
+            self._stats['errores'] += 1
+            for clave, incrementos in contadores.items():
+                for registro_id, cantidad in incrementos.items():
+                    self._contadores[clave][registro_id] += cantidad
+            for query, lote in filas.items():
+                nuevas = self._filas[query]
+                self._filas[query] = lote + nuevas
+            self._pendientes += pendientes
+
+            total = sum(len(lote) for lote in self._filas.values())
+            exceso = total - self.config['max_buffer']
+            for query in list(self._filas):
+                if exceso <= 0:
+                    break
+                descartar = min(exceso, len(self._filas[query]))
+                del self._filas[query][:descartar]
+                exceso -= descartar
+                self._pendientes -= descartar
+                self._stats['descartados'] += descartar
+                logger.warning(f"⚠️ Buffer de eventos lleno: descartadas {descartar} filas")
+
+    @staticmethod
+    def _update_case(tabla, columna, ids, incrementos):
+        casos = " ".join(["WHEN %s THEN %s"] * len(ids))
+        marcadores = ", ".join(["%s"] * len(ids))
+        query = (f"UPDATE {tabla} SET {columna} = {columna} + CASE id {casos} ELSE 0 END "
+                 f"WHERE id IN ({marcadores})")
+        params = []
+        for registro_id in ids:
+            params.extend((registro_id, incrementos[registro_id]))
+        params.extend(ids)
+        return query, tuple(params)
+
+
+# Buffer compartido por el proceso
+event_sink = BufferedEventSink()
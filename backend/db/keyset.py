@@ -0,0 +1,51 @@
+"""
+Cursores de paginación por clave (keyset) sobre (fecha, id).
+
+El cursor es la pareja (fecha, id) de la última fila entregada, en JSON y
+base64 sin relleno. La página siguiente continúa con
+WHERE (fecha < x OR (fecha = x AND id < y)) sobre un índice (fecha, id),
+así las páginas profundas cuestan lo mismo que la primera.
+Las columnas las indica cada listado (documentos, marketing, ...).
+"""
+import json
+import base64
+from datetime import datetime
+from typing import List, Tuple
+
+
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def encode_cursor(timestamp, row_id: int) -> str:
+    """Cursor que apunta justo después de la fila (timestamp, id)"""
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.strftime(TS_FORMAT)
+    payload = json.dumps([str(timestamp), int(row_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """(timestamp, id) del cursor; ValueError si no es válido"""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        datetime.strptime(timestamp, TS_FORMAT)
+        return timestamp, int(row_id)
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
+
+
+def keyset_condition(cursor: str, ts_column: str, id_column: str, descending: bool = True) -> Tuple[str, List]:
+    """
+    Condición WHERE que continúa después del cursor en el orden (ts_column, id_column).
+
+    Args:
+        ts_column, id_column: columnas tal como van en la consulta (con alias si hace falta)
+        descending: el listado se ordena de más reciente a más antiguo
+    """
+    timestamp, row_id = decode_cursor(cursor)
+    op = '<' if descending else '>'
+    return (
+        f"({ts_column} {op} %s OR ({ts_column} = %s AND {id_column} {op} %s))",
+        [timestamp, timestamp, row_id]
+    )
@@ -6,6 +6,7 @@ from .auth_usuarios import (
     verificar_token, 
     generar_token,
     obtener_usuario_por_id,
+    invalidar_usuario,
     verificar_tabla_usuarios
 )
 
@@ -2,12 +2,38 @@
 Módulo para autenticación de usuarios con MySQL utilizando la tabla 'usuarios'.
 Proporciona funciones para login, verificación de tokens y gestión de sesiones.
 """
+import os
 import jwt
+import time
 import hashlib
 from datetime import datetime, timedelta
+from ..cache import TTLCache
 from ..mysql_connection import MySQLConnection
 from ..config import get_jwt_secret
 
+AUTH_CACHE_CONFIG = {
+    # Tokens ya verificados (clave: hash del token); nunca más allá de su 'exp'
+    'token_cache_size': int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 4096)),
+    'token_ttl': float(os.getenv('AUTH_TOKEN_CACHE_TTL', 900)),
+    # Registro del usuario: TTL corto, se invalida al editar el usuario o su contraseña
+    'user_cache_size': int(os.getenv('AUTH_USER_CACHE_SIZE', 1024)),
+    'user_ttl': float(os.getenv('AUTH_USER_CACHE_TTL', 60)),
+}
+
+# Payloads de tokens verificados por sha256(token)
+tokens_verificados = TTLCache(
+    ttl=AUTH_CACHE_CONFIG['token_ttl'],
+    maxsize=AUTH_CACHE_CONFIG['token_cache_size'],
+    name='auth_tokens'
+)
+
+# Usuarios por ID (lo que devuelve obtener_usuario_por_id)
+usuarios_cache = TTLCache(
+    ttl=AUTH_CACHE_CONFIG['user_ttl'],
+    maxsize=AUTH_CACHE_CONFIG['user_cache_size'],
+    name='auth_usuarios'
+)
+
 def hash_password(password):
     """
     Genera un hash seguro para la contraseña.
@@ -58,6 +84,8 @@ def generar_token(usuario_id, usuario, correo, nombre, cargo, grupo, rango, expi
 def verificar_token(token):
     """
     Verifica la validez de un token JWT.
+    Los tokens válidos se recuerdan (por su hash) hasta su expiración, así las
+    peticiones siguientes con el mismo token no vuelven a verificar la firma.
     
     Args:
         token (str): Token JWT a verificar
@@ -65,18 +93,32 @@ def verificar_token(token):
     Returns:
         dict/None: Payload del token si es válido, None si no lo es
     """
+    if not token:
+        return None
+    clave = hashlib.sha256(token.encode()).hexdigest()
+    payload = tokens_verificados.get(clave)
+    if payload is not None:
+        if payload.get('exp', 0) > time.time():
+            return dict(payload)
+        tokens_verificados.invalidate(key=clave)
+        return None
+
     try:
         payload = jwt.decode(
             token,
             get_jwt_secret(),
             algorithms=['HS256']
         )
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
+    restante = payload.get('exp', 0) - time.time()
+    if restante > 0:
+        tokens_verificados.set(clave, payload, ttl=min(restante, AUTH_CACHE_CONFIG['token_ttl']))
+    return dict(payload)
+
 def login_usuario(usuario, password):
     """
     Autentica un usuario con su nombre de usuario y contraseña.
@@ -142,6 +184,7 @@ def login_usuario(usuario, password):
 def obtener_usuario_por_id(usuario_id):
     """
     Obtiene la información de un usuario por su ID.
+    El resultado se cachea unos segundos (ver invalidar_usuario).
     
     Args:
         usuario_id (int): ID del usuario
@@ -155,13 +198,20 @@ def obtener_usuario_por_id(usuario_id):
     WHERE id = %s
     """
     
-    db_ops = MySQLConnection()
-    users = db_ops.execute_query(query, (usuario_id,))
-    
-    if not users or len(users) == 0:
-        return None
-    
-    return users[0]
+    def cargar():
+        db_ops = MySQLConnection()
+        users = db_ops.execute_query(query, (usuario_id,))
+        return users[0] if users else None
+
+    user = usuarios_cache.get_or_load(str(usuario_id), cargar)
+    return dict(user) if user else None
+
+def invalidar_usuario(usuario_id):
+    """
+    Descarta el usuario cacheado tras modificarlo (datos, rango o contraseña).
+    Los tokens ya emitidos siguen siendo válidos hasta su expiración.
+    """
+    usuarios_cache.invalidate(key=str(usuario_id))
 
 def verificar_tabla_usuarios():
     """
@@ -4,7 +4,7 @@ Permite a los usuarios cambiar su contraseña actual por una nueva.
 """
 import logging
 from ..mysql_connection import MySQLConnection
-from .auth_usuarios import verificar_token
+from .auth_usuarios import verificar_token, invalidar_usuario
 
 # Configurar logger
 logging.basicConfig(level=logging.INFO)
@@ -69,6 +69,7 @@ def actualizar_password(usuario_id, nueva_password):
         if result is not None and isinstance(result, dict):
             affected_rows = result.get('affected_rows', 0)
             if affected_rows > 0:
+                invalidar_usuario(usuario_id)
                 logger.info(f"Contraseña actualizada exitosamente para usuario ID {usuario_id}. Filas afectadas: {affected_rows}")
                 return True
             else:
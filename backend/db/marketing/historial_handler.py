@@ -2,93 +2,106 @@ import json
 import logging
 from flask import Blueprint, request, jsonify
 from db.mysql_connection import MySQLConnection
+from .pagination import PAGINATION_CONFIG, count_rows, keyset_condition, page_info, request_limit
 
 logger = logging.getLogger(__name__)
 historial_bp = Blueprint('historial_bp', __name__, url_prefix='/api/marketing')
 
+# Total del historial: cacheado (pagination.count_rows) e invalidado por confirmar_solicitud
+COUNT_CONFIRMACIONES = """
+    SELECT COUNT(*) AS total
+    FROM inventario_solicitudes_conf isc
+    JOIN inventario_solicitudes s ON isc.solicitud_id = s.id
+"""
+
 @historial_bp.route('/confirmaciones', methods=['GET'])
 def obtener_historial_confirmaciones():
     """
     Recupera el historial de confirmaciones (todas las entradas de inventario_solicitudes_conf),
     junto con datos clave de la solicitud original de inventario_solicitudes.
-    Admite paginación.
+    Paginación por cursor sobre (isc.timestamp, isc.id), de la más reciente a la más antigua:
+      - limit:  tamaño de página (por defecto 10)
+      - cursor: next_cursor de la página anterior
+      - page:   sin cursor, número de página resuelto con OFFSET (hasta max_offset filas);
+                con cursor se ignora: el número de página lo lleva el cliente
+    Respuesta: {records, limit, has_more, next_cursor, page, max_offset_page, total_records, total_pages}
+    page es None cuando se pidió por cursor. total_records puede tener unos minutos
+    de retraso si se confirma desde otro proceso.
     """
-    db_ops = MySQLConnection()
-    conn = None
-    cursor = None
+    limit = request_limit(default=10)
+    cursor_param = request.args.get('cursor')
+    max_offset = PAGINATION_CONFIG['max_offset']
 
-    try:
-        # Obtener parámetros de paginación de la query string
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 10, type=int)
+    values = []
+    where = ""
+    offset = 0
+    page = None
+    if cursor_param:
+        try:
+            condicion, values = keyset_condition(cursor_param, 'isc.timestamp', 'isc.id')
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+        where = f"WHERE {condicion}"
+    else:
+        page = max(request.args.get('page', 1, type=int) or 1, 1)
         offset = (page - 1) * limit
+        if offset > max_offset:
+            return jsonify({"error": f"Página demasiado lejana para pedirla por número (máximo {max_offset // limit + 1}); use el parámetro cursor (next_cursor)."}), 400
 
-        conn = db_ops._connect_internal()
-        if conn is None:
-            logger.error("obtener_historial_confirmaciones: Error de conexión a la base de datos")
-            return jsonify({"error": "Error de conexión a la base de datos"}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # Query para obtener el total de registros (sin LIMIT/OFFSET)
-        count_query = "SELECT COUNT(*) as total FROM inventario_solicitudes_conf isc JOIN inventario_solicitudes s ON isc.solicitud_id = s.id;"
-        cursor.execute(count_query)
-        total_records = cursor.fetchone()['total']
-
-        # Query principal con paginación
-        query = """
-            SELECT 
-                isc.id AS confirmacion_id, 
-                isc.solicitud_id, 
-                isc.confirmador, 
-                isc.observaciones, 
-                isc.productos AS productos_confirmados, 
-                isc.grupo AS grupo_confirmacion,
-                isc.timestamp AS fecha_confirmacion,
-                s.solicitante,
-                s.ruc,
-                s.fecha_visita,
-                s.cantidad_packs AS cantidad_packs_solicitada,
-                s.catalogos AS catalogos_solicitados,
-                s.status AS status_solicitud_original,
-                s.timestamp AS fecha_creacion_solicitud
-            FROM inventario_solicitudes_conf isc
-            JOIN inventario_solicitudes s ON isc.solicitud_id = s.id
-            ORDER BY isc.timestamp DESC
-            LIMIT %s OFFSET %s;
-        """ 
-        
-        cursor.execute(query, (limit, offset))
-        confirmaciones = cursor.fetchall()
+    # ORDER BY + LIMIT recorre idx_conf_ts (el OFFSET salta como mucho max_offset filas); el JOIN usa la clave primaria de la solicitud
+    query = f"""
+        SELECT
+            isc.id AS confirmacion_id,
+            isc.solicitud_id,
+            isc.confirmador,
+            isc.observaciones,
+            isc.productos AS productos_confirmados,
+            isc.grupo AS grupo_confirmacion,
+            isc.timestamp AS fecha_confirmacion,
+            s.solicitante,
+            s.ruc,
+            s.fecha_visita,
+            s.cantidad_packs AS cantidad_packs_solicitada,
+            s.catalogos AS catalogos_solicitados,
+            s.status AS status_solicitud_original,
+            s.timestamp AS fecha_creacion_solicitud
+        FROM inventario_solicitudes_conf isc
+        JOIN inventario_solicitudes s ON isc.solicitud_id = s.id
+        {where}
+        ORDER BY isc.timestamp DESC, isc.id DESC
+        LIMIT %s OFFSET %s
+    """
+    values = list(values) + [limit + 1, offset]
 
-        # Parsear JSON de productos confirmados
-        for conf in confirmaciones:
-            if conf.get('productos_confirmados'):
-                try:
-                    conf['productos_confirmados'] = json.loads(conf['productos_confirmados'])
-                except json.JSONDecodeError:
-                    logger.warning(f"obtener_historial_confirmaciones: No se pudo decodificar JSON para productos_confirmados en confirmacion_id {conf.get('confirmacion_id')}")
-                    pass # Mantener como string si no se puede parsear
+    db_ops = MySQLConnection()
+    confirmaciones = db_ops.execute_query(query, tuple(values))
+    if confirmaciones is None:
+        logger.error("obtener_historial_confirmaciones: Error de base de datos")
+        return jsonify({"error": "Error de conexión a la base de datos"}), 500
 
-        return jsonify({
-            'total_records': total_records,
-            'page': page,
-            'limit': limit,
-            'total_pages': (total_records + limit - 1) // limit, # Calcular total de páginas
-            'records': confirmaciones
-        }), 200
+    pagina = page_info(confirmaciones, limit, 'fecha_confirmacion', 'confirmacion_id')
 
-    except Exception as e:
-        logger.error(f"Error al obtener historial de confirmaciones: {e}", exc_info=True)
-        return jsonify({"error": str(e)}), 500
-    finally:
-        if cursor:
-            try:
-                cursor.close()
-            except Exception as e_cursor:
-                logger.error(f"Error cerrando cursor en obtener_historial_confirmaciones: {e_cursor}")
-        if conn and conn.is_connected():
+    # Parsear JSON de productos confirmados
+    for conf in confirmaciones:
+        if conf.get('productos_confirmados'):
             try:
-                conn.close()
-            except Exception as e_conn:
-                logger.error(f"Error cerrando conexión en obtener_historial_confirmaciones: {e_conn}") 
\ No newline at end of file
+                conf['productos_confirmados'] = json.loads(conf['productos_confirmados'])
+            except json.JSONDecodeError:
+                logger.warning(f"obtener_historial_confirmaciones: No se pudo decodificar JSON para productos_confirmados en confirmacion_id {conf.get('confirmacion_id')}")
+                pass # Mantener como string si no se puede parsear
+
+    # Mínimo que se sabe por la propia página: cubre un total cacheado desfasado o una consulta fallida
+    vistos = offset + len(confirmaciones) + (1 if pagina['has_more'] else 0)
+    total_records = count_rows(db_ops, COUNT_CONFIRMACIONES)
+    if total_records is None:
+        logger.warning("obtener_historial_confirmaciones: No se pudo obtener el total de confirmaciones")
+    total_records = max(total_records or 0, vistos)
+
+    return jsonify({
+        'total_records': total_records,
+        'page': page,
+        'max_offset_page': max_offset // limit + 1,
+        'total_pages': (total_records + limit - 1) // limit, # Calcular total de páginas
+        'records': confirmaciones,
+        **pagina
+    }), 200
@@ -0,0 +1,152 @@
+"""
+Movimientos de inventario de merchandising en formato largo.
+
+Cada cambio de stock es una fila (grupo, producto, delta, source, source_id, ts):
+- 'ingreso': cantidades de un registro de inventario_merch_<grupo> (source_id = id del registro).
+- 'confirmacion': productos entregados en inventario_solicitudes_conf (delta negativo).
+- 'alta': registro del producto al crearlo (delta 0, source_id 0).
+
+Sustituye a las columnas merch_ de inventario_merch_<grupo> como fuente de
+cantidades: crear un producto es un INSERT (no un ALTER TABLE) y el stock se
+agrega en SQL con GROUP BY producto sobre un índice. Las tablas anchas
+siguen guardando la cabecera del ingreso (responsable, observaciones, fecha).
+La tabla y sus índices se declaran en schema.py.
+"""
+
+import json
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# INSERT IGNORE: un mismo origen (registro o confirmación) no se registra dos veces
+INSERT_MOVEMENT = """
+INSERT IGNORE INTO inventory_movements (grupo, producto, delta, source, source_id)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
+INSERT_MOVEMENT_TS = """
+INSERT IGNORE INTO inventory_movements (grupo, producto, delta, source, source_id, ts)
+VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+STOCK_BY_PRODUCT = """
+SELECT producto, SUM(delta) AS cantidad
+FROM inventory_movements
+WHERE grupo = %s
+GROUP BY producto
+"""
+
+INGRESOS_BY_SOURCE = """
+SELECT source_id, producto, delta
+FROM inventory_movements
+WHERE grupo = %s AND source = 'ingreso'
+"""
+
+HAS_MOVEMENTS = "SELECT 1 FROM inventory_movements WHERE grupo = %s LIMIT 1"
+
+INGRESO = 'ingreso'
+CONFIRMACION = 'confirmacion'
+ALTA = 'alta'
+
+# Filas por INSERT multi-fila durante la migración
+_MIGRATION_BATCH = 1000
+
+
+def registrar_movimientos(tx, grupo: str, cantidades: Dict[str, int], source: str, source_id: int = 0,
+                          signo: int = 1):
+    """Inserta un movimiento por producto con cantidad distinta de cero (alta admite 0)"""
+    filas = [
+        (grupo, producto, signo * cantidad, source, source_id)
+        for producto, cantidad in sorted(cantidades.items())
+        if cantidad or source == ALTA
+    ]
+    tx.execute_many(INSERT_MOVEMENT, filas)
+
+
+def stock_por_producto(tx, grupo: str) -> Dict[str, int]:
+    """Suma de movimientos por producto (lo que debería tener inventario_stock)"""
+    return {fila['producto']: int(fila['cantidad'] or 0) for fila in tx.execute(STOCK_BY_PRODUCT, (grupo,))}
+
+
+def ingresos_por_registro(db_ops, grupo: str) -> Optional[Dict[int, Dict[str, int]]]:
+    """{id de registro: {producto: cantidad}} de los ingresos del grupo (None si falla)"""
+    filas = db_ops.execute_query(INGRESOS_BY_SOURCE, (grupo,))
+    if filas is None:
+        return None
+    registros: Dict[int, Dict[str, int]] = {}
+    for fila in filas:
+        registros.setdefault(fila['source_id'], {})[fila['producto']] = int(fila['delta'])
+    return registros
+
+
+def tiene_movimientos(db_ops, grupo: str) -> bool:
+    return bool(db_ops.execute_query(HAS_MOVEMENTS, (grupo,)))
+
+
+# ==========================================
+# MIGRACIÓN DESDE LAS TABLAS ANCHAS
+# ==========================================
+
+def migrar_tablas_anchas(tx, grupo: str) -> Dict[str, int]:
+    """
+    Copia a inventory_movements el historial de inventario_merch_<grupo>
+    (una fila por columna merch_ distinta de cero) y los productos JSON de
+    inventario_solicitudes_conf. Es idempotente: volver a ejecutarla no
+    duplica movimientos.
+
+    Returns:
+        dict: número de movimientos leídos por origen
+    """
+    inventario_table = f"inventario_merch_{grupo}"
+    columnas = tx.execute(
+        """
+        SELECT COLUMN_NAME
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = %s
+          AND COLUMN_NAME LIKE 'merch\\_%'
+        """,
+        (inventario_table,)
+    )
+    productos = [c['COLUMN_NAME'] for c in columnas]
+    resumen = {ALTA: len(productos), INGRESO: 0, CONFIRMACION: 0}
+    if not productos:
+        logger.warning(f"No se encontraron columnas 'merch_' en la tabla {inventario_table}")
+        return resumen
+
+    registrar_movimientos(tx, grupo, {p: 0 for p in productos}, ALTA)
+
+    cols_sql = ", ".join(f"`{p}`" for p in productos)
+    filas: List[tuple] = []
+    for registro in tx.execute(f"SELECT id, `timestamp`, {cols_sql} FROM `{inventario_table}`"):
+        for producto in productos:
+            cantidad = int(registro.get(producto) or 0)
+            if cantidad:
+                filas.append((grupo, producto, cantidad, INGRESO, registro['id'], registro['timestamp']))
+    resumen[INGRESO] = len(filas)
+    _insertar_por_lotes(tx, filas)
+
+    # inventario_solicitudes_conf existe siempre: la crea el registro de esquema (schema.py)
+    conocidos = set(productos)
+    filas = []
+    for conf in tx.execute(
+        "SELECT id, productos, `timestamp` FROM inventario_solicitudes_conf WHERE grupo = %s", (grupo,)
+    ):
+        try:
+            entregados = json.loads(conf['productos']) if conf.get('productos') else {}
+            for producto, cantidad in entregados.items():
+                if producto in conocidos and int(cantidad):
+                    filas.append((grupo, producto, -int(cantidad), CONFIRMACION, conf['id'], conf['timestamp']))
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.error(f"Confirmación {conf.get('id')} con productos inválidos ({conf.get('productos')}): {e}")
+    resumen[CONFIRMACION] = len(filas)
+    _insertar_por_lotes(tx, filas)
+
+    logger.info(f"🚚 Movimientos de {grupo} migrados: {resumen}")
+    return resumen
+
+
+def _insertar_por_lotes(tx, filas: List[tuple]):
+    for i in range(0, len(filas), _MIGRATION_BATCH):
+        tx.execute_many(INSERT_MOVEMENT_TS, filas[i:i + _MIGRATION_BATCH])
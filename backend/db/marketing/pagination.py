@@ -0,0 +1,81 @@
+"""
+Paginación por cursor (keyset) de los listados de marketing.
+
+Los listados se ordenan por (timestamp, id) descendente y continúan tras el
+cursor de la última fila entregada; ver db.keyset.
+
+Los totales (para "página X de Y") se cachean unos minutos por consulta;
+las escrituras que los cambian llaman a invalidate_counts().
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from flask import request
+
+from db.cache import TTLCache
+from db.keyset import encode_cursor, keyset_condition
+from db.mysql_connection import MySQLConnection
+
+PAGINATION_CONFIG = {
+    'default_limit': 50,
+    'max_limit': 200,
+    # Sin cursor, ?page=N se resuelve con OFFSET solo hasta esta fila (páginas cercanas y enlaces directos)
+    'max_offset': int(os.getenv('MARKETING_MAX_OFFSET', 1000)),
+    'count_ttl': int(os.getenv('MARKETING_COUNT_CACHE_TTL', 300)),
+    'count_cache_size': int(os.getenv('MARKETING_COUNT_CACHE_SIZE', 64)),
+}
+
+# Total de filas por (consulta, parámetros)
+marketing_counts = TTLCache(
+    ttl=PAGINATION_CONFIG['count_ttl'],
+    maxsize=PAGINATION_CONFIG['count_cache_size'],
+    name='marketing_count'
+)
+
+def request_limit(default: Optional[int] = None) -> int:
+    """?limit= acotado entre 1 y max_limit"""
+    default = default or PAGINATION_CONFIG['default_limit']
+    limit = request.args.get('limit', default, type=int) or default
+    return max(1, min(limit, PAGINATION_CONFIG['max_limit']))
+
+
+def page_info(rows: List[Dict], limit: int, ts_key: str, id_key: str) -> Dict:
+    """
+    Recorta la fila extra (se piden limit + 1) y devuelve has_more/next_cursor.
+    Modifica `rows` en el sitio.
+    """
+    has_more = len(rows) > limit
+    del rows[limit:]
+    next_cursor: Optional[str] = None
+    if has_more and rows:
+        next_cursor = encode_cursor(rows[-1][ts_key], rows[-1][id_key])
+    return {'limit': limit, 'has_more': has_more, 'next_cursor': next_cursor}
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Fecha YYYY-MM-DD de un parámetro (None si no viene); ValueError si es inválida"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"Fecha inválida: {value} (use YYYY-MM-DD)")
+
+
+def count_rows(db_ops: MySQLConnection, count_sql: str, params: Tuple = ()) -> Optional[int]:
+    """
+    Resultado de `count_sql` (una consulta SELECT COUNT(*) AS total ...), cacheado.
+    Devuelve None si la consulta falla (no se cachea).
+    """
+    def cargar():
+        result = db_ops.execute_query(count_sql, tuple(params))
+        return int(result[0]['total']) if result else None
+
+    return marketing_counts.get_or_load((count_sql, tuple(params)), cargar)
+
+
+def invalidate_counts():
+    """Descarta los totales cacheados (llamar tras insertar o eliminar filas contadas)"""
+    marketing_counts.invalidate()
@@ -0,0 +1,247 @@
+"""
+Registro del esquema de las tablas de marketing.
+
+Antes cada request comprobaba sus tablas (SHOW TABLES, SHOW COLUMNS) y
+podía lanzar DDL. Ahora el esquema se declara aquí y se verifica una sola
+vez por proceso: al arrancar la app (gunicorn con preload_app lo hace en el
+master y los workers heredan el resultado) o con
+
+    python -m db.marketing.schema
+
+La verificación hace dos consultas a information_schema (columnas e índices
+de todas las tablas) y crea o altera solo lo que falta. Después,
+marketing_schema.require() no consulta la BD. Tras una migración manual se
+llama a marketing_schema.invalidate() para volver a verificar.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from db.mysql_connection import MySQLConnection
+
+logger = logging.getLogger(__name__)
+
+_TABLE_OPTIONS = "ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci"
+
+# Cabecera de los registros de ingreso (las cantidades están en inventory_movements)
+_INVENTARIO_MERCH = {
+    'columns': {
+        "id": "INT AUTO_INCREMENT PRIMARY KEY",
+        "responsable": "VARCHAR(255)",
+        "observaciones": "TEXT",
+        "timestamp": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+    },
+    'indexes': [],
+}
+
+# Tabla -> columnas (nombre: definición), clave primaria compuesta e índices (nombre, columnas, tipo)
+MARKETING_TABLES = {
+    'inventario_solicitudes': {
+        'columns': {
+            "id": "INT AUTO_INCREMENT PRIMARY KEY",
+            "solicitante": "VARCHAR(255) NOT NULL",
+            "grupo": "VARCHAR(50) NOT NULL",
+            "ruc": "VARCHAR(20) NOT NULL",
+            "fecha_visita": "DATE NOT NULL",
+            "cantidad_packs": "INT DEFAULT 0",
+            "productos": "JSON",
+            "catalogos": "TEXT",
+            "timestamp": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+            "status": "VARCHAR(50) DEFAULT 'pending'",
+        },
+        # Listado paginado por (timestamp, id) con filtros de estado y grupo
+        'indexes': [
+            ('idx_solicitudes_ts', '`timestamp`, id', 'INDEX'),
+            ('idx_solicitudes_status_ts', 'status, `timestamp`, id', 'INDEX'),
+            ('idx_solicitudes_grupo_status_ts', 'grupo, status, `timestamp`, id', 'INDEX'),
+        ],
+    },
+    # La FK solicitud_id -> inventario_solicitudes.id no se declara: las tablas
+    # existentes no la tienen y añadirla requiere limpiar datos huérfanos antes.
+    'inventario_solicitudes_conf': {
+        'columns': {
+            "id": "INT AUTO_INCREMENT PRIMARY KEY",
+            "solicitud_id": "INT NOT NULL",
+            "confirmador": "VARCHAR(255) NOT NULL",
+            "observaciones": "TEXT",
+            "productos": "JSON",
+            "grupo": "VARCHAR(50)",
+            "timestamp": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+        },
+        # Historial paginado por (timestamp, id) y JOIN con la solicitud
+        'indexes': [
+            ('idx_conf_ts', '`timestamp`, id', 'INDEX'),
+            ('idx_conf_solicitud', 'solicitud_id', 'INDEX'),
+        ],
+    },
+    'inventario_merch_kossodo': _INVENTARIO_MERCH,
+    'inventario_merch_kossomet': _INVENTARIO_MERCH,
+    'inventory_movements': {
+        'columns': {
+            "id": "BIGINT AUTO_INCREMENT PRIMARY KEY",
+            "grupo": "VARCHAR(50) NOT NULL",
+            "producto": "VARCHAR(64) NOT NULL",
+            "delta": "INT NOT NULL",
+            "source": "VARCHAR(20) NOT NULL",
+            "source_id": "INT NOT NULL DEFAULT 0",
+            "ts": "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP",
+        },
+        'indexes': [
+            ('uq_movements_origen', 'grupo, source, source_id, producto', 'UNIQUE INDEX'),
+            ('idx_movements_grupo_producto', 'grupo, producto, ts, delta', 'INDEX'),
+            ('idx_movements_grupo_ts', 'grupo, ts', 'INDEX'),
+        ],
+    },
+    'inventario_stock': {
+        'columns': {
+            "grupo": "VARCHAR(50) NOT NULL",
+            "producto": "VARCHAR(64) NOT NULL",
+            "cantidad": "INT NOT NULL DEFAULT 0",
+            "updated_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP",
+        },
+        'primary_key': 'grupo, producto',
+        'indexes': [],
+    },
+}
+
+
+class SchemaRegistry:
+    """
+    Verifica (y completa) un conjunto de tablas una vez y recuerda el resultado.
+
+    - ensure(): compara la declaración con information_schema y crea tablas,
+      columnas e índices que falten. Es idempotente.
+    - require(): para el camino de las requests; sin consultas si ya se verificó.
+      Si la verificación falló, reintenta como mucho cada retry_seconds.
+    - invalidate(): olvida la verificación (p. ej. tras una migración).
+    """
+
+    def __init__(self, tables: Dict[str, Dict], db: Optional[MySQLConnection] = None, retry_seconds: float = 60):
+        self.tables = tables
+        self.db = db or MySQLConnection()
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._verificado = False
+        self._ultimo_intento = 0.0
+        self._stats = {'verificaciones': 0, 'tablas_creadas': 0, 'tablas_alteradas': 0, 'errores': 0}
+
+    def require(self) -> bool:
+        """True si el esquema está verificado (lo verifica la primera vez)"""
+        if self._verificado:
+            return True
+        if time.monotonic() - self._ultimo_intento < self.retry_seconds:
+            return False
+        return self.ensure()
+
+    def ensure(self, force: bool = False) -> bool:
+        with self._lock:
+            if self._verificado and not force:
+                return True
+            self._ultimo_intento = time.monotonic()
+            self._stats['verificaciones'] += 1
+            try:
+                ok = self._verificar()
+            except Exception as e:
+                logger.error(f"❌ Error verificando el esquema de marketing: {e}", exc_info=True)
+                ok = False
+            self._verificado = ok
+            if not ok:
+                self._stats['errores'] += 1
+            return ok
+
+    def invalidate(self):
+        with self._lock:
+            self._verificado = False
+            self._ultimo_intento = 0.0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self._stats)
+            data['verificado'] = self._verificado
+        return data
+
+    def _verificar(self) -> bool:
+        nombres = list(self.tables)
+        marcadores = ", ".join(["%s"] * len(nombres))
+        columnas = self.db.execute_query(
+            f"""
+            SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({marcadores})
+            """,
+            tuple(nombres)
+        )
+        indices = self.db.execute_query(
+            f"""
+            SELECT DISTINCT TABLE_NAME, INDEX_NAME FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({marcadores})
+            """,
+            tuple(nombres)
+        )
+        if columnas is None or indices is None:
+            logger.error("❌ No se pudo leer el esquema de marketing")
+            return False
+
+        existentes: Dict[str, set] = {}
+        for fila in columnas:
+            existentes.setdefault(_texto(fila['TABLE_NAME']), set()).add(_texto(fila['COLUMN_NAME']).lower())
+        indices_existentes = {(_texto(fila['TABLE_NAME']), _texto(fila['INDEX_NAME'])) for fila in indices}
+
+        ok = True
+        for tabla, spec in self.tables.items():
+            if tabla not in existentes:
+                sentencia = self._create_table(tabla, spec)
+                contador = 'tablas_creadas'
+            else:
+                cambios = self._cambios(tabla, spec, existentes[tabla], indices_existentes)
+                if not cambios:
+                    continue
+                sentencia = f"ALTER TABLE `{tabla}` " + ", ".join(cambios)
+                contador = 'tablas_alteradas'
+
+            if self.db.execute_query(sentencia, fetch=False) is None:
+                logger.error(f"❌ No se pudo crear/actualizar la tabla {tabla}")
+                ok = False
+            else:
+                self._stats[contador] += 1
+                logger.info(f"🧱 Esquema de {tabla} actualizado: {sentencia[:120]}")
+        return ok
+
+    @staticmethod
+    def _create_table(tabla: str, spec: Dict) -> str:
+        partes = [f"`{nombre}` {definicion}" for nombre, definicion in spec['columns'].items()]
+        if spec.get('primary_key'):
+            partes.append(f"PRIMARY KEY ({spec['primary_key']})")
+        for nombre, columnas, tipo in spec.get('indexes', []):
+            partes.append(f"{tipo} {nombre} ({columnas})")
+        return f"CREATE TABLE IF NOT EXISTS `{tabla}` ({', '.join(partes)}) {_TABLE_OPTIONS}"
+
+    @staticmethod
+    def _cambios(tabla: str, spec: Dict, columnas: set, indices: set) -> List[str]:
+        cambios = [
+            f"ADD COLUMN `{nombre}` {definicion}"
+            for nombre, definicion in spec['columns'].items()
+            if nombre.lower() not in columnas
+        ]
+        cambios += [
+            f"ADD {tipo} {nombre} ({cols})"
+            for nombre, cols, tipo in spec.get('indexes', [])
+            if (tabla, nombre) not in indices
+        ]
+        return cambios
+
+
+def _texto(valor) -> str:
+    """information_schema puede devolver bytes según la versión del conector"""
+    return valor.decode('utf-8') if isinstance(valor, (bytes, bytearray)) else valor
+
+
+# Esquema compartido por el proceso
+marketing_schema = SchemaRegistry(MARKETING_TABLES)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    resultado = marketing_schema.ensure(force=True)
+    print(f"{'✅' if resultado else '❌'} Esquema de marketing: {marketing_schema.stats()}")
@@ -1,98 +1,105 @@
 import json
 import logging
+from datetime import timedelta
 from flask import Blueprint, request, jsonify
 from db.mysql_connection import MySQLConnection
-from .stock_handler import ensure_table_exists # Importamos para reutilizarla
+from .schema import marketing_schema
+from .pagination import invalidate_counts, keyset_condition, page_info, parse_date, request_limit
+from .stock_ledger import GRUPOS, normalizar_cantidades, registrar_confirmacion
 
 logger = logging.getLogger(__name__)
 solicitudes_bp = Blueprint('solicitudes_bp', __name__, url_prefix='/api/marketing')
 
-# Definición de columnas para la tabla de confirmación de solicitudes
-# NOTA: La FK se define mejor directamente en el CREATE TABLE.
-# ensure_table_exists es simple y no maneja la adición de FKs complejas después de crear columnas.
-# Se recomienda que la FK exista en la BD o se ajuste ensure_table_exists si es crítico para esta función.
-solicitudes_conf_columns = {
-    "id": "INT AUTO_INCREMENT PRIMARY KEY",
-    "solicitud_id": "INT NOT NULL", # Referencia a inventario_solicitudes.id
-    "confirmador": "VARCHAR(255) NOT NULL",
-    "observaciones": "TEXT",
-    "productos": "JSON", # Productos finales aprobados y sus cantidades
-    "grupo": "VARCHAR(50)", # Para saber a qué inventario afectaría (kossodo/kossomet)
-    "timestamp": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
-    # Considerar añadir: FOREIGN KEY (solicitud_id) REFERENCES inventario_solicitudes(id)
-    # Esto se haría en la creación manual de la tabla o con una herramienta de migración.
-}
+# Campos que se pueden pedir con ?fields= (id y timestamp se devuelven siempre: forman el cursor)
+SOLICITUD_FIELDS = (
+    'id', 'solicitante', 'grupo', 'ruc', 'fecha_visita', 'cantidad_packs',
+    'productos', 'catalogos', 'timestamp', 'status'
+)
+
+
+def _decode_productos(row):
+    """productos (columna JSON) llega como texto: se entrega ya decodificado"""
+    valor = row.get('productos')
+    if isinstance(valor, (bytes, bytearray)):
+        valor = valor.decode('utf-8')
+    if isinstance(valor, str):
+        try:
+            row['productos'] = json.loads(valor)
+        except json.JSONDecodeError:
+            logger.warning(f"obtener_solicitudes: No se pudo decodificar JSON para productos en solicitud ID {row.get('id')}: {valor}")
+
 
 @solicitudes_bp.route('/solicitudes', methods=['GET'])
 def obtener_solicitudes():
     """
-    Recupera las solicitudes de inventario.
+    Recupera las solicitudes de inventario, de la más reciente a la más antigua,
+    paginadas por cursor sobre (timestamp, id).
     Parámetros opcionales:
       - status: filtra por estado ('pending', 'confirmed', etc.)
-      - id:    filtra por ID de solicitud
-    Ejemplo de llamada: GET /api/marketing/solicitudes?status=pending&id=5
+      - grupo:  filtra por grupo ('kossodo', 'kossomet')
+      - desde / hasta: rango de fechas de creación (YYYY-MM-DD, ambos inclusive)
+      - id:     filtra por ID de solicitud
+      - fields: campos a devolver separados por comas (por defecto todos)
+      - limit:  tamaño de página (por defecto 50, máximo 200)
+      - cursor: next_cursor de la página anterior
+    Respuesta: {records, limit, has_more, next_cursor}
+    Ejemplo de llamada: GET /api/marketing/solicitudes?status=pending&grupo=kossodo&limit=20
     """
-    db_ops = MySQLConnection()
-    conn = None
-    cursor = None
-
-    status_param = request.args.get('status')
-    id_param     = request.args.get('id')
-
+    fields_param = request.args.get('fields')
+    if fields_param:
+        campos = [c.strip() for c in fields_param.split(',') if c.strip()]
+        invalidos = [c for c in campos if c not in SOLICITUD_FIELDS]
+        if invalidos:
+            return jsonify({"error": f"Campos no válidos: {', '.join(invalidos)}"}), 400
+    else:
+        campos = list(SOLICITUD_FIELDS)
+    campos = ['id', 'timestamp'] + [c for c in campos if c not in ('id', 'timestamp')]
+
+    conditions = []
+    values = []
+    for columna in ('status', 'grupo', 'id'):
+        valor = request.args.get(columna)
+        if valor:
+            conditions.append(f"`{columna}` = %s")
+            values.append(valor)
+
+    limit = request_limit()
     try:
-        conn = db_ops._connect_internal()
-        if conn is None:
-            logger.error("obtener_solicitudes: Error de conexión a la base de datos")
-            return jsonify({"error": "Error de conexión a la base de datos"}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        base_query = "SELECT * FROM inventario_solicitudes"
-        conditions = []
-        values     = []
-
-        if status_param:
-            conditions.append("status = %s")
-            values.append(status_param)
-
-        if id_param:
-            conditions.append("id = %s")
-            values.append(id_param)
-
-        if conditions:
-            base_query += " WHERE " + " AND ".join(conditions)
+        desde = parse_date(request.args.get('desde'))
+        hasta = parse_date(request.args.get('hasta'))
+        if desde:
+            conditions.append("`timestamp` >= %s")
+            values.append(desde)
+        if hasta:
+            conditions.append("`timestamp` < %s")
+            values.append(hasta + timedelta(days=1))
+        cursor_param = request.args.get('cursor')
+        if cursor_param:
+            condicion, params = keyset_condition(cursor_param, '`timestamp`', 'id')
+            conditions.append(condicion)
+            values.extend(params)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    # Filtros y orden servidos por los índices (status|grupo, timestamp, id) declarados en schema.py
+    query = f"SELECT {', '.join(f'`{c}`' for c in campos)} FROM inventario_solicitudes"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY `timestamp` DESC, id DESC LIMIT %s"
+    values.append(limit + 1)
 
-        base_query += " ORDER BY timestamp DESC" # Ordenar por más reciente primero
-        
-        cursor.execute(base_query, tuple(values))
-        rows = cursor.fetchall()
+    db_ops = MySQLConnection()
+    rows = db_ops.execute_query(query, tuple(values))
+    if rows is None:
+        logger.error("obtener_solicitudes: Error de base de datos")
+        return jsonify({"error": "Error de conexión a la base de datos"}), 500
 
-        # Convertir JSON de 'productos' en objeto/lista Python
+    pagina = page_info(rows, limit, 'timestamp', 'id')
+    if 'productos' in campos:
         for row in rows:
-            if row.get('productos'):
-                try:
-                    row['productos'] = json.loads(row['productos'])
-                except json.JSONDecodeError:
-                    logger.warning(f"obtener_solicitudes: No se pudo decodificar JSON para productos en solicitud ID {row.get('id')}: {row['productos']}")
-                    # Mantener como string si no se puede parsear, o asignar None/lista vacía
-                    pass 
-
-        return jsonify(rows), 200
+            _decode_productos(row)
 
-    except Exception as e:
-        logger.error(f"Error al obtener solicitudes: {e}", exc_info=True)
-        return jsonify({"error": str(e)}), 500
-    finally:
-        if cursor:
-            try:
-                cursor.close()
-            except Exception as e_cursor:
-                logger.error(f"Error cerrando cursor en obtener_solicitudes: {e_cursor}")
-        if conn and conn.is_connected():
-            try:
-                conn.close()
-            except Exception as e_conn:
-                logger.error(f"Error cerrando conexión en obtener_solicitudes: {e_conn}")
+    return jsonify({'records': rows, **pagina}), 200
 
 
 @solicitudes_bp.route('/solicitudes/<int:solicitud_id>/confirm', methods=['PUT'])
@@ -101,7 +108,8 @@ def confirmar_solicitud(solicitud_id):
     Confirma una solicitud de inventario:
       - Valida que exista y esté en estado 'pending'.
       - Lee del JSON el confirmador, observaciones y el diccionario productos.
-      - Inserta en inventario_solicitudes_conf y actualiza el estado de la solicitud principal.
+      - Inserta en inventario_solicitudes_conf, actualiza el estado de la solicitud principal
+        y descuenta los productos del stock materializado (todo en una transacción).
     """
     data = request.get_json()
     if not data:
@@ -117,79 +125,68 @@ def confirmar_solicitud(solicitud_id):
         return jsonify({"error": "El campo 'productos' debe ser un objeto JSON (diccionario)."}), 400
 
 
-    db_ops = MySQLConnection()
-    conn = None
-    cursor = None
-
     try:
-        # Asegurar que la tabla de confirmaciones exista
-        ensure_table_exists("inventario_solicitudes_conf", solicitudes_conf_columns)
+        cantidades_finales = normalizar_cantidades(productos_finales)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
 
-        conn = db_ops._connect_internal()
-        if conn is None:
-            logger.error("confirmar_solicitud: Error de conexión a la base de datos")
-            return jsonify({"error": "Error de conexión a la base de datos"}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-
-        # 1) Verificar que la solicitud exista y esté pendiente
-        cursor.execute(
-            "SELECT status, grupo FROM inventario_solicitudes WHERE id = %s",
-            (solicitud_id,)
-        )
-        solicitud_original = cursor.fetchone()
-        if not solicitud_original:
-            conn.rollback() # No es necesario si no se han hecho cambios, pero buena práctica
-            return jsonify({"error": "La solicitud no existe."}), 404
-        if solicitud_original['status'] != 'pending':
-            conn.rollback()
-            return jsonify({
-                "error": f"La solicitud no está pendiente (estado actual: {solicitud_original['status']})."
-            }), 400
-
-        grupo_solicitud = solicitud_original['grupo']
-        productos_json_finales = json.dumps(productos_finales)
-
-        # 2) Insertar la confirmación
-        insert_sql_conf = """
-            INSERT INTO inventario_solicitudes_conf
-              (solicitud_id, confirmador, observaciones, productos, grupo)
-            VALUES (%s, %s, %s, %s, %s);
-        """
-        cursor.execute(insert_sql_conf, (
-            solicitud_id,
-            confirmador,
-            observaciones,
-            productos_json_finales,
-            grupo_solicitud
-        ))
-
-        # 3) Actualizar el estado de la solicitud original
-        cursor.execute(
-            "UPDATE inventario_solicitudes SET status = 'confirmed' WHERE id = %s",
-            (solicitud_id,)
-        )
+    db_ops = MySQLConnection()
 
-        conn.commit()
+    try:
+        # Esquema verificado al arrancar: sin consultas a la BD en este punto
+        if not marketing_schema.require():
+            logger.error("confirmar_solicitud: Esquema de marketing no verificado")
+            return jsonify({"error": "Servicio no disponible: no se pudo verificar el esquema de la base de datos. Intente nuevamente en unos minutos."}), 503
+
+        # Confirmación, cambio de estado y descuento de stock en una sola transacción
+        with db_ops.transaction() as tx:
+            # 1) Verificar que la solicitud exista y esté pendiente (bloqueada hasta el commit)
+            solicitud_original = tx.fetch_one(
+                "SELECT status, grupo FROM inventario_solicitudes WHERE id = %s FOR UPDATE",
+                (solicitud_id,)
+            )
+            if not solicitud_original:
+                return jsonify({"error": "La solicitud no existe."}), 404
+            if solicitud_original['status'] != 'pending':
+                return jsonify({
+                    "error": f"La solicitud no está pendiente (estado actual: {solicitud_original['status']})."
+                }), 400
+
+            grupo_solicitud = solicitud_original['grupo']
+            productos_json_finales = json.dumps(productos_finales)
+
+            # 2) Insertar la confirmación
+            insert_sql_conf = """
+                INSERT INTO inventario_solicitudes_conf
+                  (solicitud_id, confirmador, observaciones, productos, grupo)
+                VALUES (%s, %s, %s, %s, %s);
+            """
+            confirmacion = tx.execute(insert_sql_conf, (
+                solicitud_id,
+                confirmador,
+                observaciones,
+                productos_json_finales,
+                grupo_solicitud
+            ), fetch=False)
+
+            # 3) Actualizar el estado de la solicitud original
+            tx.execute(
+                "UPDATE inventario_solicitudes SET status = 'confirmed' WHERE id = %s",
+                (solicitud_id,),
+                fetch=False
+            )
+
+            # 4) Registrar la salida de productos y descontarla del stock materializado
+            if grupo_solicitud in GRUPOS:
+                registrar_confirmacion(tx, grupo_solicitud, cantidades_finales, confirmacion['last_insert_id'])
+
+        # Una confirmación más en el historial
+        invalidate_counts()
         return jsonify({"message": "Solicitud confirmada exitosamente"}), 200
 
     except Exception as e:
-        if conn:
-            conn.rollback()
         logger.error(f"Error en confirmación de solicitud ID {solicitud_id}: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
-    finally:
-        if cursor:
-            try:
-                cursor.close()
-            except Exception as e_cursor:
-                logger.error(f"Error cerrando cursor en confirmar_solicitud: {e_cursor}")
-
-        if conn and conn.is_connected():
-            try:
-                conn.close()
-            except Exception as e_conn:
-                logger.error(f"Error cerrando conexión en confirmar_solicitud: {e_conn}") 
 
 @solicitudes_bp.route('/solicitudes/<int:solicitud_id>', methods=['DELETE'])
 def cancelar_solicitud(solicitud_id):
@@ -8,7 +8,12 @@ import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from typing import List, Dict, Any # Para type hints
-from .utils import ensure_column_exists # <-- Importar la nueva utilidad
+from . import movements
+from .schema import marketing_schema
+from .stock_ledger import (
+    validar_grupo, validar_producto, normalizar_cantidades, leer_stock, asegurar_stock,
+    productos_registrados, registrar_alta, registrar_ingreso
+)
 
 logger = logging.getLogger(__name__)
 stock_bp = Blueprint('stock_bp', __name__, url_prefix='/api/marketing')
@@ -16,100 +21,15 @@ stock_bp = Blueprint('stock_bp', __name__, url_prefix='/api/marketing')
 
 def calculate_stock(grupo: str) -> dict:
     """
-    Calcula el stock disponible para un grupo ('kossodo' o 'kossomet').
+    Devuelve el stock disponible para un grupo ('kossodo' o 'kossomet').
+    Lee la tabla materializada inventario_stock (ver stock_ledger).
     """
-    if grupo not in ['kossodo', 'kossomet']:
-        raise ValueError("Grupo inválido. Use 'kossodo' o 'kossomet'.")
-
-    inventario_table = f"inventario_merch_{grupo}"
-    
-    db_ops = MySQLConnection() # Renombrado para claridad, sigue siendo tu clase
-    conn = None # Inicializar conn
-    cursor = None # Inicializar cursor
-
-    try:
-        conn = db_ops._connect_internal() # Usar el método interno para obtener la conexión
-
-        if conn is None:
-            logger.error("Error de conexión a la base de datos al calcular stock")
-            return {"error": "Error de conexión a la base de datos"}
-
-        cursor = conn.cursor(dictionary=True)
-        
-        # 1) Obtener columnas merch_
-        cursor.execute(
-            """
-            SELECT COLUMN_NAME
-            FROM information_schema.COLUMNS
-            WHERE TABLE_SCHEMA = DATABASE()
-              AND TABLE_NAME = %s
-              AND COLUMN_NAME LIKE 'merch\\_%' # Escapar la barra invertida para la query SQL
-            """,
-            (inventario_table,)
-        )
-        cols_result = cursor.fetchall()
-        if not cols_result:
-            logger.warning(f"No se encontraron columnas 'merch_' en la tabla {inventario_table}")
-            return {"error": f"No se encontraron columnas 'merch_' en la tabla {inventario_table}"}
-        cols = [r['COLUMN_NAME'] for r in cols_result]
-
-
-        # 2) Sumar totales en inventario
-        inventory_totals = {}
-        for col in cols:
-            # Asegurarse de que la columna existe antes de sumar
-            cursor.execute(f"SELECT SUM(`{col}`) AS total FROM {inventario_table}")
-            total_result = cursor.fetchone()
-            total = total_result.get('total') if total_result else 0
-            inventory_totals[col] = total or 0
-
-
-        # 3) Restar productos confirmados
-        request_totals = {col: 0 for col in cols}
-        # Asegurarse de que la tabla inventario_solicitudes_conf existe
-        cursor.execute("SHOW TABLES LIKE 'inventario_solicitudes_conf'")
-        if cursor.fetchone():
-            cursor.execute(
-                "SELECT productos FROM inventario_solicitudes_conf WHERE grupo = %s",
-                (grupo,)
-            )
-            for row in cursor.fetchall():
-                try:
-                    productos_str = row.get('productos')
-                    if productos_str: # Verificar que no sea None o vacío
-                        productos_dict = json.loads(productos_str)
-                        for prod, qty in productos_dict.items():
-                            if prod in request_totals:
-                                request_totals[prod] += int(qty) # Asegurar que qty sea entero
-                    else:
-                        logger.info(f"Fila con productos vacíos o None para grupo {grupo}")
-                except json.JSONDecodeError as e:
-                    logger.error(f"Error decodificando JSON de productos: {productos_str}. Error: {e}")
-                except Exception as e:
-                    logger.error(f"Error procesando fila de productos: {row}. Error: {e}")
-        else:
-            logger.warning("La tabla 'inventario_solicitudes_conf' no existe. Omitiendo resta de solicitudes.")
-
-
-        # 4) Calcular stock disponible
-        stock = {col: inventory_totals.get(col, 0) - request_totals.get(col, 0) for col in cols}
-        return stock
-
-    except Exception as e:
-        logger.error(f"Error calculando stock para {grupo}: {e}", exc_info=True)
-        return {"error": str(e)}
-    finally:
-        if cursor:
-            try:
-                cursor.close()
-            except Exception as e_cursor_close:
-                logger.error(f"Error cerrando cursor: {e_cursor_close}")
-        if conn and conn.is_connected(): # Asegurarse de que la conexión exista y esté abierta
-            try:
-                conn.close()
-                logger.debug(f"Conexión cerrada para calculate_stock grupo {grupo}")
-            except Exception as e_conn_close:
-                logger.error(f"Error cerrando conexión: {e_conn_close}")
+    validar_grupo(grupo)
+    stock = leer_stock(grupo)
+    if stock is None:
+        logger.error(f"Error leyendo el stock materializado de {grupo}")
+        return {"error": "Error de conexión a la base de datos"}
+    return stock
 
 
 @stock_bp.route('/stock', methods=['GET']) # Ruta simplificada ya que el prefijo está en el Blueprint
@@ -138,46 +58,6 @@ def obtener_stock():
         logger.error(f"Excepción inesperada en obtener_stock para grupo {grupo}: {e}", exc_info=True)
         return jsonify({"error": "Ocurrió un error inesperado al obtener el stock."}), 500 
 
-# Definición de columnas para la tabla de solicitudes (debe coincidir con tu BD)
-# Esto es un ejemplo, ajústalo a tu esquema real.
-solicitud_columns = {
-    "id": "INT AUTO_INCREMENT PRIMARY KEY",
-    "solicitante": "VARCHAR(255) NOT NULL",
-    "grupo": "VARCHAR(50) NOT NULL",
-    "ruc": "VARCHAR(20) NOT NULL",
-    "fecha_visita": "DATE NOT NULL",
-    "cantidad_packs": "INT DEFAULT 0",
-    "productos": "JSON",
-    "catalogos": "TEXT",
-    "timestamp": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
-    "status": "VARCHAR(50) DEFAULT 'pending'"
-}
-
-def ensure_table_exists(table_name: str, columns_definition: dict):
-    """
-    Asegura que una tabla exista en la base de datos. Si no, la crea.
-    Esta es una función de utilidad y podría vivir en un módulo de BD más general.
-    ADVERTENCIA: Esta implementación es básica y puede necesitar ajustes para producción.
-    """
-    db_ops = MySQLConnection()
-    # Verificar si la tabla existe
-    # Nota: information_schema.TABLES es más estándar pero SHOW TABLES es más simple aquí.
-    check_table_query = f"SHOW TABLES LIKE '{table_name}'"
-    result = db_ops.execute_query(check_table_query)
-
-    if not result:
-        logger.info(f"La tabla '{table_name}' no existe. Creándola...")
-        cols_str = ", ".join([f"`{col_name}` {col_type}" for col_name, col_type in columns_definition.items()])
-        create_table_query = f"CREATE TABLE {table_name} ({cols_str})"
-        try:
-            db_ops.execute_query(create_table_query, fetch=False) # fetch=False para DDL
-            logger.info(f"Tabla '{table_name}' creada exitosamente.")
-        except Exception as e_create:
-            logger.error(f"Error al crear la tabla '{table_name}': {e_create}")
-            # Podrías querer relanzar el error o manejarlo de forma más específica
-    # else:
-        # logger.debug(f"La tabla '{table_name}' ya existe.")
-
 def generate_email_template(data: Dict[str, Any]) -> str:
     """
     Generate HTML template for email notifications
@@ -407,7 +287,9 @@ def crear_solicitud():
     cursor = None
     
     try:
-        ensure_table_exists("inventario_solicitudes", solicitud_columns)
+        if not marketing_schema.require():
+            logger.error("crear_solicitud: Esquema de marketing no verificado")
+            return jsonify({"error": "Servicio no disponible: no se pudo verificar el esquema de la base de datos. Intente nuevamente en unos minutos."}), 503
         
         conn = db_ops._connect_internal()
         if conn is None:
@@ -485,6 +367,7 @@ def obtener_inventario_completo(): # Renombrado para evitar colisión con un pos
     """
     Parámetros: ?tabla=kossodo|kossomet
     Devuelve todos los registros de inventario ordenados por timestamp.
+    Cada registro lleva una clave merch_ por producto del grupo (0 si no ingresó ese producto).
     """
     tabla = request.args.get('tabla')
     if tabla not in ['kossodo', 'kossomet']:
@@ -492,28 +375,20 @@ def obtener_inventario_completo(): # Renombrado para evitar colisión con un pos
     table_name = f"inventario_merch_{tabla}"
 
     db_ops = MySQLConnection()
-    conn = None
-    cursor = None
-    try:
-        conn = db_ops._connect_internal()
-        if conn is None:
-            logger.error(f"obtener_inventario_completo: Error de conexión a la base de datos para {table_name}")
-            return jsonify({"error": "Error de conexión a la base de datos"}), 500
-
-        cursor = conn.cursor(dictionary=True)
-        # Asegurar que la tabla exista (opcional, pero bueno para robustez)
-        # Podrías tener una función ensure_table_exists similar a ensure_column_exists
-        cursor.execute(f"SELECT * FROM `{table_name}` ORDER BY timestamp DESC;") # Usar backticks para el nombre de tabla
-        registros = cursor.fetchall()
-        return jsonify(registros), 200
-    except Exception as e:
-        logger.error(f"Error al obtener inventario de {table_name}: {e}", exc_info=True)
-        return jsonify({"error": str(e)}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+    registros = db_ops.execute_query(
+        f"SELECT id, responsable, observaciones, `timestamp` FROM `{table_name}` ORDER BY `timestamp` DESC"
+    )
+    cantidades = movements.ingresos_por_registro(db_ops, tabla)
+    productos = leer_stock(tabla, db_ops)
+    if registros is None or cantidades is None or productos is None:
+        logger.error(f"obtener_inventario_completo: Error de base de datos para {table_name}")
+        return jsonify({"error": "Error de conexión a la base de datos"}), 500
+
+    vacios = {producto: 0 for producto in sorted(productos)}
+    for registro in registros:
+        registro.update(vacios)
+        registro.update(cantidades.get(registro['id'], {}))
+    return jsonify(registros), 200
 
 
 # Endpoint para agregar un nuevo registro de inventario
@@ -522,6 +397,7 @@ def agregar_inventario():
     """
     Parámetros: ?tabla=kossodo|kossomet
     Body JSON con campos 'responsable', 'observaciones' y cualquiera que empiece con 'merch_'.
+    La cabecera se guarda en inventario_merch_<tabla> y las cantidades como movimientos.
     """
     tabla = request.args.get('tabla')
     if tabla not in ['kossodo', 'kossomet']:
@@ -529,52 +405,53 @@ def agregar_inventario():
     table_name = f"inventario_merch_{tabla}"
     data = request.get_json() or {}
 
-    columnas = []
-    valores = []
-    for key, val in data.items():
-        if key in ['responsable', 'observaciones'] or key.startswith('merch_'):
-            columnas.append(key)
-            valores.append(val)
+    columnas = [key for key in ('responsable', 'observaciones') if key in data]
+    valores = [data[key] for key in columnas]
+    productos = {key: val for key, val in data.items() if key.startswith('merch_')}
 
-    if not columnas:
+    if not columnas and not productos:
         return jsonify({"error": "No se han enviado campos válidos para insertar."}), 400
 
+    try:
+        ingresos = normalizar_cantidades(productos)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
     placeholders = ", ".join(["%s"] * len(valores))
     cols_str = ", ".join([f"`{c}`" for c in columnas]) # Usar backticks para nombres de columna
     query = f"INSERT INTO `{table_name}` ({cols_str}) VALUES ({placeholders});" # Usar backticks para nombre de tabla
 
     db_ops = MySQLConnection()
-    conn = None
-    cursor = None
+    # Sin stock materializado no se sabe qué productos están registrados
+    if not asegurar_stock(tabla, db_ops):
+        logger.error(f"agregar_inventario: Stock de {tabla} no disponible")
+        return jsonify({"error": f"Servicio no disponible: no se pudo preparar el stock de {tabla}. Intente nuevamente en unos minutos."}), 503
     try:
-        conn = db_ops._connect_internal()
-        if conn is None:
-            logger.error(f"agregar_inventario: Error de conexión a la base de datos para {table_name}")
-            return jsonify({"error": "Error de conexión a la base de datos"}), 500
-
-        cursor = conn.cursor()
-        cursor.execute(query, tuple(valores))
-        conn.commit()
-        return jsonify({"message": "Registro agregado exitosamente", "id": cursor.lastrowid}), 201
+        # Cabecera, movimientos y stock materializado se confirman juntos
+        with db_ops.transaction() as tx:
+            desconocidos = set(ingresos) - productos_registrados(tx, tabla, ingresos)
+            if desconocidos:
+                return jsonify({
+                    "error": f"Productos no registrados en {tabla}: {', '.join(sorted(desconocidos))}. "
+                             f"Créelos primero con /nuevo_producto."
+                }), 400
+            registro_id = tx.execute(query, tuple(valores), fetch=False)['last_insert_id']
+            registrar_ingreso(tx, tabla, ingresos, registro_id)
+        return jsonify({"message": "Registro agregado exitosamente", "id": registro_id}), 201
     except Exception as e:
-        if conn: conn.rollback()
         logger.error(f"Error al agregar inventario en {table_name}: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
 
 
-# Endpoint para añadir un nuevo producto al inventario (nueva columna)
+# Endpoint para añadir un nuevo producto al inventario
 @stock_bp.route('/nuevo_producto', methods=['POST'])
 def nuevo_producto():
     """
-    Añade una nueva columna de producto al inventario y crea un registro inicial si se provee cantidad.
+    Da de alta un producto en el inventario del grupo y crea un registro inicial si se provee cantidad.
+    El alta es un movimiento más (INSERT), no una columna nueva.
     Body JSON con:
       - grupo: 'kossodo' o 'kossomet'
-      - columna: nombre de la nueva columna (p.ej. 'merch_nuevo_item')
+      - columna: nombre del producto (p.ej. 'merch_nuevo_item')
       - cantidad: cantidad inicial (int, opcional, por defecto no se inserta si es None o no presente)
       - responsable: (string, opcional para el registro inicial)
     """
@@ -584,59 +461,44 @@ def nuevo_producto():
     cantidad = data.get('cantidad') # Puede ser None
     responsable = data.get('responsable') # Opcional
 
-    if grupo not in ['kossodo', 'kossomet'] or not columna_nombre_base or not columna_nombre_base.startswith('merch_'):
+    if grupo not in ['kossodo', 'kossomet'] or not columna_nombre_base:
         return jsonify({"error": "Datos inválidos: grupo incorrecto o nombre de columna no válido (debe empezar con 'merch_')."}), 400
 
-    table_name = f"inventario_merch_{grupo}"
-
-    # Definición de la nueva columna. Podría ser más configurable.
-    column_definition = "INT DEFAULT 0"
+    try:
+        validar_producto(columna_nombre_base)
+        cantidad_inicial = normalizar_cantidades({columna_nombre_base: cantidad})[columna_nombre_base]
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
 
-    if not ensure_column_exists(table_name, columna_nombre_base, column_definition):
-        return jsonify({"error": f"No se pudo crear o verificar la columna '{columna_nombre_base}' en '{table_name}'."}), 500
+    table_name = f"inventario_merch_{grupo}"
 
-    # Si se proporciona una cantidad, se inserta un registro inicial.
-    # Esto es opcional, la columna ya está creada.
-    if cantidad is not None:
-        db_ops = MySQLConnection()
-        conn = None
-        cursor = None
-        try:
-            conn = db_ops._connect_internal()
-            if conn is None:
-                logger.error(f"nuevo_producto: Error de conexión para registro inicial en {table_name}")
-                return jsonify({"error": "Error de conexión para registro inicial"}), 500
-            
-            cursor = conn.cursor()
-            insert_cols = [f"`{columna_nombre_base}`"]
-            insert_vals = [cantidad]
-            placeholders = ["%s"]
-
-            if responsable:
-                insert_cols.append("`responsable`")
-                insert_vals.append(responsable)
-                placeholders.append("%s")
-            
-            cols_str = ", ".join(insert_cols)
-            placeholders_str = ", ".join(placeholders)
-            
-            # Asumiendo que la tabla tiene `timestamp` que se actualiza automáticamente
-            insert_query = f"INSERT INTO `{table_name}` ({cols_str}) VALUES ({placeholders_str});"
-            
-            cursor.execute(insert_query, tuple(insert_vals))
-            conn.commit()
-            return jsonify({
-                "message": f"Nuevo producto '{columna_nombre_base}' agregado y registro inicial creado con ID: {cursor.lastrowid}",
-                "id": cursor.lastrowid
-            }), 201
-        except Exception as e:
-            if conn: conn.rollback()
-            logger.error(f"Error al crear registro inicial para nuevo producto '{columna_nombre_base}' en {table_name}: {e}", exc_info=True)
-            # La columna fue creada, pero el registro inicial falló. Informar esto podría ser útil.
-            return jsonify({"error": f"Columna creada, pero falló el registro inicial: {str(e)}"}), 500
-        finally:
-            if cursor: cursor.close()
-            if conn and conn.is_connected(): conn.close()
-    else:
-        # Si no se proporciona cantidad, solo se confirma la creación de la columna (hecho por ensure_column_exists)
-        return jsonify({"message": f"Columna '{columna_nombre_base}' asegurada/creada en '{table_name}'. No se creó registro inicial."}), 200 
\ No newline at end of file
+    db_ops = MySQLConnection()
+    try:
+        with db_ops.transaction() as tx:
+            registrar_alta(tx, grupo, columna_nombre_base)
+
+            # Si se proporciona una cantidad, se inserta un registro inicial.
+            registro_id = None
+            if cantidad is not None:
+                insert_cols = []
+                insert_vals = []
+                if responsable:
+                    insert_cols.append("`responsable`")
+                    insert_vals.append(responsable)
+                cols_str = ", ".join(insert_cols)
+                placeholders_str = ", ".join(["%s"] * len(insert_vals))
+
+                # Asumiendo que la tabla tiene `timestamp` que se actualiza automáticamente
+                insert_query = f"INSERT INTO `{table_name}` ({cols_str}) VALUES ({placeholders_str});"
+                registro_id = tx.execute(insert_query, tuple(insert_vals), fetch=False)['last_insert_id']
+                registrar_ingreso(tx, grupo, {columna_nombre_base: cantidad_inicial}, registro_id)
+    except Exception as e:
+        logger.error(f"Error al dar de alta el producto '{columna_nombre_base}' en {grupo}: {e}", exc_info=True)
+        return jsonify({"error": f"No se pudo registrar el producto: {str(e)}"}), 500
+
+    if registro_id is not None:
+        return jsonify({
+            "message": f"Nuevo producto '{columna_nombre_base}' agregado y registro inicial creado con ID: {registro_id}",
+            "id": registro_id
+        }), 201
+    return jsonify({"message": f"Producto '{columna_nombre_base}' registrado en {grupo}. No se creó registro inicial."}), 200
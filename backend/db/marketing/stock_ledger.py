@@ -0,0 +1,253 @@
+"""
+Stock materializado de merchandising por grupo.
+
+La tabla inventario_stock guarda el stock disponible de cada (grupo, producto)
+y se actualiza en la misma transacción que el movimiento que lo cambia
+(inventory_movements, ver movements.py):
+- agregar_inventario / nuevo_producto: registrar_ingreso / registrar_alta.
+- confirmar_solicitud: registrar_confirmacion.
+
+Así /api/marketing/stock es una sola lectura por clave primaria. Las filas de
+inventario_stock son además el catálogo de productos de cada grupo.
+reconstruir_stock() recalcula la tabla con SUM(delta) ... GROUP BY producto;
+se ejecuta al arrancar si un grupo no tiene filas y a mano con:
+
+    python -m db.marketing.stock_ledger rebuild [--grupo kossodo|kossomet]
+
+La migración única desde las columnas merch_ y los JSON de confirmaciones:
+
+    python -m db.marketing.stock_ledger migrate [--grupo kossodo|kossomet]
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+from db.mysql_connection import MySQLConnection
+from . import movements
+from .schema import marketing_schema
+
+logger = logging.getLogger(__name__)
+
+GRUPOS = ('kossodo', 'kossomet')
+
+GET_STOCK = "SELECT producto, cantidad FROM inventario_stock WHERE grupo = %s"
+
+SUMAR_STOCK = """
+INSERT INTO inventario_stock (grupo, producto, cantidad) VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad)
+"""
+
+# Solo productos conocidos: lo confirmado que no es un producto del inventario no cuenta
+DESCONTAR_STOCK = "UPDATE inventario_stock SET cantidad = cantidad - %s WHERE grupo = %s AND producto = %s"
+
+_PRODUCTO = re.compile(r'^merch_[A-Za-z0-9_]{1,58}$')
+
+STOCK_LEDGER_CONFIG = {
+    # Espera tras un fallo al preparar un grupo vacío; se duplica en cada fallo hasta el máximo
+    'retry_seconds': float(os.getenv('MARKETING_STOCK_RETRY_SECONDS', 5)),
+    'max_retry_seconds': float(os.getenv('MARKETING_STOCK_MAX_RETRY_SECONDS', 300)),
+}
+
+# Grupos con stock materializado en este proceso (encontrado o reconstruido): no se vuelve a comprobar
+_preparados = set()
+# Grupos cuya preparación falló: grupo -> (fallos seguidos, instante del próximo intento)
+_fallos: Dict[str, tuple] = {}
+_reconstruir_lock = threading.Lock()
+
+
+def validar_grupo(grupo: str):
+    if grupo not in GRUPOS:
+        raise ValueError("Grupo inválido. Use 'kossodo' o 'kossomet'.")
+
+
+def validar_producto(producto: str):
+    """Nombres de producto: 'merch_' + letras, números o '_' (máx. 64 caracteres)"""
+    if not isinstance(producto, str) or not _PRODUCTO.match(producto):
+        raise ValueError(f"Nombre de producto inválido: {producto} (debe empezar con 'merch_')")
+
+
+def normalizar_cantidades(productos: Dict) -> Dict[str, int]:
+    """{producto: cantidad} con cantidades enteras; ValueError si alguna no es numérica"""
+    cantidades = {}
+    for producto, cantidad in (productos or {}).items():
+        try:
+            cantidades[producto] = int(cantidad or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"Cantidad inválida para '{producto}': {cantidad}")
+    return cantidades
+
+
+# ==========================================
+# ACTUALIZACIÓN (dentro de la transacción del movimiento)
+# ==========================================
+
+def sumar_stock(tx, grupo: str, cantidades: Dict[str, int]):
+    """Suma cantidades al stock del grupo; crea la fila del producto si no existe"""
+    # Orden por producto: transacciones concurrentes bloquean las filas en el mismo orden
+    filas = [(grupo, producto, cantidad) for producto, cantidad in sorted(cantidades.items())]
+    tx.execute_many(SUMAR_STOCK, filas)
+
+
+def descontar_stock(tx, grupo: str, cantidades: Dict[str, int]):
+    """Resta cantidades confirmadas del stock del grupo"""
+    filas = [(cantidad, grupo, producto) for producto, cantidad in sorted(cantidades.items()) if cantidad]
+    tx.execute_many(DESCONTAR_STOCK, filas)
+
+
+def productos_registrados(tx, grupo: str, productos: Iterable[str]) -> Set[str]:
+    """Cuáles de `productos` existen en el grupo (bloquea sus filas hasta el commit)"""
+    productos = sorted(set(productos))
+    if not productos:
+        return set()
+    marcadores = ", ".join(["%s"] * len(productos))
+    filas = tx.execute(
+        f"SELECT producto FROM inventario_stock WHERE grupo = %s AND producto IN ({marcadores}) FOR UPDATE",
+        (grupo, *productos)
+    )
+    return {fila['producto'] for fila in filas}
+
+
+def registrar_alta(tx, grupo: str, producto: str):
+    """Da de alta un producto en el grupo (sin cantidad)"""
+    validar_producto(producto)
+    movements.registrar_movimientos(tx, grupo, {producto: 0}, movements.ALTA)
+    sumar_stock(tx, grupo, {producto: 0})
+
+
+def registrar_ingreso(tx, grupo: str, cantidades: Dict[str, int], registro_id: int):
+    """Ingreso de mercadería del registro `registro_id` de inventario_merch_<grupo>"""
+    cantidades = {p: q for p, q in cantidades.items() if q}
+    movements.registrar_movimientos(tx, grupo, cantidades, movements.INGRESO, registro_id)
+    sumar_stock(tx, grupo, cantidades)
+
+
+def registrar_confirmacion(tx, grupo: str, cantidades: Dict[str, int], confirmacion_id: int):
+    """Salida de los productos confirmados; los que no son productos del grupo se ignoran"""
+    conocidos = productos_registrados(tx, grupo, cantidades)
+    entregados = {p: q for p, q in cantidades.items() if p in conocidos}
+    movements.registrar_movimientos(tx, grupo, entregados, movements.CONFIRMACION, confirmacion_id, signo=-1)
+    descontar_stock(tx, grupo, entregados)
+
+
+# ==========================================
+# LECTURA
+# ==========================================
+
+def leer_stock(grupo: str, db_ops: Optional[MySQLConnection] = None) -> Optional[Dict[str, int]]:
+    """
+    Stock disponible {producto: cantidad} del grupo.
+    Devuelve None si la consulta falla. Si el grupo aún no tiene filas se
+    reconstruye desde los movimientos (migrándolos antes si hace falta); si
+    eso falla devuelve None y lo reintenta con espera creciente.
+    """
+    validar_grupo(grupo)
+    db_ops = db_ops or MySQLConnection()
+    filas = db_ops.execute_query(GET_STOCK, (grupo,))
+    if filas is None:
+        return None
+    if filas or grupo in _preparados:
+        _preparados.add(grupo)
+        return {fila['producto']: int(fila['cantidad']) for fila in filas}
+    return _preparar_con_reintento(grupo, db_ops)
+
+
+def asegurar_stock(grupo: str, db_ops: Optional[MySQLConnection] = None) -> bool:
+    """True si el stock materializado del grupo está listo (lo prepara si hace falta)"""
+    return grupo in _preparados or leer_stock(grupo, db_ops) is not None
+
+
+def _preparar_con_reintento(grupo: str, db_ops: MySQLConnection) -> Optional[Dict[str, int]]:
+    with _reconstruir_lock:
+        if grupo in _preparados:
+            # Otro hilo lo preparó mientras se esperaba el lock
+            filas = db_ops.execute_query(GET_STOCK, (grupo,))
+            return None if filas is None else {fila['producto']: int(fila['cantidad']) for fila in filas}
+
+        fallos, siguiente_intento = _fallos.get(grupo, (0, 0.0))
+        if time.monotonic() < siguiente_intento:
+            return None
+        try:
+            stock = _preparar_grupo(grupo, db_ops)
+        except Exception as e:
+            fallos += 1
+            espera = min(STOCK_LEDGER_CONFIG['retry_seconds'] * 2 ** (fallos - 1),
+                         STOCK_LEDGER_CONFIG['max_retry_seconds'])
+            _fallos[grupo] = (fallos, time.monotonic() + espera)
+            logger.error(f"❌ Error reconstruyendo stock de {grupo} (reintento en {espera:.0f}s): {e}", exc_info=True)
+            return None
+        _fallos.pop(grupo, None)
+        _preparados.add(grupo)
+        return stock
+
+
+# ==========================================
+# RECONSTRUCCIÓN DESDE LOS MOVIMIENTOS
+# ==========================================
+
+def reconstruir_stock(grupo: str, db_ops: Optional[MySQLConnection] = None) -> Dict[str, int]:
+    """
+    Recalcula inventario_stock del grupo desde inventory_movements, en una transacción.
+
+    Primero bloquea las filas del grupo (FOR UPDATE): los movimientos en curso
+    terminan antes de sumar y los siguientes esperan a que acabe la
+    reconstrucción, así ningún movimiento se pierde ni se cuenta dos veces.
+    """
+    validar_grupo(grupo)
+    db_ops = db_ops or MySQLConnection()
+    with db_ops.transaction() as tx:
+        tx.execute("SELECT producto FROM inventario_stock WHERE grupo = %s FOR UPDATE", (grupo,))
+        stock = movements.stock_por_producto(tx, grupo)
+        tx.execute("DELETE FROM inventario_stock WHERE grupo = %s", (grupo,), fetch=False)
+        sumar_stock(tx, grupo, stock)
+    logger.info(f"📦 Stock de {grupo} reconstruido: {len(stock)} productos")
+    return stock
+
+
+def migrar_grupo(grupo: str, db_ops: Optional[MySQLConnection] = None) -> Dict[str, int]:
+    """Migra el historial ancho del grupo a inventory_movements y reconstruye su stock"""
+    validar_grupo(grupo)
+    db_ops = db_ops or MySQLConnection()
+    with db_ops.transaction() as tx:
+        movements.migrar_tablas_anchas(tx, grupo)
+    return reconstruir_stock(grupo, db_ops)
+
+
+def _preparar_grupo(grupo: str, db_ops: MySQLConnection) -> Dict[str, int]:
+    """Grupo sin stock materializado: migra si aún no tiene movimientos y reconstruye"""
+    if not movements.tiene_movimientos(db_ops, grupo):
+        return migrar_grupo(grupo, db_ops)
+    return reconstruir_stock(grupo, db_ops)
+
+
+def init_stock_ledger(db_ops: Optional[MySQLConnection] = None) -> bool:
+    """Verifica el esquema de marketing y prepara los grupos que aún no tienen stock"""
+    if not marketing_schema.ensure():
+        logger.error("❌ No se pudo verificar el esquema de marketing")
+        return False
+    db_ops = db_ops or MySQLConnection()
+    for grupo in GRUPOS:
+        leer_stock(grupo, db_ops)
+    return True
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Stock materializado de merchandising')
+    parser.add_argument('accion', choices=['rebuild', 'migrate'],
+                        help='rebuild: recalcular desde los movimientos; '
+                             'migrate: copiar el historial de las columnas merch_ y recalcular')
+    parser.add_argument('--grupo', choices=GRUPOS, help='Grupo a procesar (por defecto, todos)')
+    args = parser.parse_args()
+
+    db = MySQLConnection()
+    marketing_schema.ensure()
+    for g in ([args.grupo] if args.grupo else GRUPOS):
+        resultado = migrar_grupo(g, db) if args.accion == 'migrate' else reconstruir_stock(g, db)
+        print(f"✅ {g}: {json.dumps(resultado, ensure_ascii=False)}")
@@ -2,16 +2,19 @@
 Módulo para gestionar conexiones a MySQL.
 Proporciona funciones para conectar, ejecutar consultas y manejar transacciones.
 """
+import re
+from contextlib import contextmanager
 import mysql.connector
 from mysql.connector import Error
 # import threading # Eliminado
 # import traceback # Descomentar para debug más profundo si es necesario
 from .config import get_db_config
+from .connection_pool import get_pool, get_pool_stats
 
 class MySQLConnection:
     """
     Clase para manejar conexiones a MySQL. Cada ejecución de consulta
-    establecerá y cerrará su propia conexión.
+    toma una conexión del pool del proceso y la devuelve al terminar.
     """
     
     def __init__(self):
@@ -20,19 +23,52 @@ class MySQLConnection:
         # No se guarda estado de conexión ni lock aquí
     
     def _connect_internal(self):
-        """Intenta establecer una nueva conexión y la devuelve."""
+        """
+        Obtiene una conexión del pool y la devuelve.
+        Llamar a close() sobre ella la devuelve al pool en lugar de cerrarla.
+        """
         try:
-            # print("MySQL Connection: _connect_internal() - Intentando nueva conexión.")
-            conn = mysql.connector.connect(**self.config)
-            # print("MySQL Connection: _connect_internal() - Nueva conexión establecida.")
-            return conn
+            return get_pool().acquire()
         except Error as e_connect:
             print(f"MySQL Connection: _connect_internal() - Error CRÍTICO al conectar: {e_connect}")
             return None
 
+    @staticmethod
+    def pool_stats():
+        """Estadísticas del pool de conexiones (hits, misses, esperas)."""
+        return get_pool_stats()
+
     # get_connection() y disconnect() explícitos ya no son necesarios con este modelo
     # ya que cada execute_query/many maneja su ciclo de vida de conexión.
 
+    @contextmanager
+    def transaction(self):
+        """
+        Abre una unidad de trabajo: una sola conexión del pool, muchas sentencias
+        y un único commit al salir del bloque (rollback si se lanza una excepción).
+
+        A diferencia de execute_query, los errores MySQL se propagan al llamador
+        para que el bloque completo se revierta.
+
+        Ejemplo:
+            with db_ops.transaction() as tx:
+                doc = tx.execute(INSERT_DOCUMENT, params, fetch=False)
+                tx.execute_many(ADD_TAG_TO_DOCUMENT, [(doc['last_insert_id'], t) for t in tags])
+        """
+        conn = self._connect_internal()
+        if not conn:
+            raise Error(msg="MySQLConnection: transaction() - FALLO al obtener conexión")
+        tx = MySQLTransaction(conn)
+        try:
+            conn.start_transaction()
+            yield tx
+            tx.commit()
+        except BaseException:
+            tx.rollback()
+            raise
+        finally:
+            tx._close()
+
     def execute_query(self, query, params=None, fetch=True):
         conn = None
         cursor = None
@@ -71,9 +107,9 @@ class MySQLConnection:
                     cursor.close()
                 except Error:
                     pass 
-            if conn and conn.is_connected():
+            if conn:
                 try:
-                    # print(f"MySQLConnection: execute_query() - Cerrando conexión para: {query[:100]}")
+                    # Devuelve la conexión al pool (o la descarta si quedó inservible)
                     conn.close()
                 except Error as e_close:
                     print(f"MySQLConnection: execute_query() - Error al cerrar conexión: {e_close}")
@@ -109,13 +145,101 @@ class MySQLConnection:
                     cursor.close()
                 except Error:
                     pass
-            if conn and conn.is_connected():
+            if conn:
                 try:
-                    # print(f"MySQLConnection: execute_many() - Cerrando conexión para: {query[:100]}")
                     conn.close()
                 except Error as e_close:
                     print(f"MySQLConnection: execute_many() - Error al cerrar conexión para masiva: {e_close}")
 
+class MySQLTransaction:
+    """
+    Sesión transaccional sobre una única conexión, creada por
+    MySQLConnection.transaction(). execute() respeta el mismo contrato de
+    retorno que MySQLConnection.execute_query() pero sin hacer commit.
+    """
+
+    _SAVEPOINT_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursor = conn.cursor(dictionary=True)
+        self._finished = False
+
+    def execute(self, query, params=None, fetch=True):
+        """
+        Ejecuta una sentencia dentro de la transacción.
+
+        Returns:
+            list: filas (dict) si fetch=True.
+            dict: {"affected_rows", "last_insert_id"} si fetch=False.
+        """
+        self._cursor.execute(query, params or ())
+        if fetch:
+            return self._cursor.fetchall()
+        return {"affected_rows": self._cursor.rowcount, "last_insert_id": self._cursor.lastrowid}
+
+    def fetch_one(self, query, params=None):
+        """Ejecuta una consulta y devuelve la primera fila o None."""
+        rows = self.execute(query, params)
+        return rows[0] if rows else None
+
+    def execute_many(self, query, params_list):
+        """
+        Ejecuta la misma sentencia para varios juegos de parámetros.
+        Para INSERT simples mysql.connector lo envía como un único INSERT multi-fila.
+
+        Returns:
+            dict: {"affected_rows"}
+        """
+        params_list = list(params_list)
+        if not params_list:
+            return {"affected_rows": 0}
+        self._cursor.executemany(query, params_list)
+        return {"affected_rows": self._cursor.rowcount}
+
+    @contextmanager
+    def savepoint(self, name):
+        """
+        Marca un SAVEPOINT. Si el bloque lanza una excepción se revierte sólo
+        hasta el savepoint y la excepción se propaga; el resto de la
+        transacción sigue intacto.
+        """
+        if not self._SAVEPOINT_NAME.match(name):
+            raise ValueError(f"Nombre de savepoint inválido: {name}")
+        self._cursor.execute(f"SAVEPOINT `{name}`")
+        try:
+            yield self
+        except BaseException:
+            self._cursor.execute(f"ROLLBACK TO SAVEPOINT `{name}`")
+            raise
+        else:
+            self._cursor.execute(f"RELEASE SAVEPOINT `{name}`")
+
+    def commit(self):
+        if not self._finished:
+            self._conn.commit()
+            self._finished = True
+
+    def rollback(self):
+        if not self._finished:
+            self._finished = True
+            try:
+                self._conn.rollback()
+            except Error as e_rollback:
+                print(f"MySQLTransaction: rollback() - Error: {e_rollback}")
+
+    def _close(self):
+        try:
+            self._cursor.close()
+        except Error:
+            pass
+        try:
+            # Devuelve la conexión al pool
+            self._conn.close()
+        except Error as e_close:
+            print(f"MySQLTransaction: Error al devolver la conexión: {e_close}")
+
+
 # Las funciones globales y el concepto de instancia compartida han sido eliminados.
 # Cada función de ruta creará una instancia y llamará a sus métodos.
 # Ejemplo en una ruta:
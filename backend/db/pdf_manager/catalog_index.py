@@ -0,0 +1,213 @@
+"""
+Índice en memoria de catálogos para las rutas legacy de archivos
+Resuelve nombre -> catálogo y (catálogo, página) -> URL sin recorrer
+catalogos_docs; se calienta al arrancar el worker. Las páginas cacheadas se
+validan contra catalogos.revision, así también se ven los cambios hechos
+por otros procesos (la cola de PDFs en su propio proceso, el CLI)
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional
+
+from db.mysql_connection import MySQLConnection
+
+logger = logging.getLogger(__name__)
+
+# Estado de catálogo cuyas páginas aún se están escribiendo (EstadoCatalogo.PROCESANDO)
+_PROCESANDO = 'procesando'
+_COLUMNAS_PAGINA = ('numero_pagina', 'url_s3', 's3_key', 'tamaño_archivo')
+
+
+CATALOG_INDEX_CONFIG = {
+    # Recarga periódica del mapa de nombres: cubre altas y bajas hechas por otros procesos
+    'ttl_seconds': int(os.getenv('PDF_CATALOG_INDEX_TTL', 300)),
+}
+
+
+class CatalogoIndex:
+    """
+    Índice nombre -> id de catálogo y (id, página) -> fila de la página.
+
+    - Los nombres se cargan con una sola consulta; si hay nombres repetidos
+      gana el catálogo más reciente (igual que buscar_catalogos).
+    - Las páginas de cada catálogo se cargan la primera vez que se piden
+      (calentar() las carga todas de una vez) junto con su revision; cada
+      consulta posterior lee solo revision (búsqueda por PK) y recarga si cambió.
+    - No se cachean catálogos en proceso ni sin páginas: sus páginas las
+      escribe la cola de PDFs, que puede correr en otro proceso.
+    - invalidar() descarta lo afectado en este proceso; la siguiente consulta lo
+      recarga. Un contador de generación evita guardar una carga que empezó
+      antes de invalidar.
+    - Tras un fork (gunicorn con preload_app) el hijo arranca con el índice vacío.
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else CATALOG_INDEX_CONFIG['ttl_seconds']
+        self.db = MySQLConnection()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._nombres: Optional[Dict[str, int]] = None
+        # catalogo_id -> {'revision', 'paginas': {numero_pagina -> fila}}
+        self._paginas: Dict[int, Dict] = {}
+        self._cargado_en = 0.0
+        self._generacion = 0
+        self._stats = {'hits': 0, 'misses': 0, 'recargas': 0, 'invalidaciones': 0}
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def catalogo_id(self, nombre: str) -> Optional[int]:
+        """ID del catálogo con ese nombre exacto (None si no existe)"""
+        nombres = self._nombres_vigentes()
+        return nombres.get(nombre) if nombres is not None else None
+
+    def paginas(self, catalogo_id: int) -> Dict[int, Dict]:
+        """Páginas del catálogo: numero_pagina -> {numero_pagina, url_s3, s3_key, tamaño_archivo}"""
+        self._nombres_vigentes()
+        entrada = self._paginas.get(catalogo_id)
+        if entrada is not None:
+            fila = self.db.execute_query("SELECT revision FROM catalogos WHERE id = %s", (catalogo_id,))
+            if fila is None:
+                # BD no disponible: lo último conocido
+                return entrada['paginas']
+            if fila and fila[0]['revision'] == entrada['revision']:
+                self._stats['hits'] += 1
+                return entrada['paginas']
+
+        self._stats['misses'] += 1
+        generacion = self._generacion
+        filas = self.db.execute_query("""
+        SELECT c.revision, c.estado, cd.numero_pagina, cd.url_s3, cd.s3_key, cd.tamaño_archivo
+        FROM catalogos c
+        LEFT JOIN catalogos_docs cd
+            ON cd.catalogo_id = c.id AND cd.tipo_archivo = 'pagina_webp' AND cd.estado_archivo = 'disponible'
+        WHERE c.id = %s
+        """, (catalogo_id,))
+        if filas is None:
+            return {}
+        paginas = {
+            fila['numero_pagina']: {columna: fila[columna] for columna in _COLUMNAS_PAGINA}
+            for fila in filas if fila['numero_pagina'] is not None
+        }
+        with self._lock:
+            if generacion == self._generacion:
+                if paginas and filas[0]['estado'] != _PROCESANDO:
+                    self._paginas[catalogo_id] = {'revision': filas[0]['revision'], 'paginas': paginas}
+                else:
+                    self._paginas.pop(catalogo_id, None)
+        return paginas
+
+    def pagina(self, catalogo_id: int, numero_pagina: int) -> Optional[Dict]:
+        return self.paginas(catalogo_id).get(numero_pagina)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self._stats)
+            data.update({
+                'catalogos': len(self._nombres) if self._nombres is not None else None,
+                'catalogos_con_paginas': len(self._paginas),
+                'edad_segundos': round(time.monotonic() - self._cargado_en, 1) if self._cargado_en else None,
+            })
+        return data
+
+    # ------------------------------------------------------------------
+    # Carga e invalidación
+    # ------------------------------------------------------------------
+
+    def calentar(self) -> bool:
+        """Carga nombres y todas las páginas (dos consultas)"""
+        with self._lock:
+            self._check_fork()
+            generacion = self._generacion
+        nombres = self._cargar_nombres()
+        filas = self.db.execute_query(f"""
+        SELECT cd.catalogo_id, c.revision, cd.numero_pagina, cd.url_s3, cd.s3_key, cd.tamaño_archivo
+        FROM catalogos_docs cd
+        JOIN catalogos c ON c.id = cd.catalogo_id
+        WHERE cd.tipo_archivo = 'pagina_webp' AND cd.estado_archivo = 'disponible'
+          AND c.estado <> '{_PROCESANDO}'
+        """)
+        if nombres is None or filas is None:
+            return False
+        revisiones = {fila['catalogo_id']: fila.pop('revision') for fila in filas}
+        paginas = self._agrupar_paginas(filas)
+        with self._lock:
+            if generacion != self._generacion:
+                return False
+            self._nombres = nombres
+            self._paginas = {
+                catalogo_id: {'revision': revisiones[catalogo_id], 'paginas': paginas_catalogo}
+                for catalogo_id, paginas_catalogo in paginas.items()
+            }
+            self._cargado_en = time.monotonic()
+        logger.info(f"📇 Índice de catálogos cargado: {len(nombres)} catálogos, {len(filas)} páginas")
+        return True
+
+    def invalidar(self, catalogo_id: Optional[int] = None, nombres: bool = True):
+        """
+        Descarta las páginas de catalogo_id (todas si es None) y, con
+        nombres=True, el mapa de nombres
+        """
+        with self._lock:
+            self._generacion += 1
+            self._stats['invalidaciones'] += 1
+            if nombres:
+                self._nombres = None
+            if catalogo_id is None:
+                self._paginas = {}
+            else:
+                self._paginas.pop(catalogo_id, None)
+
+    def _nombres_vigentes(self) -> Optional[Dict[str, int]]:
+        with self._lock:
+            self._check_fork()
+            if self._nombres is not None and time.monotonic() - self._cargado_en < self.ttl_seconds:
+                return self._nombres
+            if self._nombres is not None:
+                # TTL vencido: recargar todo
+                self._generacion += 1
+                self._nombres = None
+                self._paginas = {}
+            generacion = self._generacion
+
+        nombres = self._cargar_nombres()
+        if nombres is None:
+            return None
+        with self._lock:
+            if generacion == self._generacion:
+                self._nombres = nombres
+                self._cargado_en = time.monotonic()
+                self._stats['recargas'] += 1
+        return nombres
+
+    def _cargar_nombres(self) -> Optional[Dict[str, int]]:
+        filas = self.db.execute_query("SELECT id, nombre FROM catalogos ORDER BY fecha_creacion ASC, id ASC")
+        if filas is None:
+            return None
+        # Orden ascendente: el más reciente sobrescribe a los anteriores con el mismo nombre
+        return {fila['nombre']: fila['id'] for fila in filas}
+
+    @staticmethod
+    def _agrupar_paginas(filas) -> Dict[int, Dict[int, Dict]]:
+        paginas = {}
+        for fila in filas:
+            catalogo_id = fila.pop('catalogo_id')
+            paginas.setdefault(catalogo_id, {})[fila['numero_pagina']] = fila
+        return paginas
+
+    def _check_fork(self):
+        """Requiere tener el lock"""
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._generacion += 1
+            self._nombres = None
+            self._paginas = {}
+
+
+# Índice compartido por el proceso
+catalogo_index = CatalogoIndex()
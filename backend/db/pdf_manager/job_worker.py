@@ -0,0 +1,28 @@
+"""
+Proceso dedicado de la cola de PDFs (modo PDF_JOB_RUNNER=process).
+
+gunicorn.conf.py lo arranca desde el master al quedar listo y lo vuelve a
+lanzar si terminó (se comprueba cada vez que el master crea un worker).
+Al recibir SIGTERM (apagado de gunicorn) devuelve a la cola los trabajos en
+curso; si muere sin avisar, los recupera el siguiente proceso cuando caduca
+su latido. También se puede ejecutar a mano:
+
+    python -m db.pdf_manager.job_worker
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    # Mismo procesador y configuración que usa la API para encolar
+    from .routes_s3 import job_runner
+    logger.info("🚀 Proceso de la cola de PDFs iniciado")
+    job_runner.run_forever()
+    logger.info("👋 Proceso de la cola de PDFs detenido")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
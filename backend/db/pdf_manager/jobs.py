@@ -0,0 +1,493 @@
+"""
+Cola de trabajos para el procesamiento de PDFs
+El upload solo guarda el archivo y crea un trabajo en MySQL; un pool de hilos
+los reclama y procesa con un límite de concurrencia.
+El progreso se guarda por trabajo y los trabajos de un proceso detenido o
+caído se reanudan desde lo que ya quedó registrado.
+La misma cola ejecuta los re-renderizados incrementales de catálogos.
+
+Dónde corre el pool (PDF_JOB_RUNNER):
+- 'process': en un proceso propio (job_worker.py) que arranca y vigila el
+  master de gunicorn. El timeout y el reciclado por max_requests del worker
+  web no lo afectan. Es el modo de gunicorn.conf.py.
+- 'thread': en el propio proceso web (servidor de desarrollo, python app.py).
+"""
+
+import os
+import json
+import time
+import uuid
+import atexit
+import signal
+import socket
+import logging
+import threading
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional
+
+from db.mysql_connection import MySQLConnection
+
+logger = logging.getLogger(__name__)
+
+
+JOBS_CONFIG = {
+    # 'process' (proceso dedicado) o 'thread' (hilos del proceso web)
+    'mode': os.getenv('PDF_JOB_RUNNER', 'thread'),
+    # Trabajos procesados a la vez por worker de gunicorn (cada uno ya usa
+    # varios procesos de renderizado e hilos de subida)
+    'workers': int(os.getenv('PDF_JOB_WORKERS', 1)),
+    'poll_interval': float(os.getenv('PDF_JOB_POLL_INTERVAL', 5)),
+    'heartbeat_interval': float(os.getenv('PDF_JOB_HEARTBEAT_INTERVAL', 15)),
+    # Un trabajo 'procesando' sin latido durante este tiempo se considera huérfano
+    'stale_after': int(os.getenv('PDF_JOB_STALE_AFTER', 90)),
+    'max_attempts': int(os.getenv('PDF_JOB_MAX_ATTEMPTS', 3)),
+    # Cada cuánto se persiste el progreso de un trabajo
+    'progress_interval': float(os.getenv('PDF_JOB_PROGRESS_INTERVAL', 2)),
+    'spool_dir': os.getenv(
+        'PDF_JOB_SPOOL_DIR',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads', 'jobs')
+    ),
+}
+
+
+class TipoJob(Enum):
+    """Tipos de trabajo"""
+    PROCESAR = "procesar"    # PDF recién subido
+    RERENDER = "rerender"    # Re-renderizado incremental de un catálogo existente
+
+
+class EstadoJob(Enum):
+    """Estados posibles de un trabajo"""
+    PENDIENTE = "pendiente"
+    PROCESANDO = "procesando"
+    COMPLETADO = "completado"
+    ERROR = "error"
+
+
+class PDFJobManager:
+    """Operaciones de BD sobre la tabla pdf_jobs"""
+
+    def __init__(self):
+        self.db = MySQLConnection()
+
+    def crear_job(self, nombre_archivo: str, ruta_archivo: str, descripcion: str = "",
+                  categoria: str = "general", usuario_id: Optional[int] = None) -> Optional[int]:
+        """Crea un trabajo pendiente y devuelve su ID"""
+        query = """
+        INSERT INTO pdf_jobs (estado, nombre_archivo, ruta_archivo, descripcion, categoria, usuario_id)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """
+        params = (EstadoJob.PENDIENTE.value, nombre_archivo, ruta_archivo, descripcion, categoria, usuario_id)
+        result = self.db.execute_query(query, params, fetch=False)
+        return result.get('last_insert_id') if result else None
+
+    def crear_job_rerender(self, catalogo_id: int, nombre_archivo: str) -> Optional[int]:
+        """
+        Crea un trabajo de re-renderizado para el catálogo, salvo que ya haya
+        uno pendiente o en curso (devuelve ese)
+        """
+        existente = self.db.execute_query("""
+        SELECT id FROM pdf_jobs
+        WHERE tipo = %s AND catalogo_id = %s AND estado IN (%s, %s)
+        ORDER BY id DESC LIMIT 1
+        """, (TipoJob.RERENDER.value, catalogo_id, EstadoJob.PENDIENTE.value, EstadoJob.PROCESANDO.value))
+        if existente:
+            return existente[0]['id']
+        result = self.db.execute_query("""
+        INSERT INTO pdf_jobs (tipo, estado, nombre_archivo, ruta_archivo, catalogo_id)
+        VALUES (%s, %s, %s, '', %s)
+        """, (TipoJob.RERENDER.value, EstadoJob.PENDIENTE.value, nombre_archivo, catalogo_id), fetch=False)
+        return result.get('last_insert_id') if result else None
+
+    def obtener_job(self, job_id: int) -> Optional[Dict]:
+        row = self._obtener_fila(job_id)
+        return job_to_dict(row) if row else None
+
+    def _obtener_fila(self, job_id: int) -> Optional[Dict]:
+        result = self.db.execute_query("SELECT * FROM pdf_jobs WHERE id = %s", (job_id,))
+        return result[0] if result else None
+
+    def listar_jobs(self, estado: Optional[EstadoJob] = None, limite: int = 50) -> List[Dict]:
+        query = "SELECT * FROM pdf_jobs"
+        params = []
+        if estado:
+            query += " WHERE estado = %s"
+            params.append(estado.value)
+        query += " ORDER BY id DESC LIMIT %s"
+        params.append(limite)
+        return [job_to_dict(row) for row in self.db.execute_query(query, params) or []]
+
+    def reclamar_siguiente(self, worker_id: str) -> Optional[Dict]:
+        """
+        Reclama el trabajo pendiente más antiguo. El UPDATE condicional sobre
+        estado='pendiente' garantiza que solo un worker se lo quede.
+
+        Returns:
+            Dict: Fila completa del trabajo (incluye ruta_archivo) o None
+        """
+        candidatos = self.db.execute_query(
+            "SELECT id FROM pdf_jobs WHERE estado = %s ORDER BY id ASC LIMIT 5",
+            (EstadoJob.PENDIENTE.value,)
+        ) or []
+        for row in candidatos:
+            result = self.db.execute_query("""
+            UPDATE pdf_jobs
+            SET estado = %s, worker_id = %s, intentos = intentos + 1,
+                heartbeat_at = CURRENT_TIMESTAMP, fecha_inicio = COALESCE(fecha_inicio, CURRENT_TIMESTAMP)
+            WHERE id = %s AND estado = %s
+            """, (EstadoJob.PROCESANDO.value, worker_id, row['id'], EstadoJob.PENDIENTE.value), fetch=False)
+            if result and result.get('affected_rows') == 1:
+                return self._obtener_fila(row['id'])
+        return None
+
+    def recuperar_huerfanos(self, stale_after: int, max_attempts: int) -> int:
+        """
+        Devuelve a 'pendiente' los trabajos cuyo worker dejó de dar latidos;
+        los que ya agotaron sus intentos se marcan como error.
+        """
+        agotados = self.db.execute_query("""
+        UPDATE pdf_jobs SET estado = %s, error = 'Se agotaron los intentos de procesamiento'
+        WHERE estado = %s AND heartbeat_at < NOW() - INTERVAL %s SECOND AND intentos >= %s
+        """, (EstadoJob.ERROR.value, EstadoJob.PROCESANDO.value, stale_after, max_attempts), fetch=False)
+        if agotados and agotados.get('affected_rows'):
+            logger.warning(f"⚠️ {agotados['affected_rows']} trabajos de PDF agotaron sus intentos")
+
+        result = self.db.execute_query("""
+        UPDATE pdf_jobs SET estado = %s, worker_id = NULL
+        WHERE estado = %s AND heartbeat_at < NOW() - INTERVAL %s SECOND
+        """, (EstadoJob.PENDIENTE.value, EstadoJob.PROCESANDO.value, stale_after), fetch=False)
+        return result.get('affected_rows', 0) if result else 0
+
+    def latido(self, job_ids: List[int], worker_id: str):
+        if not job_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(job_ids))
+        self.db.execute_query(
+            f"UPDATE pdf_jobs SET heartbeat_at = CURRENT_TIMESTAMP "
+            f"WHERE worker_id = %s AND estado = %s AND id IN ({placeholders})",
+            [worker_id, EstadoJob.PROCESANDO.value] + list(job_ids), fetch=False
+        )
+
+    def actualizar_progreso(self, job_id: int, progreso: Dict, catalogo_id: Optional[int] = None):
+        self.db.execute_query("""
+        UPDATE pdf_jobs
+        SET progreso = %s, catalogo_id = COALESCE(%s, catalogo_id), heartbeat_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+        """, (json.dumps(progreso, default=str), catalogo_id, job_id), fetch=False)
+
+    def finalizar_job(self, job_id: int, estado: EstadoJob, resultado: Optional[Dict] = None,
+                      error: Optional[str] = None):
+        self.db.execute_query("""
+        UPDATE pdf_jobs
+        SET estado = %s, resultado = %s, error = %s, fecha_fin = CURRENT_TIMESTAMP
+        WHERE id = %s
+        """, (estado.value, json.dumps(resultado, default=str) if resultado else None, error, job_id), fetch=False)
+
+    def liberar_jobs(self, job_ids: List[int], worker_id: str):
+        """
+        Devuelve a la cola trabajos de este worker (apagado ordenado). Deshace el
+        intento sumado al tomarlos: un reinicio no es un fallo del trabajo
+        """
+        if not job_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(job_ids))
+        self.db.execute_query(
+            f"UPDATE pdf_jobs SET estado = %s, worker_id = NULL, intentos = GREATEST(intentos - 1, 0) "
+            f"WHERE worker_id = %s AND estado = %s AND id IN ({placeholders})",
+            [EstadoJob.PENDIENTE.value, worker_id, EstadoJob.PROCESANDO.value] + list(job_ids), fetch=False
+        )
+
+
+def job_to_dict(row: Dict) -> Dict:
+    """Serializa una fila de pdf_jobs para la API"""
+    data = dict(row)
+    for campo in ('progreso', 'resultado'):
+        if isinstance(data.get(campo), (str, bytes)):
+            data[campo] = json.loads(data[campo])
+    for campo in ('fecha_creacion', 'fecha_actualizacion', 'fecha_inicio', 'fecha_fin', 'heartbeat_at'):
+        if isinstance(data.get(campo), datetime):
+            data[campo] = data[campo].isoformat()
+    data.pop('ruta_archivo', None)
+    return data
+
+
+class _JobProgress(dict):
+    """
+    Diccionario de progreso de un trabajo. El procesador lo actualiza con
+    update() como hacía con current_progress; los cambios se persisten en
+    pdf_jobs como mucho cada `interval` segundos (al instante si cambia el catálogo).
+    """
+
+    def __init__(self, manager: PDFJobManager, job_id: int, interval: float, inicial: Optional[Dict] = None):
+        super().__init__(inicial or {})
+        self._manager = manager
+        self._job_id = job_id
+        self._interval = interval
+        self._last_save = 0.0
+
+    def update(self, *args, **kwargs):
+        nuevo_catalogo = None
+        cambios = dict(*args, **kwargs)
+        if cambios.get('catalogo_id') and cambios['catalogo_id'] != self.get('catalogo_id'):
+            nuevo_catalogo = cambios['catalogo_id']
+        super().update(cambios)
+        if nuevo_catalogo or time.monotonic() - self._last_save >= self._interval:
+            self.guardar(nuevo_catalogo)
+
+    def guardar(self, catalogo_id: Optional[int] = None):
+        self._last_save = time.monotonic()
+        try:
+            self._manager.actualizar_progreso(self._job_id, dict(self), catalogo_id)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar el progreso del trabajo {self._job_id}: {e}")
+
+
+class PDFJobRunner:
+    """
+    Pool de hilos que procesa los trabajos de pdf_jobs.
+
+    - En modo 'thread', ensure_started() arranca los hilos la primera vez que
+      se usa en cada proceso (con preload_app los hilos del master no
+      sobreviven al fork). En modo 'process' no hace nada: el proceso web solo
+      encola y los hilos corren en el proceso de run_forever().
+    - Un hilo despachador reclama trabajos mientras haya cupo (un hilo por
+      trabajo) y otro renueva el latido de los trabajos en curso.
+    - Los hilos son daemon: un worker que se recicla no espera a que acabe
+      el trabajo en curso.
+    - Al salir el worker los trabajos en curso vuelven a 'pendiente'; si el
+      worker muere sin avisar, se recuperan cuando su latido caduca.
+    """
+
+    def __init__(self, processor, manager: Optional[PDFJobManager] = None, config: Optional[Dict] = None):
+        self.processor = processor
+        self.manager = manager or PDFJobManager()
+        self.config = dict(JOBS_CONFIG, **(config or {}))
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._activos = {}
+        self.worker_id = None
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def ensure_started(self):
+        """Arranca los hilos del pool en este proceso si la cola corre dentro del proceso web"""
+        if self.config['mode'] == 'thread':
+            self._start()
+
+    def run_forever(self):
+        """
+        Procesa la cola en este proceso hasta recibir SIGTERM o SIGINT; entonces
+        devuelve a 'pendiente' los trabajos en curso (ver shutdown) y retorna.
+        """
+        detener = threading.Event()
+
+        def _senal(signum, frame):
+            logger.info(f"⏹️ Señal {signum} recibida, deteniendo la cola de PDFs")
+            detener.set()
+
+        signal.signal(signal.SIGTERM, _senal)
+        signal.signal(signal.SIGINT, _senal)
+        self._start()
+        while not detener.wait(1):
+            pass
+        self.shutdown()
+
+    def _start(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._activos = {}
+            self._stop.clear()
+            self.worker_id = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}"
+            threading.Thread(target=self._dispatch_loop, name='pdf-job-dispatcher', daemon=True).start()
+            threading.Thread(target=self._heartbeat_loop, name='pdf-job-heartbeat', daemon=True).start()
+            atexit.register(self.shutdown)
+            logger.info(f"🧵 Cola de PDFs iniciada ({self.config['workers']} trabajos en paralelo, worker {self.worker_id})")
+
+    def enqueue(self, file_storage, filename: str, descripcion: str = "", categoria: str = "general",
+                usuario_id: Optional[int] = None) -> Optional[int]:
+        """Guarda el archivo subido en disco y crea el trabajo; devuelve su ID"""
+        os.makedirs(self.config['spool_dir'], exist_ok=True)
+        ruta = os.path.join(self.config['spool_dir'], f"{uuid.uuid4().hex}.pdf")
+        file_storage.save(ruta)
+
+        job_id = self.manager.crear_job(filename, ruta, descripcion, categoria, usuario_id)
+        if not job_id:
+            self._remove_spool(ruta)
+            return None
+
+        self.ensure_started()
+        self._wake.set()
+        return job_id
+
+    def enqueue_rerender(self, catalogo_id: int, nombre: str = "") -> Optional[int]:
+        """Encola el re-renderizado incremental de un catálogo; devuelve el ID del trabajo"""
+        job_id = self.manager.crear_job_rerender(catalogo_id, nombre)
+        if job_id:
+            self.ensure_started()
+            self._wake.set()
+        return job_id
+
+    def get_job(self, job_id: int) -> Optional[Dict]:
+        job = self.manager.obtener_job(job_id)
+        if job and job_id in self._activos:
+            # Progreso en memoria, más reciente que el persistido
+            job['progreso'] = dict(self._activos[job_id])
+        return job
+
+    def shutdown(self):
+        """Detiene el despachador y devuelve a la cola los trabajos en curso"""
+        if self._pid != os.getpid() or self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        activos = list(self._activos)
+        if activos:
+            logger.info(f"⏸️ Devolviendo a la cola {len(activos)} trabajos de PDF en curso")
+            self.manager.liberar_jobs(activos, self.worker_id)
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.manager.recuperar_huerfanos(self.config['stale_after'], self.config['max_attempts'])
+                while len(self._activos) < max(1, self.config['workers']) and not self._stop.is_set():
+                    job = self.manager.reclamar_siguiente(self.worker_id)
+                    if not job:
+                        break
+                    progreso = job.get('progreso')
+                    if isinstance(progreso, (str, bytes)):
+                        progreso = json.loads(progreso)
+                    self._activos[job['id']] = _JobProgress(
+                        self.manager, job['id'], self.config['progress_interval'], progreso
+                    )
+                    threading.Thread(
+                        target=self._run_job, args=(job,), name=f"pdf-job-{job['id']}", daemon=True
+                    ).start()
+            except Exception as e:
+                logger.error(f"Error en el despachador de trabajos PDF: {e}", exc_info=True)
+            self._wake.wait(self.config['poll_interval'])
+            self._wake.clear()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.config['heartbeat_interval']):
+            try:
+                self.manager.latido(list(self._activos), self.worker_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Error renovando latido de trabajos PDF: {e}")
+
+    def _run_job(self, job: Dict):
+        job_id = job['id']
+        progress = self._activos[job_id]
+        ruta = job.get('ruta_archivo')
+        terminado = True
+        try:
+            if job.get('tipo') == TipoJob.RERENDER.value:
+                ruta = None
+                logger.info(f"▶️ Re-renderizando catálogo {job['catalogo_id']} (trabajo {job_id})")
+                progress.update({"status": "processing", "job_id": job_id})
+                result = self.processor.rerender_catalogo(job['catalogo_id'], progress=progress)
+            elif not ruta or not os.path.exists(ruta):
+                self.manager.finalizar_job(job_id, EstadoJob.ERROR, error='El archivo del trabajo ya no existe')
+                return
+            else:
+                logger.info(f"▶️ Procesando trabajo PDF {job_id} (intento {job['intentos']}): {job['nombre_archivo']}")
+                progress.update({"status": "processing", "job_id": job_id})
+                # Se pasa la ruta: el procesador trabaja sobre el archivo sin copiarlo
+                result = self.processor.process_pdf_complete(
+                    pdf_file_data=ruta,
+                    filename=job['nombre_archivo'],
+                    descripcion=job.get('descripcion') or '',
+                    categoria=job.get('categoria') or 'general',
+                    usuario_id=job.get('usuario_id'),
+                    catalogo_id=job.get('catalogo_id'),
+                    progress=progress
+                )
+
+            if self._stop.is_set():
+                # El worker se está apagando: el trabajo ya volvió a la cola
+                terminado = False
+                return
+
+            progress.guardar()
+            if result.get('success'):
+                resultado = {k: v for k, v in result.items() if k != 'catalogo_completo'}
+                self.manager.finalizar_job(job_id, EstadoJob.COMPLETADO, resultado)
+                logger.info(f"✅ Trabajo PDF {job_id} completado: catálogo {result.get('catalogo_id')}")
+            else:
+                self.manager.finalizar_job(job_id, EstadoJob.ERROR, error=result.get('error'))
+                logger.error(f"❌ Trabajo PDF {job_id} falló: {result.get('error')}")
+        except Exception as e:
+            logger.error(f"❌ Error inesperado en trabajo PDF {job_id}: {e}", exc_info=True)
+            self.manager.finalizar_job(job_id, EstadoJob.ERROR, error=str(e))
+        finally:
+            self._activos.pop(job_id, None)
+            if terminado and ruta:
+                self._remove_spool(ruta)
+            self._wake.set()
+
+    @staticmethod
+    def _remove_spool(ruta: str):
+        try:
+            os.unlink(ruta)
+        except OSError:
+            pass
+
+
+def init_pdf_jobs_db():
+    """Crea la tabla pdf_jobs si no existe"""
+    db = MySQLConnection()
+    create_pdf_jobs_table = """
+    CREATE TABLE IF NOT EXISTS pdf_jobs (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        tipo VARCHAR(20) NOT NULL DEFAULT 'procesar',
+        estado ENUM('pendiente', 'procesando', 'completado', 'error') NOT NULL DEFAULT 'pendiente',
+        nombre_archivo VARCHAR(255) NOT NULL,
+        ruta_archivo VARCHAR(500) NOT NULL,
+        descripcion TEXT,
+        categoria VARCHAR(100) DEFAULT 'general',
+        usuario_id INT,
+        catalogo_id INT NULL,
+        progreso JSON,
+        resultado JSON,
+        error TEXT,
+        intentos INT NOT NULL DEFAULT 0,
+        worker_id VARCHAR(255) NULL,
+        heartbeat_at TIMESTAMP NULL,
+        fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        fecha_inicio TIMESTAMP NULL,
+        fecha_fin TIMESTAMP NULL,
+        fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        INDEX idx_estado_id (estado, id),
+        INDEX idx_estado_heartbeat (estado, heartbeat_at),
+        INDEX idx_catalogo_id (catalogo_id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """
+    result = db.execute_query(create_pdf_jobs_table, fetch=False)
+    if result:
+        print("PDF_S3: Tabla 'pdf_jobs' creada/verificada exitosamente.")
+        tipo_existe = db.execute_query("""
+        SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'pdf_jobs' AND COLUMN_NAME = 'tipo'
+        """)
+        if not tipo_existe:
+            db.execute_query(
+                "ALTER TABLE pdf_jobs ADD COLUMN tipo VARCHAR(20) NOT NULL DEFAULT 'procesar' AFTER id",
+                fetch=False
+            )
+            print("PDF_S3: Columna 'tipo' agregada a 'pdf_jobs'.")
+        return True
+    print("PDF_S3: Error al crear/verificar tabla 'pdf_jobs'.")
+    return False
@@ -3,6 +3,7 @@ Modelos para el sistema de catálogos PDF con S3
 Arquitectura profesional con base de datos
 """
 
+import os
 import json
 import hashlib
 from datetime import datetime
@@ -11,6 +12,16 @@ from dataclasses import dataclass
 from enum import Enum
 
 from db.mysql_connection import MySQLConnection
+from db.cache import TTLCache
+from .catalog_index import catalogo_index
+
+
+# Listados y estadísticas de catálogos; cada escritura en catalogos/catalogos_docs los invalida
+catalogos_cache = TTLCache(ttl=int(os.getenv('PDF_LIST_CACHE_TTL', 30)), maxsize=128, name='catalogos')
+# Catálogo completo (catálogo + documentos) por ID, validado contra catalogos.revision
+catalogo_completo_cache = TTLCache(
+    ttl=int(os.getenv('PDF_CATALOG_CACHE_TTL', 600)), maxsize=256, name='catalogo_completo'
+)
 
 
 class EstadoCatalogo(Enum):
@@ -28,6 +39,8 @@ class TipoArchivo(Enum):
     THUMBNAIL = "thumbnail"
     PREVIEW = "preview"
     PAGINA_PNG = "pagina_png"
+    # Página reducida a otro ancho (ancho_px) para clientes responsive
+    PAGINA_WEBP_VARIANTE = "pagina_webp_variante"
 
 
 class EstadoArchivo(Enum):
@@ -74,6 +87,10 @@ class CatalogoDoc:
     metadatos: Optional[Dict] = None
     checksum_md5: Optional[str] = None
     estado_archivo: EstadoArchivo = EstadoArchivo.DISPONIBLE
+    # Hash del contenido de la página + parámetros de renderizado (índice de deduplicación)
+    hash_render: Optional[str] = None
+    # Ancho en píxeles de la imagen (páginas y variantes)
+    ancho_px: Optional[int] = None
 
 
 class CatalogoManager:
@@ -82,6 +99,55 @@ class CatalogoManager:
     def __init__(self):
         self.db = MySQLConnection()
     
+    @staticmethod
+    def _invalidar(catalogo_id: Optional[int] = None, nombres: bool = True):
+        """Descarta lo cacheado del catálogo (índice de rutas legacy, listados, estadísticas y detalle)"""
+        catalogo_index.invalidar(catalogo_id, nombres=nombres)
+        catalogos_cache.invalidate()
+        if catalogo_id is None:
+            catalogo_completo_cache.invalidate()
+        else:
+            catalogo_completo_cache.invalidate(key=catalogo_id)
+    
+    _ACTUALIZAR_RESUMEN = """
+    UPDATE catalogos c
+    SET c.fecha_actualizacion = {fecha_actualizacion},
+        c.revision = c.revision + 1,
+        paginas_procesadas = (
+            SELECT COUNT(*) FROM catalogos_docs cd
+            WHERE cd.catalogo_id = c.id AND cd.tipo_archivo = 'pagina_webp' AND cd.estado_archivo = 'disponible'),
+        total_archivos = (
+            SELECT COUNT(*) FROM catalogos_docs cd
+            WHERE cd.catalogo_id = c.id AND cd.estado_archivo = 'disponible'),
+        pdf_url = (
+            SELECT cd.url_s3 FROM catalogos_docs cd
+            WHERE cd.catalogo_id = c.id AND cd.tipo_archivo = 'pdf_original' ORDER BY cd.id DESC LIMIT 1),
+        pdf_s3_key = (
+            SELECT cd.s3_key FROM catalogos_docs cd
+            WHERE cd.catalogo_id = c.id AND cd.tipo_archivo = 'pdf_original' ORDER BY cd.id DESC LIMIT 1),
+        thumbnail_url = (
+            SELECT cd.url_s3 FROM catalogos_docs cd
+            WHERE cd.catalogo_id = c.id AND cd.tipo_archivo = 'thumbnail' ORDER BY cd.id DESC LIMIT 1),
+        thumbnail_s3_key = (
+            SELECT cd.s3_key FROM catalogos_docs cd
+            WHERE cd.catalogo_id = c.id AND cd.tipo_archivo = 'thumbnail' ORDER BY cd.id DESC LIMIT 1)
+    """
+    
+    def actualizar_resumen(self, catalogo_id: int, tx=None):
+        """
+        Recalcula las columnas resumen del catálogo (páginas procesadas, total
+        de archivos, URLs del PDF y del thumbnail) a partir de catalogos_docs
+        
+        Se llama tras cada escritura de documentos para que los listados lean
+        solo la tabla catalogos, sin subconsultas ni JOINs por fila. También
+        avanza revision, que versiona la caché del catálogo completo
+        """
+        query = self._ACTUALIZAR_RESUMEN.format(fecha_actualizacion='CURRENT_TIMESTAMP') + " WHERE c.id = %s"
+        if tx is not None:
+            tx.execute(query, (catalogo_id,), fetch=False)
+        else:
+            self.db.execute_query(query, (catalogo_id,), fetch=False)
+    
     # ==========================================
     # OPERACIONES DE CATÁLOGOS
     # ==========================================
@@ -116,6 +182,7 @@ class CatalogoManager:
         )
         
         result = self.db.execute_query(query, params, fetch=False)
+        self._invalidar()
         return result.get('last_insert_id') if result else None
     
     def obtener_catalogo(self, catalogo_id: int) -> Optional[Catalogo]:
@@ -124,25 +191,28 @@ class CatalogoManager:
         result = self.db.execute_query(query, (catalogo_id,))
         
         if result:
-            row = result[0]
-            return Catalogo(
-                id=row['id'],
-                nombre=row['nombre'],
-                descripcion=row['descripcion'],
-                categoria=row['categoria'],
-                fecha_creacion=row['fecha_creacion'],
-                fecha_actualizacion=row['fecha_actualizacion'],
-                estado=EstadoCatalogo(row['estado']),
-                usuario_id=row['usuario_id'],
-                total_paginas=row['total_paginas'],
-                tamaño_archivo=row['tamaño_archivo'],
-                nombre_archivo_original=row['nombre_archivo_original'],
-                version=row['version'],
-                tags=json.loads(row['tags']) if row['tags'] else None,
-                metadatos_procesamiento=json.loads(row['metadatos_procesamiento']) if row['metadatos_procesamiento'] else None
-            )
+            return self._fila_a_catalogo(result[0])
         return None
     
+    @staticmethod
+    def _fila_a_catalogo(row: Dict) -> Catalogo:
+        return Catalogo(
+            id=row['id'],
+            nombre=row['nombre'],
+            descripcion=row['descripcion'],
+            categoria=row['categoria'],
+            fecha_creacion=row['fecha_creacion'],
+            fecha_actualizacion=row['fecha_actualizacion'],
+            estado=EstadoCatalogo(row['estado']),
+            usuario_id=row['usuario_id'],
+            total_paginas=row['total_paginas'],
+            tamaño_archivo=row['tamaño_archivo'],
+            nombre_archivo_original=row['nombre_archivo_original'],
+            version=row['version'],
+            tags=json.loads(row['tags']) if row['tags'] else None,
+            metadatos_procesamiento=json.loads(row['metadatos_procesamiento']) if row['metadatos_procesamiento'] else None
+        )
+    
     def listar_catalogos(self, categoria: Optional[str] = None, estado: Optional[EstadoCatalogo] = None, 
                         limite: int = 50, offset: int = 0) -> List[Dict]:
         """
@@ -151,16 +221,17 @@ class CatalogoManager:
         Returns:
             List[Dict]: Lista de catálogos con información completa
         """
+        clave = ('listado', categoria, estado.value if estado else None, limite, offset)
+        return catalogos_cache.get_or_load(
+            clave, lambda: self._listar_catalogos(categoria, estado, limite, offset)
+        ) or []
+    
+    def _listar_catalogos(self, categoria: Optional[str], estado: Optional[EstadoCatalogo],
+                          limite: int, offset: int) -> Optional[List[Dict]]:
+        # pdf_url, thumbnail_url y paginas_procesadas son columnas resumen (ver actualizar_resumen)
         query = """
-        SELECT 
-            c.*,
-            pdf.url_s3 as pdf_url,
-            thumb.url_s3 as thumbnail_url,
-            (SELECT COUNT(*) FROM catalogos_docs cd 
-             WHERE cd.catalogo_id = c.id AND cd.tipo_archivo = 'pagina_webp') as paginas_procesadas
+        SELECT c.*
         FROM catalogos c
-        LEFT JOIN catalogos_docs pdf ON c.id = pdf.catalogo_id AND pdf.tipo_archivo = 'pdf_original'
-        LEFT JOIN catalogos_docs thumb ON c.id = thumb.catalogo_id AND thumb.tipo_archivo = 'thumbnail'
         WHERE 1=1
         """
         
@@ -177,14 +248,15 @@ class CatalogoManager:
         query += " ORDER BY c.fecha_creacion DESC LIMIT %s OFFSET %s"
         params.extend([limite, offset])
         
-        return self.db.execute_query(query, params) or []
+        return self.db.execute_query(query, params)
     
     def actualizar_estado_catalogo(self, catalogo_id: int, estado: EstadoCatalogo, 
                                   metadatos: Optional[Dict] = None) -> bool:
         """Actualiza el estado de un catálogo"""
         query = """
         UPDATE catalogos 
-        SET estado = %s, metadatos_procesamiento = %s, fecha_actualizacion = CURRENT_TIMESTAMP
+        SET estado = %s, metadatos_procesamiento = %s, fecha_actualizacion = CURRENT_TIMESTAMP,
+            revision = revision + 1
         WHERE id = %s
         """
         
@@ -195,11 +267,12 @@ class CatalogoManager:
         )
         
         result = self.db.execute_query(query, params, fetch=False)
+        self._invalidar(catalogo_id)
         return result and result.get('affected_rows', 0) > 0
     
     def actualizar_total_paginas(self, catalogo_id: int, total_paginas: int) -> bool:
         """Actualiza el total de páginas de un catálogo"""
-        query = "UPDATE catalogos SET total_paginas = %s WHERE id = %s"
+        query = "UPDATE catalogos SET total_paginas = %s, revision = revision + 1 WHERE id = %s"
         result = self.db.execute_query(query, (total_paginas, catalogo_id), fetch=False)
         return result and result.get('affected_rows', 0) > 0
     
@@ -207,28 +280,24 @@ class CatalogoManager:
         """Elimina un catálogo y todos sus documentos asociados"""
         query = "DELETE FROM catalogos WHERE id = %s"
         result = self.db.execute_query(query, (catalogo_id,), fetch=False)
+        self._invalidar(catalogo_id)
         return result and result.get('affected_rows', 0) > 0
     
     # ==========================================
     # OPERACIONES DE DOCUMENTOS
     # ==========================================
     
-    def crear_documento(self, doc: CatalogoDoc) -> int:
-        """
-        Crea un nuevo documento en la base de datos
-        
-        Returns:
-            int: ID del documento creado
-        """
-        query = """
+    _INSERT_DOCUMENTO = """
         INSERT INTO catalogos_docs (
             catalogo_id, tipo_archivo, nombre_archivo, url_s3, s3_key,
             numero_pagina, tamaño_archivo, mime_type, metadatos, 
-            checksum_md5, estado_archivo
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            checksum_md5, estado_archivo, hash_render, ancho_px
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
-        
-        params = (
+    
+    @staticmethod
+    def _params_documento(doc: CatalogoDoc) -> Tuple:
+        return (
             doc.catalogo_id,
             doc.tipo_archivo.value,
             doc.nombre_archivo,
@@ -239,12 +308,241 @@ class CatalogoManager:
             doc.mime_type,
             json.dumps(doc.metadatos) if doc.metadatos else None,
             doc.checksum_md5,
-            doc.estado_archivo.value
+            doc.estado_archivo.value,
+            doc.hash_render,
+            doc.ancho_px
         )
+    
+    def crear_documento(self, doc: CatalogoDoc) -> int:
+        """
+        Crea un nuevo documento en la base de datos
         
-        result = self.db.execute_query(query, params, fetch=False)
+        Returns:
+            int: ID del documento creado
+        """
+        result = self.db.execute_query(self._INSERT_DOCUMENTO, self._params_documento(doc), fetch=False)
+        self.actualizar_resumen(doc.catalogo_id)
+        self._invalidar(doc.catalogo_id, nombres=False)
         return result.get('last_insert_id') if result else None
     
+    def crear_documentos(self, docs: List[CatalogoDoc], tx=None) -> Optional[int]:
+        """
+        Registra varios documentos con un único INSERT multi-fila
+        (si el catálogo ya tiene ese s3_key se actualiza el registro)
+        
+        Args:
+            docs: Documentos a registrar
+            tx: Transacción abierta (MySQLConnection.transaction()); si es None
+                se usa una conexión propia con un solo commit
+        
+        Returns:
+            int: Filas insertadas (None si hubo error sin transacción)
+        """
+        if not docs:
+            return 0
+        
+        # Idempotente por (catalogo_id, s3_key): al reanudar un procesamiento interrumpido
+        # una página puede volver a registrarse
+        query = self._INSERT_DOCUMENTO + """
+        ON DUPLICATE KEY UPDATE
+            url_s3 = VALUES(url_s3), tamaño_archivo = VALUES(tamaño_archivo),
+            metadatos = VALUES(metadatos), checksum_md5 = VALUES(checksum_md5),
+            estado_archivo = VALUES(estado_archivo), hash_render = VALUES(hash_render),
+            ancho_px = VALUES(ancho_px)
+        """
+        params_list = [self._params_documento(doc) for doc in docs]
+        if tx is not None:
+            # Quien abrió la transacción actualiza el resumen del catálogo
+            return tx.execute_many(query, params_list)['affected_rows']
+        
+        result = self.db.execute_many(query, params_list)
+        for catalogo_id in {doc.catalogo_id for doc in docs}:
+            self.actualizar_resumen(catalogo_id)
+            self._invalidar(catalogo_id, nombres=False)
+        return result.get('affected_rows') if result else None
+    
+    def finalizar_catalogo(self, catalogo_id: int, estado: EstadoCatalogo, metadatos: Optional[Dict],
+                           total_paginas: int, docs_pendientes: Optional[List[CatalogoDoc]] = None,
+                           origen_id: Optional[int] = None) -> bool:
+        """
+        Cierra el procesamiento de un catálogo en una sola transacción:
+        registra los documentos pendientes (o vincula los de origen_id si es
+        un duplicado), actualiza estado/metadatos y total de páginas
+        """
+        try:
+            with self.db.transaction() as tx:
+                if origen_id:
+                    self.vincular_documentos(origen_id, catalogo_id, tx=tx)
+                self.crear_documentos(docs_pendientes or [], tx=tx)
+                self.actualizar_resumen(catalogo_id, tx=tx)
+                tx.execute("""
+                UPDATE catalogos 
+                SET estado = %s, metadatos_procesamiento = %s, total_paginas = %s,
+                    fecha_actualizacion = CURRENT_TIMESTAMP, revision = revision + 1
+                WHERE id = %s
+                """, (
+                    estado.value,
+                    json.dumps(metadatos) if metadatos else None,
+                    total_paginas,
+                    catalogo_id
+                ), fetch=False)
+            return True
+        except Exception as e:
+            print(f"PDF_S3: Error finalizando catálogo {catalogo_id}: {str(e)}")
+            return False
+        finally:
+            self._invalidar(catalogo_id)
+    
+    # ==========================================
+    # DEDUPLICACIÓN POR CONTENIDO
+    # ==========================================
+    
+    def buscar_catalogo_por_checksum(self, checksum_md5: str) -> Optional[Dict]:
+        """
+        Busca un catálogo activo cuyo PDF original tenga el mismo MD5
+        
+        Returns:
+            Dict: id y total_paginas del catálogo más reciente, o None
+        """
+        query = """
+        SELECT c.id, c.total_paginas
+        FROM catalogos_docs cd
+        JOIN catalogos c ON c.id = cd.catalogo_id
+        WHERE cd.tipo_archivo = 'pdf_original'
+          AND cd.checksum_md5 = %s
+          AND cd.estado_archivo = 'disponible'
+          AND c.estado = 'activo'
+        ORDER BY c.id DESC
+        LIMIT 1
+        """
+        result = self.db.execute_query(query, (checksum_md5,))
+        return result[0] if result else None
+    
+    def buscar_paginas_por_hash(self, hashes: List[str]) -> Dict[str, Dict]:
+        """
+        Busca páginas ya renderizadas (en cualquier catálogo) por hash_render
+        
+        Returns:
+            Dict[str, Dict]: hash_render -> fila de catalogos_docs de la página, con
+                sus variantes de ancho en 'variantes' (lista de filas)
+        """
+        encontradas = {}
+        hashes = list(dict.fromkeys(h for h in hashes if h))
+        # Lotes para no construir IN (...) gigantes
+        for i in range(0, len(hashes), 500):
+            lote = hashes[i:i + 500]
+            placeholders = ', '.join(['%s'] * len(lote))
+            query = f"""
+            SELECT tipo_archivo, hash_render, url_s3, s3_key, tamaño_archivo, mime_type,
+                   metadatos, checksum_md5, ancho_px
+            FROM catalogos_docs
+            WHERE tipo_archivo IN ('pagina_webp', 'pagina_webp_variante')
+              AND estado_archivo = 'disponible'
+              AND hash_render IN ({placeholders})
+            """
+            variantes = {}
+            for row in self.db.execute_query(query, lote) or []:
+                if row['tipo_archivo'] == TipoArchivo.PAGINA_WEBP.value:
+                    encontradas.setdefault(row['hash_render'], row)
+                else:
+                    # El hash incluye los anchos de variante: cualquier catálogo sirve
+                    variantes.setdefault(row['hash_render'], {}).setdefault(row['ancho_px'], row)
+            for hash_render, pagina in encontradas.items():
+                pagina.setdefault('variantes', list(variantes.get(hash_render, {}).values()))
+        return encontradas
+    
+    def vincular_documentos(self, origen_id: int, destino_id: int, tx=None) -> int:
+        """
+        Copia los registros de catalogos_docs de un catálogo a otro apuntando a
+        los mismos objetos de S3 (un solo INSERT ... SELECT)
+        
+        Returns:
+            int: Registros vinculados
+        """
+        query = """
+        INSERT INTO catalogos_docs (
+            catalogo_id, tipo_archivo, nombre_archivo, url_s3, s3_key,
+            numero_pagina, tamaño_archivo, mime_type, metadatos,
+            checksum_md5, estado_archivo, hash_render, ancho_px
+        )
+        SELECT %s, tipo_archivo, nombre_archivo, url_s3, s3_key,
+               numero_pagina, tamaño_archivo, mime_type, metadatos,
+               checksum_md5, estado_archivo, hash_render, ancho_px
+        FROM catalogos_docs
+        WHERE catalogo_id = %s AND estado_archivo = 'disponible'
+        """
+        if tx is not None:
+            return tx.execute(query, (destino_id, origen_id), fetch=False)['affected_rows']
+        result = self.db.execute_query(query, (destino_id, origen_id), fetch=False)
+        self.actualizar_resumen(destino_id)
+        self._invalidar(destino_id, nombres=False)
+        return result.get('affected_rows', 0) if result else 0
+    
+    def s3_keys_compartidas(self, catalogo_id: Optional[int], s3_keys: List[str]) -> set:
+        """
+        Keys de S3 de la lista que usan otros catálogos
+        (con catalogo_id=None, las que sigue usando cualquier catálogo)
+        """
+        compartidas = set()
+        s3_keys = list(dict.fromkeys(s3_keys))
+        for i in range(0, len(s3_keys), 500):
+            lote = s3_keys[i:i + 500]
+            placeholders = ', '.join(['%s'] * len(lote))
+            query = f"SELECT DISTINCT s3_key FROM catalogos_docs WHERE s3_key IN ({placeholders})"
+            params = list(lote)
+            if catalogo_id is not None:
+                query += " AND catalogo_id <> %s"
+                params.append(catalogo_id)
+            for row in self.db.execute_query(query, params) or []:
+                compartidas.add(row['s3_key'])
+        return compartidas
+    
+    def reemplazar_documentos(self, catalogo_id: int, paginas: List[CatalogoDoc],
+                              thumbnail: Optional[CatalogoDoc] = None,
+                              metadatos: Optional[Dict] = None) -> Optional[List[str]]:
+        """
+        Sustituye en una sola transacción los registros de las páginas indicadas
+        (con sus variantes de ancho, y el thumbnail) por versiones nuevas, y fusiona `metadatos` en
+        metadatos_procesamiento del catálogo
+        
+        Returns:
+            List[str]: s3_keys de los registros sustituidos, o None si hubo error
+        """
+        numeros = sorted({doc.numero_pagina for doc in paginas})
+        try:
+            with self.db.transaction() as tx:
+                condiciones = []
+                params = [catalogo_id]
+                if numeros:
+                    placeholders = ', '.join(['%s'] * len(numeros))
+                    condiciones.append(
+                        f"(tipo_archivo IN ('pagina_webp', 'pagina_webp_variante') AND numero_pagina IN ({placeholders}))"
+                    )
+                    params.extend(numeros)
+                if thumbnail:
+                    condiciones.append("tipo_archivo = 'thumbnail'")
+                if not condiciones:
+                    return []
+                where = f"catalogo_id = %s AND ({' OR '.join(condiciones)})"
+                
+                anteriores = tx.execute(f"SELECT s3_key FROM catalogos_docs WHERE {where} FOR UPDATE", params)
+                tx.execute(f"DELETE FROM catalogos_docs WHERE {where}", params, fetch=False)
+                self.crear_documentos(paginas + ([thumbnail] if thumbnail else []), tx=tx)
+                self.actualizar_resumen(catalogo_id, tx=tx)
+                if metadatos:
+                    tx.execute("""
+                    UPDATE catalogos
+                    SET metadatos_procesamiento = JSON_MERGE_PATCH(COALESCE(metadatos_procesamiento, JSON_OBJECT()), %s),
+                        revision = revision + 1
+                    WHERE id = %s
+                    """, (json.dumps(metadatos, default=str), catalogo_id), fetch=False)
+            return [row['s3_key'] for row in anteriores]
+        except Exception as e:
+            print(f"PDF_S3: Error sustituyendo documentos del catálogo {catalogo_id}: {str(e)}")
+            return None
+        finally:
+            self._invalidar(catalogo_id, nombres=False)
+    
     def obtener_documentos_catalogo(self, catalogo_id: int, 
                                    tipo_archivo: Optional[TipoArchivo] = None) -> List[Dict]:
         """Obtiene todos los documentos de un catálogo"""
@@ -271,7 +569,7 @@ class CatalogoManager:
     def obtener_paginas_catalogo(self, catalogo_id: int) -> List[Dict]:
         """Obtiene todas las páginas de un catálogo ordenadas"""
         query = """
-        SELECT numero_pagina, url_s3, s3_key, tamaño_archivo, metadatos
+        SELECT numero_pagina, url_s3, s3_key, tamaño_archivo, metadatos, hash_render
         FROM catalogos_docs 
         WHERE catalogo_id = %s 
           AND tipo_archivo = 'pagina_webp' 
@@ -280,6 +578,64 @@ class CatalogoManager:
         """
         return self.db.execute_query(query, (catalogo_id,)) or []
     
+    def obtener_anchos_variantes(self, catalogo_id: int) -> Dict[int, set]:
+        """Anchos de variante registrados por página (numero_pagina -> {ancho_px})"""
+        query = """
+        SELECT numero_pagina, ancho_px
+        FROM catalogos_docs
+        WHERE catalogo_id = %s
+          AND tipo_archivo = 'pagina_webp_variante'
+          AND estado_archivo = 'disponible'
+        """
+        anchos = {}
+        for row in self.db.execute_query(query, (catalogo_id,)) or []:
+            anchos.setdefault(row['numero_pagina'], set()).add(row['ancho_px'])
+        return anchos
+    
+    def obtener_paginas_por_ancho(self, catalogo_id: int, ancho: int) -> List[Dict]:
+        """
+        Para cada página, la imagen más pequeña con ancho >= `ancho`
+        (o la más grande disponible si ninguna llega)
+        
+        Returns:
+            List[Dict]: mismas columnas que obtener_paginas_catalogo más 'ancho'
+                y 'anchos_disponibles', ordenadas por número de página
+        """
+        query = """
+        SELECT numero_pagina, tipo_archivo, url_s3, s3_key, tamaño_archivo, metadatos,
+               hash_render, ancho_px
+        FROM catalogos_docs
+        WHERE catalogo_id = %s
+          AND tipo_archivo IN ('pagina_webp', 'pagina_webp_variante')
+          AND estado_archivo = 'disponible'
+        ORDER BY numero_pagina ASC
+        """
+        por_pagina = {}
+        for row in self.db.execute_query(query, (catalogo_id,)) or []:
+            ancho_px = row.pop('ancho_px')
+            tipo = row.pop('tipo_archivo')
+            if ancho_px is None:
+                # Páginas registradas antes de la columna ancho_px
+                metadatos = row.get('metadatos')
+                if isinstance(metadatos, (str, bytes)):
+                    metadatos = json.loads(metadatos)
+                ancho_px = (metadatos or {}).get('width') or 0
+            row['ancho'] = ancho_px
+            candidatas = por_pagina.setdefault(row['numero_pagina'], {})
+            # Si una variante coincide en ancho con la página principal, gana la principal
+            if ancho_px not in candidatas or tipo == TipoArchivo.PAGINA_WEBP.value:
+                candidatas[ancho_px] = row
+        
+        paginas = []
+        for numero in sorted(por_pagina):
+            candidatas = por_pagina[numero]
+            anchos = sorted(candidatas)
+            elegido = next((a for a in anchos if a >= ancho), anchos[-1])
+            pagina = candidatas[elegido]
+            pagina['anchos_disponibles'] = anchos
+            paginas.append(pagina)
+        return paginas
+    
     def obtener_pdf_original(self, catalogo_id: int) -> Optional[Dict]:
         """Obtiene el PDF original de un catálogo"""
         query = """
@@ -302,12 +658,18 @@ class CatalogoManager:
         """Actualiza el estado de un documento"""
         query = "UPDATE catalogos_docs SET estado_archivo = %s WHERE id = %s"
         result = self.db.execute_query(query, (estado.value, documento_id), fetch=False)
+        doc = self.db.execute_query("SELECT catalogo_id FROM catalogos_docs WHERE id = %s", (documento_id,))
+        if doc:
+            self.actualizar_resumen(doc[0]['catalogo_id'])
+        self._invalidar(doc[0]['catalogo_id'] if doc else None, nombres=False)
         return result and result.get('affected_rows', 0) > 0
     
     def eliminar_documentos_catalogo(self, catalogo_id: int) -> bool:
         """Elimina todos los documentos de un catálogo"""
         query = "DELETE FROM catalogos_docs WHERE catalogo_id = %s"
         result = self.db.execute_query(query, (catalogo_id,), fetch=False)
+        self.actualizar_resumen(catalogo_id)
+        self._invalidar(catalogo_id, nombres=False)
         return result and result.get('affected_rows', 0) > 0
     
     # ==========================================
@@ -321,17 +683,80 @@ class CatalogoManager:
         Returns:
             Dict: Información completa del catálogo
         """
-        # Información del catálogo
-        catalogo = self.obtener_catalogo(catalogo_id)
-        if not catalogo:
+        datos, _ = self.obtener_catalogo_completo_etag(catalogo_id)
+        return datos
+    
+    def obtener_catalogo_completo_etag(self, catalogo_id: int) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Catálogo completo y su ETag (hash del contenido)
+        
+        Se cachea por catálogo junto con su revision (contador que avanza en
+        cada escritura; fecha_actualizacion tiene resolución de un segundo y dos
+        escrituras en el mismo segundo no la cambian): si la caché tiene el
+        catálogo, basta leer revision (búsqueda por PK) para saber si sigue
+        vigente; si no, se recarga con una sola consulta
+        """
+        entrada = catalogo_completo_cache.get(catalogo_id)
+        if entrada is not None:
+            fila = self.db.execute_query("SELECT revision FROM catalogos WHERE id = %s", (catalogo_id,))
+            if fila is not None and not fila:
+                catalogo_completo_cache.invalidate(key=catalogo_id)
+                return None, None
+            if fila and fila[0]['revision'] == entrada['version']:
+                return entrada['datos'], entrada['etag']
+        
+        generacion = catalogo_completo_cache.generation()
+        cargado = self._cargar_catalogo_completo(catalogo_id)
+        if not cargado:
+            return None, None
+        version, datos = cargado
+        etag = hashlib.md5(json.dumps(datos, sort_keys=True, default=str).encode()).hexdigest()
+        catalogo_completo_cache.set(
+            catalogo_id, {'version': version, 'datos': datos, 'etag': etag}, generation=generacion
+        )
+        return datos, etag
+    
+    _COLUMNAS_DOCUMENTO = (
+        'id', 'catalogo_id', 'tipo_archivo', 'nombre_archivo', 'url_s3', 's3_key',
+        'numero_pagina', 'tamaño_archivo', 'mime_type', 'fecha_creacion', 'fecha_actualizacion',
+        'metadatos', 'checksum_md5', 'estado_archivo', 'hash_render', 'ancho_px'
+    )
+    # Mismas columnas que obtener_paginas_catalogo
+    _COLUMNAS_PAGINA = ('numero_pagina', 'url_s3', 's3_key', 'tamaño_archivo', 'metadatos', 'hash_render')
+    
+    def _cargar_catalogo_completo(self, catalogo_id: int) -> Optional[Tuple]:
+        """Catálogo + PDF original + thumbnail + páginas en una sola consulta, agrupados en Python"""
+        columnas_doc = ', '.join(f"cd.{col} AS doc_{col}" for col in self._COLUMNAS_DOCUMENTO)
+        query = f"""
+        SELECT c.*, {columnas_doc}
+        FROM catalogos c
+        LEFT JOIN catalogos_docs cd
+          ON cd.catalogo_id = c.id
+         AND (cd.tipo_archivo IN ('pdf_original', 'thumbnail')
+              OR (cd.tipo_archivo = 'pagina_webp' AND cd.estado_archivo = 'disponible'))
+        WHERE c.id = %s
+        ORDER BY cd.numero_pagina ASC, cd.id ASC
+        """
+        filas = self.db.execute_query(query, (catalogo_id,))
+        if not filas:
             return None
         
-        # Documentos organizados por tipo
-        pdf_original = self.obtener_pdf_original(catalogo_id)
-        thumbnail = self.obtener_thumbnail(catalogo_id)
-        paginas = self.obtener_paginas_catalogo(catalogo_id)
+        catalogo = self._fila_a_catalogo(filas[0])
+        pdf_original = None
+        thumbnail = None
+        paginas = []
+        for fila in filas:
+            if fila['doc_id'] is None:
+                continue
+            doc = {col: fila[f"doc_{col}"] for col in self._COLUMNAS_DOCUMENTO}
+            if doc['tipo_archivo'] == TipoArchivo.PAGINA_WEBP.value:
+                paginas.append({col: doc[col] for col in self._COLUMNAS_PAGINA})
+            elif doc['tipo_archivo'] == TipoArchivo.PDF_ORIGINAL.value:
+                pdf_original = pdf_original or doc
+            elif doc['tipo_archivo'] == TipoArchivo.THUMBNAIL.value:
+                thumbnail = thumbnail or doc
         
-        return {
+        datos = {
             'catalogo': {
                 'id': catalogo.id,
                 'nombre': catalogo.nombre,
@@ -353,6 +778,7 @@ class CatalogoManager:
                 'total_archivos': len(paginas) + (1 if pdf_original else 0) + (1 if thumbnail else 0)
             }
         }
+        return filas[0]['revision'], datos
     
     def buscar_catalogos(self, termino: str, categoria: Optional[str] = None) -> List[Dict]:
         """Busca catálogos por término en nombre y descripción"""
@@ -371,7 +797,10 @@ class CatalogoManager:
         return self.db.execute_query(query, params) or []
     
     def obtener_estadisticas_catalogos(self) -> Dict:
-        """Obtiene estadísticas generales del sistema"""
+        """Obtiene estadísticas generales del sistema (cacheadas hasta la próxima escritura o el TTL)"""
+        return catalogos_cache.get_or_load(('estadisticas',), self._calcular_estadisticas) or {}
+    
+    def _calcular_estadisticas(self) -> Optional[Dict]:
         query = """
         SELECT 
             COUNT(*) as total_catalogos,
@@ -385,7 +814,7 @@ class CatalogoManager:
         """
         
         result = self.db.execute_query(query)
-        return result[0] if result else {}
+        return result[0] if result else None
     
     def limpiar_archivos_huerfanos(self) -> Dict:
         """Ejecuta limpieza de archivos huérfanos"""
@@ -481,11 +910,21 @@ def init_pdf_s3_db():
         tamaño_archivo BIGINT DEFAULT 0,
         nombre_archivo_original VARCHAR(255),
         version VARCHAR(50) DEFAULT '1.0',
+        -- Avanza en cada escritura del catálogo o sus documentos (versiona la caché del catálogo completo)
+        revision BIGINT NOT NULL DEFAULT 0,
         tags JSON,
         metadatos_procesamiento JSON,
+        -- Resumen de catalogos_docs mantenido por CatalogoManager.actualizar_resumen
+        paginas_procesadas INT DEFAULT 0,
+        total_archivos INT DEFAULT 0,
+        pdf_url TEXT NULL,
+        pdf_s3_key VARCHAR(500) NULL,
+        thumbnail_url TEXT NULL,
+        thumbnail_s3_key VARCHAR(500) NULL,
         INDEX idx_nombre (nombre),
         INDEX idx_categoria (categoria),
         INDEX idx_estado (estado),
+        INDEX idx_estado_fecha (estado, fecha_creacion),
         INDEX idx_fecha_creacion (fecha_creacion),
         INDEX idx_usuario_id (usuario_id)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
@@ -496,7 +935,8 @@ def init_pdf_s3_db():
     CREATE TABLE IF NOT EXISTS catalogos_docs (
         id INT AUTO_INCREMENT PRIMARY KEY,
         catalogo_id INT NOT NULL,
-        tipo_archivo ENUM('pdf_original', 'pagina_webp', 'thumbnail', 'preview', 'pagina_png') NOT NULL,
+        tipo_archivo ENUM('pdf_original', 'pagina_webp', 'thumbnail', 'preview', 'pagina_png',
+                          'pagina_webp_variante') NOT NULL,
         nombre_archivo VARCHAR(255) NOT NULL,
         url_s3 TEXT NOT NULL,
         s3_key VARCHAR(500) NOT NULL,
@@ -508,13 +948,19 @@ def init_pdf_s3_db():
         metadatos JSON,
         checksum_md5 VARCHAR(32),
         estado_archivo ENUM('disponible', 'procesando', 'error', 'eliminado') DEFAULT 'disponible',
+        hash_render VARCHAR(32) NULL,
+        ancho_px INT NULL,
         FOREIGN KEY (catalogo_id) REFERENCES catalogos(id) ON DELETE CASCADE,
         INDEX idx_catalogo_id (catalogo_id),
         INDEX idx_tipo_archivo (tipo_archivo),
         INDEX idx_numero_pagina (numero_pagina),
         INDEX idx_s3_key (s3_key),
         INDEX idx_estado_archivo (estado_archivo),
-        UNIQUE KEY unique_s3_key (s3_key)
+        INDEX idx_tipo_checksum (tipo_archivo, checksum_md5),
+        INDEX idx_hash_render (hash_render),
+        INDEX idx_catalogo_tipo_pagina (catalogo_id, tipo_archivo, numero_pagina),
+        -- Un mismo objeto de S3 puede pertenecer a varios catálogos (deduplicación)
+        UNIQUE KEY unique_catalogo_s3_key (catalogo_id, s3_key)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
     """
     
@@ -535,24 +981,19 @@ def init_pdf_s3_db():
             print("PDF_S3: Error al crear/verificar tabla 'catalogos_docs'.")
             return False
         
+        migrar_catalogos_docs_dedup(db)
+        migrar_catalogos_docs_variantes(db)
+        # revision antes que el resumen: el relleno inicial la incrementa
+        revision_agregada = migrar_catalogos_revision(db)
+        migrar_catalogos_resumen(db, recalcular=revision_agregada)
+        
         print("PDF_S3: Configuración de base de datos completada exitosamente.")
         
         # Crear vista para consultas complejas
         create_vista_catalogos = """
         CREATE OR REPLACE VIEW vista_catalogos_completos AS
-        SELECT 
-            c.*,
-            pdf.url_s3 as pdf_url,
-            pdf.s3_key as pdf_s3_key,
-            thumb.url_s3 as thumbnail_url,
-            thumb.s3_key as thumbnail_s3_key,
-            (SELECT COUNT(*) FROM catalogos_docs cd 
-             WHERE cd.catalogo_id = c.id AND cd.tipo_archivo = 'pagina_webp' AND cd.estado_archivo = 'disponible') as paginas_procesadas,
-            (SELECT COUNT(*) FROM catalogos_docs cd 
-             WHERE cd.catalogo_id = c.id AND cd.estado_archivo = 'disponible') as total_archivos
+        SELECT c.*
         FROM catalogos c
-        LEFT JOIN catalogos_docs pdf ON c.id = pdf.catalogo_id AND pdf.tipo_archivo = 'pdf_original'
-        LEFT JOIN catalogos_docs thumb ON c.id = thumb.catalogo_id AND thumb.tipo_archivo = 'thumbnail'
         """
         
         result = db.execute_query(create_vista_catalogos, fetch=False)
@@ -565,4 +1006,149 @@ def init_pdf_s3_db():
         
     except Exception as e:
         print(f"PDF_S3: Error durante la inicialización de la base de datos: {str(e)}")
-        return False 
\ No newline at end of file
+        return False 
+
+
+def migrar_catalogos_docs_dedup(db: MySQLConnection):
+    """
+    Adapta una tabla catalogos_docs existente a la deduplicación por contenido:
+    columna hash_render, índices de búsqueda y unicidad de s3_key por catálogo
+    """
+    try:
+        existe = db.execute_query("""
+        SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'catalogos_docs' AND COLUMN_NAME = 'hash_render'
+        """)
+        if not existe:
+            db.execute_query("ALTER TABLE catalogos_docs ADD COLUMN hash_render VARCHAR(32) NULL", fetch=False)
+            print("PDF_S3: Columna 'hash_render' agregada a 'catalogos_docs'.")
+        
+        indices = {row['INDEX_NAME'] for row in db.execute_query("""
+        SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'catalogos_docs'
+        """) or []}
+        
+        cambios = []
+        if 'idx_tipo_checksum' not in indices:
+            cambios.append("ADD INDEX idx_tipo_checksum (tipo_archivo, checksum_md5)")
+        if 'idx_hash_render' not in indices:
+            cambios.append("ADD INDEX idx_hash_render (hash_render)")
+        if 'unique_catalogo_s3_key' not in indices:
+            cambios.append("ADD UNIQUE KEY unique_catalogo_s3_key (catalogo_id, s3_key)")
+        if 'unique_s3_key' in indices:
+            cambios.append("DROP INDEX unique_s3_key")
+        
+        if cambios:
+            db.execute_query(f"ALTER TABLE catalogos_docs {', '.join(cambios)}", fetch=False)
+            print(f"PDF_S3: Índices de deduplicación aplicados a 'catalogos_docs': {len(cambios)} cambios.")
+    except Exception as e:
+        print(f"PDF_S3: Error migrando 'catalogos_docs' para deduplicación: {str(e)}")
+
+
+def migrar_catalogos_docs_variantes(db: MySQLConnection):
+    """
+    Adapta una tabla catalogos_docs existente a las variantes de ancho de las
+    páginas: valor 'pagina_webp_variante' en tipo_archivo, columna ancho_px e
+    índice para leer las imágenes de un catálogo por tipo y página
+    """
+    try:
+        columnas = {row['COLUMN_NAME']: row['COLUMN_TYPE'] for row in db.execute_query("""
+        SELECT COLUMN_NAME, COLUMN_TYPE FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'catalogos_docs'
+          AND COLUMN_NAME IN ('tipo_archivo', 'ancho_px')
+        """) or []}
+        
+        cambios = []
+        if 'pagina_webp_variante' not in (columnas.get('tipo_archivo') or ''):
+            cambios.append("""MODIFY COLUMN tipo_archivo ENUM('pdf_original', 'pagina_webp', 'thumbnail', 'preview',
+                'pagina_png', 'pagina_webp_variante') NOT NULL""")
+        if 'ancho_px' not in columnas:
+            cambios.append("ADD COLUMN ancho_px INT NULL")
+        
+        indices = {row['INDEX_NAME'] for row in db.execute_query("""
+        SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'catalogos_docs'
+        """) or []}
+        if 'idx_catalogo_tipo_pagina' not in indices:
+            cambios.append("ADD INDEX idx_catalogo_tipo_pagina (catalogo_id, tipo_archivo, numero_pagina)")
+        
+        if cambios:
+            db.execute_query(f"ALTER TABLE catalogos_docs {', '.join(cambios)}", fetch=False)
+            print(f"PDF_S3: 'catalogos_docs' preparada para variantes de ancho: {len(cambios)} cambios.")
+    except Exception as e:
+        print(f"PDF_S3: Error migrando 'catalogos_docs' para variantes de ancho: {str(e)}")
+
+
+def migrar_catalogos_resumen(db: MySQLConnection, recalcular: bool = False):
+    """
+    Agrega a una tabla catalogos existente las columnas resumen de
+    catalogos_docs y las rellena para todos los catálogos.
+    
+    El relleno se repite si recalcular=True (la columna revision se acaba de
+    crear: un relleno anterior pudo fallar sin ella) o si hay catálogos con
+    archivos disponibles y total_archivos = 0 (relleno que nunca se completó)
+    """
+    try:
+        columnas = {row['COLUMN_NAME'] for row in db.execute_query("""
+        SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'catalogos'
+        """) or []}
+        
+        nuevas = [
+            ('paginas_procesadas', 'INT DEFAULT 0'),
+            ('total_archivos', 'INT DEFAULT 0'),
+            ('pdf_url', 'TEXT NULL'),
+            ('pdf_s3_key', 'VARCHAR(500) NULL'),
+            ('thumbnail_url', 'TEXT NULL'),
+            ('thumbnail_s3_key', 'VARCHAR(500) NULL'),
+        ]
+        cambios = [f"ADD COLUMN {nombre} {tipo}" for nombre, tipo in nuevas if nombre not in columnas]
+        
+        indices = {row['INDEX_NAME'] for row in db.execute_query("""
+        SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'catalogos'
+        """) or []}
+        if 'idx_estado_fecha' not in indices:
+            cambios.append("ADD INDEX idx_estado_fecha (estado, fecha_creacion)")
+        
+        if cambios:
+            db.execute_query(f"ALTER TABLE catalogos {', '.join(cambios)}", fetch=False)
+            print(f"PDF_S3: Columnas resumen agregadas a 'catalogos': {len(cambios)} cambios.")
+        elif not recalcular and not db.execute_query("""
+        SELECT 1 FROM catalogos c
+        WHERE c.total_archivos = 0 AND EXISTS (
+            SELECT 1 FROM catalogos_docs cd
+            WHERE cd.catalogo_id = c.id AND cd.estado_archivo = 'disponible')
+        LIMIT 1
+        """):
+            return
+        
+        # Relleno sin tocar fecha_actualizacion
+        result = db.execute_query(
+            CatalogoManager._ACTUALIZAR_RESUMEN.format(fecha_actualizacion='c.fecha_actualizacion'),
+            fetch=False
+        )
+        if result:
+            print(f"PDF_S3: Resumen calculado para {result.get('affected_rows', 0)} catálogos.")
+        else:
+            print("PDF_S3: Error calculando el resumen de 'catalogos'; se reintentará al próximo arranque.")
+    except Exception as e:
+        print(f"PDF_S3: Error migrando columnas resumen de 'catalogos': {str(e)}")
+
+
+def migrar_catalogos_revision(db: MySQLConnection) -> bool:
+    """Agrega a una tabla catalogos existente el contador revision; True si la agregó"""
+    try:
+        existe = db.execute_query("""
+        SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'catalogos' AND COLUMN_NAME = 'revision'
+        """)
+        if existe is None or existe:
+            return False
+        if not db.execute_query("ALTER TABLE catalogos ADD COLUMN revision BIGINT NOT NULL DEFAULT 0", fetch=False):
+            return False
+        print("PDF_S3: Columna 'revision' agregada a 'catalogos'.")
+        return True
+    except Exception as e:
+        print(f"PDF_S3: Error agregando la columna 'revision' a 'catalogos': {str(e)}")
+        return False
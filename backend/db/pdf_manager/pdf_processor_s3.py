@@ -7,22 +7,89 @@ import os
 import io
 import time
 import logging
+import tempfile
+import threading
 import fitz  # PyMuPDF
 from PIL import Image
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import hashlib
+import json
 
 from .models import (
     CatalogoManager, Catalogo, CatalogoDoc, 
     EstadoCatalogo, TipoArchivo, EstadoArchivo
 )
-from utils.upload_utils import S3UploadManager, UploadType
+from .render_engine import (
+    PageRenderEngine, RenderSettings, RenderedPage, RenderedImage, RENDER_CONFIG,
+    page_content_hashes, render_hash
+)
+from .upload_pipeline import S3UploadPipeline, UploadTask, UploadResult, UPLOAD_PIPELINE_CONFIG
+from utils.upload_utils import upload_manager, UploadType
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class _ArchivoTooLarge(Exception):
+    """El archivo supera max_file_size mientras se copia a disco"""
+
+
+@dataclass
+class _SpooledPDF:
+    """PDF ya en disco, con tamaño y MD5 calculados al copiarlo"""
+    path: str
+    size: int
+    checksum_md5: str
+    # True si el archivo es temporal y debe borrarse al terminar
+    temporal: bool
+
+
+class _PageDocBatcher:
+    """
+    Acumula los registros de páginas subidas y los inserta en catalogos_docs
+    por lotes de batch_size. Lo usan los hilos de subida; lo que quede sin
+    insertar se entrega con pendientes() para la transacción final del catálogo.
+    """
+    
+    def __init__(self, catalogo_manager: CatalogoManager, batch_size: int):
+        self.catalogo_manager = catalogo_manager
+        # None: no insertar por lotes, todo queda pendiente para la transacción final
+        self.batch_size = max(1, batch_size) if batch_size else None
+        self.registrados = 0
+        self.lotes = 0
+        self._pendientes: List[CatalogoDoc] = []
+        self._lock = threading.Lock()
+        # Serializa los INSERT para no ocupar varias conexiones del pool a la vez
+        self._flush_lock = threading.Lock()
+    
+    def agregar(self, doc: CatalogoDoc):
+        with self._lock:
+            self._pendientes.append(doc)
+            if self.batch_size is None or len(self._pendientes) < self.batch_size:
+                return
+            lote, self._pendientes = self._pendientes, []
+        self._flush(lote)
+    
+    def pendientes(self) -> List[CatalogoDoc]:
+        with self._lock:
+            lote, self._pendientes = self._pendientes, []
+        return lote
+    
+    def _flush(self, lote: List[CatalogoDoc]):
+        with self._flush_lock:
+            insertados = self.catalogo_manager.crear_documentos(lote)
+        with self._lock:
+            if insertados is None:
+                # Se reintentan en la transacción final
+                logger.warning(f"⚠️ Error registrando lote de {len(lote)} páginas, se reintentará al finalizar")
+                self._pendientes[:0] = lote
+            else:
+                self.registrados += len(lote)
+                self.lotes += 1
+
+
 class PDFProcessorS3:
     """
     Procesador de PDFs profesional que usa S3 y base de datos
@@ -30,18 +97,42 @@ class PDFProcessorS3:
     
     def __init__(self):
         """Inicializar procesador con S3 y gestor de catálogos"""
-        self.s3_manager = S3UploadManager()
+        # Reutilizar el gestor global: un solo cliente boto3 con su pool HTTP
+        self.s3_manager = upload_manager
         self.catalogo_manager = CatalogoManager()
         
         # Configuración de procesamiento
         self.config = {
-            'target_width_px': 1200,  # Ancho objetivo para páginas
-            'thumbnail_width': 300,   # Ancho de thumbnails
-            'webp_quality': 85,       # Calidad WEBP
+            # Parámetros de renderizado; al cambiarlos, rerender_catalogo() actualiza
+            # solo las páginas que se generaron con otros valores
+            'target_width_px': int(os.getenv('PDF_TARGET_WIDTH_PX', 1200)),  # Ancho objetivo para páginas
+            'thumbnail_width': int(os.getenv('PDF_THUMBNAIL_WIDTH', 300)),   # Ancho de thumbnails
+            # Anchos adicionales por página (variantes responsive), reducidos del mismo pixmap
+            'variant_widths': sorted({
+                int(w) for w in os.getenv('PDF_VARIANT_WIDTHS', '400,800').split(',') if w.strip()
+            }),
+            'webp_quality': int(os.getenv('PDF_WEBP_QUALITY', 85)),          # Calidad WEBP
+            'webp_method': 6,         # Esfuerzo de compresión WEBP (0-6)
             'batch_size': 5,          # Páginas por lote
-            'max_file_size': 100 * 1024 * 1024  # 100MB máximo
+            'db_batch_size': int(os.getenv('PDF_DB_BATCH_SIZE', 50)),  # Páginas por INSERT en catalogos_docs
+            'max_file_size': 100 * 1024 * 1024,  # 100MB máximo
+            'spool_chunk_size': 1024 * 1024,     # Bloque de lectura al copiar el PDF a disco
+            # Renderizado en paralelo (ver render_engine.RENDER_CONFIG)
+            'render_workers': RENDER_CONFIG['workers'],
+            'render_memory_limit_mb': RENDER_CONFIG['memory_limit_mb'],
+            'render_chunk_size': RENDER_CONFIG['chunk_size'],
+            # Subida concurrente a S3 (ver upload_pipeline.UPLOAD_PIPELINE_CONFIG)
+            'upload_workers': UPLOAD_PIPELINE_CONFIG['workers'],
+            'upload_queue_size': UPLOAD_PIPELINE_CONFIG['queue_size'],
+            'upload_max_retries': UPLOAD_PIPELINE_CONFIG['max_retries']
         }
         
+        self.render_engine = PageRenderEngine(
+            workers=self.config['render_workers'],
+            memory_limit_mb=self.config['render_memory_limit_mb'],
+            chunk_size=self.config['render_chunk_size']
+        )
+        
         # Estado del procesamiento actual
         self.current_progress = {
             "status": "idle",
@@ -60,57 +151,68 @@ class PDFProcessorS3:
     
     def process_pdf_complete(self, pdf_file_data, filename: str, 
                            descripcion: str = "", categoria: str = "general",
-                           usuario_id: Optional[int] = None) -> Dict:
+                           usuario_id: Optional[int] = None,
+                           catalogo_id: Optional[int] = None,
+                           progress: Optional[Dict] = None) -> Dict:
         """
         Procesa un PDF completo: crea catálogo, sube archivos a S3 y registra en BD
         
         Args:
-            pdf_file_data: Datos del archivo PDF (bytes o file-like object)
+            pdf_file_data: Ruta del PDF en disco (se usa tal cual), file-like object
+                (se copia a un temporal por bloques) o bytes
             filename: Nombre del archivo PDF
             descripcion: Descripción del catálogo
             categoria: Categoría del catálogo
             usuario_id: ID del usuario que sube el archivo
+            catalogo_id: Catálogo de un procesamiento interrumpido a reanudar;
+                se omiten el PDF original, las páginas y el thumbnail ya registrados
+            progress: Diccionario donde reportar el progreso (por defecto
+                self.current_progress, compartido por todo el proceso)
             
         Returns:
             Dict: Resultado del procesamiento completo
         """
         start_time = time.time()
-        catalogo_id = None
+        if progress is None:
+            progress = self.current_progress
+        spooled = None
         
         try:
-            # 1. Validar archivo PDF
-            if hasattr(pdf_file_data, 'read'):
-                pdf_bytes = pdf_file_data.read()
-                pdf_file_data.seek(0)  # Reset para uso posterior
-            else:
-                pdf_bytes = pdf_file_data
-            
-            if len(pdf_bytes) > self.config['max_file_size']:
+            # 1. Validar archivo PDF (a disco una sola vez, con MD5 incremental)
+            try:
+                spooled = self._spool_pdf(pdf_file_data)
+            except _ArchivoTooLarge:
                 return {
                     'success': False,
                     'error': f'Archivo muy grande. Máximo: {self.config["max_file_size"] / (1024*1024):.1f}MB'
                 }
             
-            # 2. Crear registro de catálogo en BD
+            # 2. Crear registro de catálogo en BD (o reanudar uno existente)
             nombre_sin_extension = os.path.splitext(filename)[0]
+            reanudando = bool(catalogo_id) and self.catalogo_manager.obtener_catalogo(catalogo_id) is not None
+            if catalogo_id and not reanudando:
+                catalogo_id = None
             catalogo = Catalogo(
                 nombre=nombre_sin_extension,
                 descripcion=descripcion,
                 categoria=categoria,
                 estado=EstadoCatalogo.PROCESANDO,
                 usuario_id=usuario_id,
-                tamaño_archivo=len(pdf_bytes),
+                tamaño_archivo=spooled.size,
                 nombre_archivo_original=filename
             )
             
-            catalogo_id = self.catalogo_manager.crear_catalogo(catalogo)
-            if not catalogo_id:
-                return {'success': False, 'error': 'Error creando registro de catálogo'}
-            
-            logger.info(f"✅ Catálogo creado con ID: {catalogo_id}")
+            if reanudando:
+                logger.info(f"🔁 Reanudando procesamiento del catálogo ID: {catalogo_id}")
+            else:
+                catalogo_id = self.catalogo_manager.crear_catalogo(catalogo)
+                if not catalogo_id:
+                    return {'success': False, 'error': 'Error creando registro de catálogo'}
+                
+                logger.info(f"✅ Catálogo creado con ID: {catalogo_id}")
             
             # 3. Inicializar progreso
-            self.current_progress.update({
+            progress.update({
                 "status": "processing",
                 "catalogo_id": catalogo_id,
                 "current_file": filename,
@@ -118,20 +220,71 @@ class PDFProcessorS3:
                 "errors": []
             })
             
+            # Hash por página (contenido + parámetros de renderizado) para deduplicar
+            settings = self._render_settings()
+            render_hashes = {
+                n: render_hash(h, settings) for n, h in page_content_hashes(spooled.path).items()
+            }
+            
+            # Mismo PDF ya procesado con los mismos parámetros: reutilizar todo
+            if not reanudando:
+                duplicado = self._resolver_duplicado(
+                    catalogo_id, nombre_sin_extension, spooled, render_hashes, start_time, progress
+                )
+                if duplicado:
+                    return duplicado
+            
+            # Lo ya registrado en un intento anterior no se vuelve a generar
+            pdf_original = self.catalogo_manager.obtener_pdf_original(catalogo_id) if reanudando else None
+            thumbnail = self.catalogo_manager.obtener_thumbnail(catalogo_id) if reanudando else None
+            paginas_hechas = set()
+            if reanudando:
+                paginas_hechas = {p['numero_pagina'] for p in self.catalogo_manager.obtener_paginas_catalogo(catalogo_id)}
+                if not thumbnail:
+                    # La página 1 hace falta para generar el thumbnail
+                    paginas_hechas.discard(1)
+            
             # 4. Subir PDF original a S3
-            pdf_s3_result = self._upload_pdf_original(catalogo_id, filename, pdf_bytes)
+            if pdf_original:
+                pdf_s3_result = {'success': True, 'url': pdf_original['url_s3'], 's3_key': pdf_original['s3_key']}
+            else:
+                pdf_s3_result = self._upload_pdf_original(catalogo_id, filename, spooled)
             if not pdf_s3_result['success']:
-                self._handle_error(catalogo_id, f"Error subiendo PDF: {pdf_s3_result['error']}")
+                self._handle_error(catalogo_id, f"Error subiendo PDF: {pdf_s3_result['error']}", progress)
                 return pdf_s3_result
             
+            # Páginas idénticas ya renderizadas en otros catálogos: se vinculan sin renderizar.
+            # La página 1 se renderiza si falta el thumbnail (se genera a partir de ella)
+            candidatas = {
+                n: h for n, h in render_hashes.items()
+                if n not in paginas_hechas and (n != 1 or thumbnail)
+            }
+            existentes = self.catalogo_manager.buscar_paginas_por_hash(list(candidatas.values()))
+            paginas_reutilizadas = {n: h for n, h in candidatas.items() if h in existentes}
+            docs_reutilizados = [
+                doc
+                for n, h in paginas_reutilizadas.items()
+                for doc in self._linked_page_docs(catalogo_id, n, h, existentes[h])
+            ]
+            if paginas_reutilizadas:
+                logger.info(f"♻️ {len(paginas_reutilizadas)} páginas reutilizadas de catálogos anteriores")
+            paginas_hechas = paginas_hechas | set(paginas_reutilizadas)
+            
             # 5. Procesar páginas del PDF
-            pages_result = self._process_pdf_pages(catalogo_id, pdf_bytes, filename)
+            pages_result = self._process_pdf_pages(
+                catalogo_id, spooled.path, filename, progress, paginas_hechas, render_hashes
+            )
             if not pages_result['success']:
-                self._handle_error(catalogo_id, f"Error procesando páginas: {pages_result['error']}")
+                self._handle_error(catalogo_id, f"Error procesando páginas: {pages_result['error']}", progress)
                 return pages_result
             
             # 6. Crear thumbnail
-            thumbnail_result = self._create_thumbnail_s3(catalogo_id, pages_result['first_page_data'])
+            if thumbnail:
+                thumbnail_result = {'success': True, 'url': thumbnail['url_s3']}
+            else:
+                thumbnail_result = self._create_thumbnail_s3(
+                    catalogo_id, pages_result['first_page_data'], thumbnail=pages_result['thumbnail']
+                )
             if not thumbnail_result['success']:
                 logger.warning(f"Error creando thumbnail: {thumbnail_result['error']}")
             
@@ -140,6 +293,8 @@ class PDFProcessorS3:
                 'tiempo_procesamiento': time.time() - start_time,
                 'configuracion': self.config,
                 'fecha_procesamiento': datetime.now().isoformat(),
+                'rendimiento': pages_result.get('throughput'),
+                'deduplicacion': {'paginas_reutilizadas': len(paginas_reutilizadas)},
                 'archivos_generados': {
                     'pdf_original': pdf_s3_result.get('url'),
                     'total_paginas': pages_result.get('total_pages', 0),
@@ -147,19 +302,21 @@ class PDFProcessorS3:
                 }
             }
             
-            self.catalogo_manager.actualizar_estado_catalogo(
-                catalogo_id, 
-                EstadoCatalogo.ACTIVO, 
-                metadatos_procesamiento
-            )
-            
-            self.catalogo_manager.actualizar_total_paginas(
-                catalogo_id, 
-                pages_result.get('total_pages', 0)
+            # Páginas aún sin registrar + estado + total de páginas en una sola transacción
+            finalizado = self.catalogo_manager.finalizar_catalogo(
+                catalogo_id,
+                EstadoCatalogo.ACTIVO,
+                metadatos_procesamiento,
+                pages_result.get('total_pages', 0),
+                docs_reutilizados + pages_result.get('pending_docs', [])
             )
+            if not finalizado:
+                error_msg = 'Error registrando páginas y estado final del catálogo'
+                self._handle_error(catalogo_id, error_msg, progress)
+                return {'success': False, 'error': error_msg, 'catalogo_id': catalogo_id}
             
             # 8. Finalizar progreso
-            self.current_progress.update({
+            progress.update({
                 "status": "completed",
                 "percentage": 100
             })
@@ -187,9 +344,9 @@ class PDFProcessorS3:
             logger.error(error_msg, exc_info=True)
             
             if catalogo_id:
-                self._handle_error(catalogo_id, error_msg)
+                self._handle_error(catalogo_id, error_msg, progress)
             
-            self.current_progress.update({
+            progress.update({
                 "status": "error",
                 "error": error_msg
             })
@@ -199,26 +356,123 @@ class PDFProcessorS3:
                 'error': error_msg,
                 'catalogo_id': catalogo_id
             }
+        finally:
+            if spooled and spooled.temporal:
+                try:
+                    os.unlink(spooled.path)
+                except OSError:
+                    pass
+    
+    def _resolver_duplicado(self, catalogo_id: int, nombre: str, spooled: _SpooledPDF,
+                            render_hashes: Dict[int, str], start_time: float, progress: Dict) -> Optional[Dict]:
+        """
+        Si ya existe un catálogo activo con el mismo PDF (MD5) y sus páginas se
+        renderizaron con los parámetros actuales, vincula sus objetos de S3 y
+        registros al catálogo nuevo sin renderizar ni subir nada.
+        
+        Returns:
+            Dict: Resultado del procesamiento, o None si no hay duplicado utilizable
+        """
+        origen = self.catalogo_manager.buscar_catalogo_por_checksum(spooled.checksum_md5)
+        if not origen:
+            return None
+        
+        paginas_origen = {
+            p['numero_pagina']: p.get('hash_render')
+            for p in self.catalogo_manager.obtener_paginas_catalogo(origen['id'])
+        }
+        if paginas_origen != render_hashes or not self.catalogo_manager.obtener_thumbnail(origen['id']):
+            return None
+        
+        metadatos_procesamiento = {
+            'tiempo_procesamiento': time.time() - start_time,
+            'configuracion': self.config,
+            'fecha_procesamiento': datetime.now().isoformat(),
+            'deduplicacion': {'catalogo_origen': origen['id'], 'paginas_reutilizadas': len(render_hashes)}
+        }
+        if not self.catalogo_manager.finalizar_catalogo(
+            catalogo_id, EstadoCatalogo.ACTIVO, metadatos_procesamiento,
+            len(render_hashes), origen_id=origen['id']
+        ):
+            return None
+        
+        progress.update({"status": "completed", "percentage": 100, "total_pages": len(render_hashes)})
+        processing_time = time.time() - start_time
+        logger.info(f"♻️ PDF idéntico al catálogo {origen['id']}: catálogo {catalogo_id} vinculado en {processing_time:.3f}s")
+        
+        catalogo_completo = self.catalogo_manager.obtener_catalogo_completo(catalogo_id)
+        pdf_original = self.catalogo_manager.obtener_pdf_original(catalogo_id) or {}
+        thumbnail = self.catalogo_manager.obtener_thumbnail(catalogo_id) or {}
+        return {
+            'success': True,
+            'catalogo_id': catalogo_id,
+            'nombre': nombre,
+            'total_pages': len(render_hashes),
+            'processing_time': processing_time,
+            'pdf_url': pdf_original.get('url_s3'),
+            'thumbnail_url': thumbnail.get('url_s3'),
+            'deduplicado_de': origen['id'],
+            'catalogo_completo': catalogo_completo,
+            'message': f'Catálogo vinculado a uno idéntico existente: {len(render_hashes)} páginas'
+        }
     
-    def _upload_pdf_original(self, catalogo_id: int, filename: str, pdf_bytes: bytes) -> Dict:
-        """Sube el PDF original a S3 y registra en BD"""
+    def _spool_pdf(self, pdf_file_data) -> _SpooledPDF:
+        """
+        Deja el PDF en un archivo en disco calculando tamaño y MD5 por bloques,
+        sin mantener el contenido completo en memoria
+        """
+        max_size = self.config['max_file_size']
+        chunk_size = self.config['spool_chunk_size']
+        md5 = hashlib.md5()
+        
+        if isinstance(pdf_file_data, (str, os.PathLike)):
+            # Ya está en disco (p. ej. el spool de la cola de trabajos): solo se lee para el MD5
+            path = os.fspath(pdf_file_data)
+            size = os.path.getsize(path)
+            if size > max_size:
+                raise _ArchivoTooLarge()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    md5.update(chunk)
+            return _SpooledPDF(path=path, size=size, checksum_md5=md5.hexdigest(), temporal=False)
+        
+        size = 0
+        tmp = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+        try:
+            with tmp:
+                if isinstance(pdf_file_data, (bytes, bytearray)):
+                    chunks = (pdf_file_data[i:i + chunk_size] for i in range(0, len(pdf_file_data), chunk_size))
+                else:
+                    chunks = iter(lambda: pdf_file_data.read(chunk_size), b'')
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > max_size:
+                        raise _ArchivoTooLarge()
+                    md5.update(chunk)
+                    tmp.write(chunk)
+            return _SpooledPDF(path=tmp.name, size=size, checksum_md5=md5.hexdigest(), temporal=True)
+        except BaseException:
+            try:
+                os.unlink(tmp.name)
+            except OSError:
+                pass
+            raise
+    
+    def _upload_pdf_original(self, catalogo_id: int, filename: str, spooled: _SpooledPDF) -> Dict:
+        """Sube el PDF original a S3 (multipart desde disco) y registra en BD"""
         try:
             # Generar S3 key
             s3_key = f"pdf/{catalogo_id}/{filename}"
             
             # Subir a S3
-            pdf_file_obj = io.BytesIO(pdf_bytes)
-            success, s3_url, error_msg = self.s3_manager.upload_file_with_custom_key(
-                pdf_file_obj, 
+            success, s3_url, error_msg = self.s3_manager.upload_path_with_custom_key(
+                spooled.path,
                 s3_key
             )
             
             if not success:
                 return {'success': False, 'error': error_msg}
             
-            # Calcular checksum
-            checksum = hashlib.md5(pdf_bytes).hexdigest()
-            
             # Registrar en BD
             doc = CatalogoDoc(
                 catalogo_id=catalogo_id,
@@ -226,9 +480,9 @@ class PDFProcessorS3:
                 nombre_archivo=filename,
                 url_s3=s3_url,
                 s3_key=s3_key,
-                tamaño_archivo=len(pdf_bytes),
+                tamaño_archivo=spooled.size,
                 mime_type='application/pdf',
-                checksum_md5=checksum,
+                checksum_md5=spooled.checksum_md5,
                 metadatos={
                     'original': True,
                     'uploaded_at': datetime.now().isoformat()
@@ -250,193 +504,270 @@ class PDFProcessorS3:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def _process_pdf_pages(self, catalogo_id: int, pdf_bytes: bytes, filename: str) -> Dict:
-        """Procesa todas las páginas del PDF y las sube a S3"""
+    def _render_settings(self) -> RenderSettings:
+        """Parámetros de renderizado a partir de la configuración actual"""
+        return RenderSettings(
+            target_width_px=self.config['target_width_px'],
+            webp_quality=self.config['webp_quality'],
+            webp_method=self.config['webp_method'],
+            variant_widths=tuple(self._variant_widths()),
+            thumbnail_width=self.config['thumbnail_width']
+        )
+    
+    def _variant_widths(self) -> List[int]:
+        """Anchos de variante configurados, sin el ancho de la página principal"""
+        return [w for w in self.config['variant_widths'] if 0 < w != self.config['target_width_px']]
+    
+    def _process_pdf_pages(self, catalogo_id: int, pdf_path: str, filename: str,
+                           progress: Dict, paginas_hechas: Optional[set] = None,
+                           render_hashes: Optional[Dict[int, str]] = None,
+                           key_prefix: Optional[str] = None, registrar_por_lotes: bool = True) -> Dict:
+        """
+        Procesa las páginas del PDF (salvo paginas_hechas) y las sube a S3
+        
+        key_prefix cambia la carpeta de S3 (por defecto pdf/{catalogo_id}); con
+        registrar_por_lotes=False ningún registro se inserta durante el proceso
+        y todos quedan en 'pending_docs'
+        """
         try:
-            # Abrir PDF
-            pdf_file_obj = io.BytesIO(pdf_bytes)
-            doc = fitz.open(stream=pdf_file_obj, filetype="pdf")
-            total_pages = doc.page_count
+            # PyMuPDF y los procesos de renderizado abren el PDF desde disco
+            with fitz.open(pdf_path) as doc:
+                total_pages = doc.page_count
+            
+            paginas_hechas = paginas_hechas or set()
+            page_numbers = [n for n in range(1, total_pages + 1) if n not in paginas_hechas]
+            if paginas_hechas:
+                logger.info(f"⏭️ {total_pages - len(page_numbers)} páginas ya registradas o reutilizadas, se omiten")
+            render_hashes = render_hashes or {}
             
-            self.current_progress.update({
+            progress.update({
                 "total_pages": total_pages,
                 "current_page": 0
             })
             
-            logger.info(f"📄 Procesando {total_pages} páginas del PDF")
+            logger.info(f"📄 Procesando {total_pages} páginas del PDF "
+                        f"({self.render_engine.effective_workers()} procesos de renderizado, "
+                        f"{self.config['upload_workers']} hilos de subida)")
             
-            generated_pages = []
             first_page_data = None
+            first_page_thumbnail = None
+            render_errors = []
+            rendered_count = 0
+            render_started = time.monotonic()
+            render_busy = 0.0
             batch_size = self.config['batch_size']
             
-            # Procesar en lotes
-            for batch_start in range(0, total_pages, batch_size):
-                batch_end = min(batch_start + batch_size, total_pages)
-                logger.info(f"🔄 Procesando lote {batch_start+1}-{batch_end} de {total_pages}")
-                
-                for i in range(batch_start, batch_end):
-                    page_result = self._process_single_page(catalogo_id, doc, i + 1)
+            batcher = _PageDocBatcher(
+                self.catalogo_manager,
+                self.config['db_batch_size'] if registrar_por_lotes else None
+            )
+            pipeline = S3UploadPipeline(
+                self.s3_manager,
+                workers=self.config['upload_workers'],
+                queue_size=self.config['upload_queue_size'],
+                max_retries=self.config['upload_max_retries'],
+                on_uploaded=lambda result: batcher.agregar(self._page_doc(catalogo_id, result))
+            )
+            
+            # Renderizado (productor) y subida (consumidores) se solapan; put()
+            # frena el renderizado si la cola de subida se llena
+            with pipeline:
+                rendered_pages = self.render_engine.render(pdf_path, self._render_settings(), page_numbers)
+                while True:
+                    step_started = time.monotonic()
+                    rendered = next(rendered_pages, None)
+                    render_busy += time.monotonic() - step_started
+                    if rendered is None:
+                        break
                     
-                    if page_result['success']:
-                        generated_pages.append(page_result)
-                        
+                    i = rendered.page_number - 1
+                    if rendered.success:
+                        rendered_count += 1
                         # Guardar datos de la primera página para thumbnail
                         if i == 0:
-                            first_page_data = page_result['image_data']
+                            first_page_data = rendered.webp_bytes
+                            first_page_thumbnail = rendered.thumbnail
+                        for task in self._page_upload_tasks(
+                            catalogo_id, rendered, render_hashes.get(rendered.page_number), key_prefix
+                        ):
+                            pipeline.put(task)
                     else:
-                        logger.warning(f"⚠️ Error procesando página {i+1}: {page_result['error']}")
+                        render_errors.append(rendered.page_number)
+                        logger.warning(f"⚠️ Error procesando página {i+1}: {rendered.error}")
                     
                     # Actualizar progreso
-                    self.current_progress.update({
+                    progress.update({
                         "current_page": i + 1,
+                        "uploaded_pages": pipeline.stats()['uploaded'],
                         "percentage": int(((i + 1) / total_pages) * 90)  # 90% para páginas, 10% para thumbnail
                     })
-                
-                # Liberar memoria entre lotes
-                if batch_end < total_pages:
-                    import gc
-                    gc.collect()
+                    
+                    if (i + 1) % batch_size == 0:
+                        logger.info(f"🔄 Renderizadas {i+1} de {total_pages} páginas")
             
-            doc.close()
+            render_wall = time.monotonic() - render_started
+            upload_stats = pipeline.stats()
             
-            logger.info(f"✅ Procesadas {len(generated_pages)} páginas exitosamente")
+            generated_pages = []
+            for result in sorted(pipeline.results, key=lambda r: r.payload['page_number']):
+                if result.payload.get('ancho_variante'):
+                    if not result.success:
+                        logger.warning(f"⚠️ Error subiendo variante {result.payload['ancho_variante']}px "
+                                       f"de la página {result.payload['page_number']}: {result.error}")
+                    continue
+                if result.success:
+                    generated_pages.append({
+                        'success': True,
+                        'page_number': result.payload['page_number'],
+                        'url': result.url,
+                        's3_key': result.s3_key,
+                        'size_bytes': result.size_bytes
+                    })
+                else:
+                    logger.warning(f"⚠️ Error subiendo página {result.payload['page_number']}: {result.error}")
+            
+            throughput = {
+                'render': {
+                    'pages': rendered_count,
+                    'errors': len(render_errors),
+                    'busy_seconds': round(render_busy, 3),
+                    'pages_per_second': round(rendered_count / render_busy, 2) if render_busy else 0.0
+                },
+                'upload': upload_stats,
+                'db': {
+                    'batch_size': batcher.batch_size,
+                    'pages_registered': batcher.registrados,
+                    'batches': batcher.lotes
+                },
+                'total_seconds': round(render_wall, 3)
+            }
+            progress.update({"uploaded_pages": upload_stats['uploaded']})
+            
+            logger.info(f"✅ Procesadas {len(generated_pages)} páginas exitosamente "
+                        f"(render {throughput['render']['pages_per_second']} pág/s, "
+                        f"subida {upload_stats['items_per_second']} pág/s, "
+                        f"{upload_stats['retries']} reintentos)")
             
             return {
                 'success': True,
                 'total_pages': total_pages,
                 'pages_processed': len(generated_pages),
                 'pages_data': generated_pages,
-                'first_page_data': first_page_data
+                'first_page_data': first_page_data,
+                'thumbnail': first_page_thumbnail,
+                'pending_docs': batcher.pendientes(),
+                'throughput': throughput
             }
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def _process_single_page(self, catalogo_id: int, doc, page_number: int) -> Dict:
-        """Procesa una página individual del PDF"""
-        try:
-            page = doc.load_page(page_number - 1)  # fitz usa índice 0
-            
-            # Configurar resolución
-            original_rect = page.rect
-            original_width_points = original_rect.width
-            
-            if original_width_points == 0:
-                zoom_x = 1.0
-            else:
-                zoom_x = self.config['target_width_px'] / original_width_points
-            
-            zoom_y = zoom_x
-            matrix = fitz.Matrix(zoom_x, zoom_y)
-            
-            # Renderizar página
-            pix = page.get_pixmap(matrix=matrix, alpha=False)
-            mode = "RGB"
-            
-            if pix.alpha:
-                mode = "RGBA"
-            
-            # Convertir a imagen PIL
-            img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
-            
-            # Convertir a WEBP en memoria
-            webp_buffer = io.BytesIO()
-            img.save(webp_buffer, "WEBP", quality=self.config['webp_quality'], method=6)
-            webp_bytes = webp_buffer.getvalue()
-            
-            # Generar nombre y S3 key
-            webp_filename = f"page_{page_number}.webp"
-            s3_key = f"pdf/{catalogo_id}/{webp_filename}"
-            
-            # Subir a S3
-            webp_file_obj = io.BytesIO(webp_bytes)
-            success, s3_url, error_msg = self.s3_manager.upload_file_with_custom_key(
-                webp_file_obj,
-                s3_key
-            )
-            
-            if not success:
-                return {'success': False, 'error': error_msg}
-            
-            # Calcular checksum
-            checksum = hashlib.md5(webp_bytes).hexdigest()
-            
-            # Registrar en BD
-            doc = CatalogoDoc(
-                catalogo_id=catalogo_id,
-                tipo_archivo=TipoArchivo.PAGINA_WEBP,
-                nombre_archivo=webp_filename,
-                url_s3=s3_url,
+    @staticmethod
+    def _page_upload_tasks(catalogo_id: int, rendered: RenderedPage,
+                           hash_render: Optional[str] = None, key_prefix: Optional[str] = None) -> List[UploadTask]:
+        """
+        Tareas de subida para una página renderizada y sus variantes de ancho
+        (los metadatos viajan en el payload)
+        """
+        webp_filename = f"page_{rendered.page_number}.webp"
+        prefix = key_prefix or f'pdf/{catalogo_id}'
+        imagenes = [(None, f"{prefix}/{webp_filename}", rendered.webp_bytes, rendered.width, rendered.height)]
+        imagenes += [
+            (v.width, f"{prefix}/w{v.width}/{webp_filename}", v.webp_bytes, v.width, v.height)
+            for v in rendered.variants
+        ]
+        return [
+            UploadTask(
                 s3_key=s3_key,
-                numero_pagina=page_number,
-                tamaño_archivo=len(webp_bytes),
-                mime_type='image/webp',
-                checksum_md5=checksum,
-                metadatos={
-                    'width': pix.width,
-                    'height': pix.height,
-                    'quality': self.config['webp_quality'],
-                    'original_width_points': original_width_points,
-                    'zoom_factor': zoom_x
+                data=data,
+                payload={
+                    'page_number': rendered.page_number,
+                    'nombre_archivo': webp_filename,
+                    'checksum_md5': hashlib.md5(data).hexdigest(),
+                    'width': width,
+                    'height': height,
+                    'original_width_points': rendered.original_width_points,
+                    'zoom_factor': rendered.zoom_factor * width / rendered.width if rendered.width else 1.0,
+                    'hash_render': hash_render,
+                    'ancho_variante': ancho_variante
                 }
             )
-            
-            doc_id = self.catalogo_manager.crear_documento(doc)
-            
-            # Liberar memoria
-            img.close()
-            pix = None
-            webp_buffer.close()
-            webp_file_obj.close()
-            
-            return {
-                'success': True,
-                'page_number': page_number,
-                'url': s3_url,
-                's3_key': s3_key,
-                'doc_id': doc_id,
-                'size_bytes': len(webp_bytes),
-                'image_data': webp_bytes  # Para thumbnail
-            }
-            
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+            for ancho_variante, s3_key, data, width, height in imagenes
+        ]
+    
+    def _page_doc(self, catalogo_id: int, result: UploadResult) -> CatalogoDoc:
+        """Registro de catalogos_docs para una página ya subida a S3"""
+        page = result.payload
+        variante = bool(page.get('ancho_variante'))
+        return CatalogoDoc(
+            catalogo_id=catalogo_id,
+            tipo_archivo=TipoArchivo.PAGINA_WEBP_VARIANTE if variante else TipoArchivo.PAGINA_WEBP,
+            nombre_archivo=page['nombre_archivo'],
+            url_s3=result.url,
+            s3_key=result.s3_key,
+            numero_pagina=page['page_number'],
+            tamaño_archivo=result.size_bytes,
+            mime_type='image/webp',
+            checksum_md5=page['checksum_md5'],
+            metadatos={
+                'width': page['width'],
+                'height': page['height'],
+                'quality': self.config['webp_quality'],
+                'target_width_px': self.config['target_width_px'],
+                'webp_method': self.config['webp_method'],
+                'original_width_points': page['original_width_points'],
+                'zoom_factor': page['zoom_factor']
+            },
+            hash_render=page.get('hash_render'),
+            ancho_px=page['width']
+        )
     
-    def _create_thumbnail_s3(self, catalogo_id: int, first_page_data: bytes) -> Dict:
-        """Crea thumbnail a partir de la primera página y lo sube a S3"""
+    @staticmethod
+    def _linked_page_docs(catalogo_id: int, page_number: int, hash_render: str, existente: Dict) -> List[CatalogoDoc]:
+        """Registros de una página (y sus variantes) que reutilizan los objetos de S3 de otro catálogo"""
+        docs = []
+        for fila in [existente] + existente.get('variantes', []):
+            metadatos = fila.get('metadatos')
+            if isinstance(metadatos, (str, bytes)):
+                metadatos = json.loads(metadatos)
+            docs.append(CatalogoDoc(
+                catalogo_id=catalogo_id,
+                tipo_archivo=TipoArchivo(fila.get('tipo_archivo') or TipoArchivo.PAGINA_WEBP.value),
+                nombre_archivo=f"page_{page_number}.webp",
+                url_s3=fila['url_s3'],
+                s3_key=fila['s3_key'],
+                numero_pagina=page_number,
+                tamaño_archivo=fila.get('tamaño_archivo') or 0,
+                mime_type=fila.get('mime_type') or 'image/webp',
+                checksum_md5=fila.get('checksum_md5'),
+                metadatos=metadatos,
+                hash_render=hash_render,
+                ancho_px=fila.get('ancho_px')
+            ))
+        return docs
+    
+    def _create_thumbnail_s3(self, catalogo_id: int, first_page_data: bytes,
+                             key_prefix: Optional[str] = None, registrar: bool = True,
+                             thumbnail: Optional[RenderedImage] = None) -> Dict:
+        """
+        Crea thumbnail a partir de la primera página y lo sube a S3
+        
+        Si el renderizado ya lo generó desde el pixmap (thumbnail) se sube tal
+        cual; si no, se decodifica el WEBP de la página 1 y se reduce.
+        Con registrar=False no se inserta en BD y el registro se devuelve en 'doc'
+        """
         try:
-            if not first_page_data:
+            if thumbnail and thumbnail.width == self.config['thumbnail_width']:
+                target_width, target_height = thumbnail.width, thumbnail.height
+                thumbnail_bytes = thumbnail.webp_bytes
+            elif not first_page_data:
                 return {'success': False, 'error': 'No hay datos de primera página'}
-            
-            # Abrir imagen de primera página
-            img = Image.open(io.BytesIO(first_page_data))
-            
-            # Redimensionar para thumbnail
-            original_width, original_height = img.size
-            target_width = self.config['thumbnail_width']
-            
-            if original_width == 0:
-                target_height = target_width
             else:
-                aspect_ratio = original_height / original_width
-                target_height = int(target_width * aspect_ratio)
-            
-            # Redimensionar
-            try:
-                resampling_filter = Image.Resampling.LANCZOS
-            except AttributeError:
-                resampling_filter = Image.LANCZOS
-            
-            img_resized = img.resize((target_width, target_height), resampling_filter)
-            
-            # Convertir a WEBP
-            thumbnail_buffer = io.BytesIO()
-            img_resized.save(thumbnail_buffer, "WEBP", quality=80, method=6)
-            thumbnail_bytes = thumbnail_buffer.getvalue()
+                target_width, target_height, thumbnail_bytes = self._thumbnail_desde_webp(first_page_data)
             
             # Generar nombre y S3 key
             thumbnail_filename = f"thumbnail.webp"
-            s3_key = f"pdf/{catalogo_id}/{thumbnail_filename}"
+            s3_key = f"{key_prefix or f'pdf/{catalogo_id}'}/{thumbnail_filename}"
             
             # Subir a S3
             thumbnail_file_obj = io.BytesIO(thumbnail_bytes)
@@ -469,12 +800,7 @@ class PDFProcessorS3:
                 }
             )
             
-            doc_id = self.catalogo_manager.crear_documento(doc)
-            
-            # Liberar memoria
-            img.close()
-            img_resized.close()
-            thumbnail_buffer.close()
+            doc_id = self.catalogo_manager.crear_documento(doc) if registrar else None
             thumbnail_file_obj.close()
             
             logger.info(f"✅ Thumbnail creado: {s3_url}")
@@ -484,14 +810,210 @@ class PDFProcessorS3:
                 'url': s3_url,
                 's3_key': s3_key,
                 'doc_id': doc_id,
+                'doc': doc,
                 'size_bytes': len(thumbnail_bytes)
             }
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def _handle_error(self, catalogo_id: int, error_message: str):
+    def _thumbnail_desde_webp(self, first_page_data: bytes) -> Tuple[int, int, bytes]:
+        """Reduce el WEBP de la página 1 al ancho de thumbnail (ancho, alto, bytes WEBP)"""
+        img = Image.open(io.BytesIO(first_page_data))
+        
+        original_width, original_height = img.size
+        target_width = self.config['thumbnail_width']
+        
+        if original_width == 0:
+            target_height = target_width
+        else:
+            aspect_ratio = original_height / original_width
+            target_height = int(target_width * aspect_ratio)
+        
+        try:
+            resampling_filter = Image.Resampling.LANCZOS
+        except AttributeError:
+            resampling_filter = Image.LANCZOS
+        
+        img_resized = img.resize((target_width, target_height), resampling_filter)
+        
+        thumbnail_buffer = io.BytesIO()
+        img_resized.save(thumbnail_buffer, "WEBP", quality=80, method=6)
+        
+        img.close()
+        img_resized.close()
+        return target_width, target_height, thumbnail_buffer.getvalue()
+    
+    # ==========================================
+    # RE-RENDERIZADO INCREMENTAL
+    # ==========================================
+    
+    def _pagina_desactualizada(self, metadatos: Optional[Dict]) -> bool:
+        """True si la página se renderizó con parámetros distintos a los actuales"""
+        m = metadatos or {}
+        if m.get('quality') != self.config['webp_quality']:
+            return True
+        if m.get('webp_method', 6) != self.config['webp_method']:
+            return True
+        if 'target_width_px' in m:
+            return m['target_width_px'] != self.config['target_width_px']
+        # Páginas antiguas: solo guardan el ancho resultante del pixmap
+        return abs((m.get('width') or 0) - self.config['target_width_px']) > 1
+    
+    def _thumbnail_desactualizado(self, thumbnail: Optional[Dict]) -> bool:
+        if not thumbnail:
+            return True
+        m = thumbnail.get('metadatos') or {}
+        if isinstance(m, (str, bytes)):
+            m = json.loads(m)
+        return m.get('width') != self.config['thumbnail_width']
+    
+    def paginas_desactualizadas(self, catalogo_id: int) -> Dict:
+        """
+        Compara los parámetros guardados en catalogos_docs.metadatos con la configuración actual
+        
+        Returns:
+            Dict: {'paginas': [números de página a re-renderizar], 'thumbnail': bool, 'total': int}
+        """
+        paginas = self.catalogo_manager.obtener_paginas_catalogo(catalogo_id)
+        anchos_variantes = self.catalogo_manager.obtener_anchos_variantes(catalogo_id)
+        variantes_config = set(self._variant_widths())
+        desactualizadas = []
+        for pagina in paginas:
+            metadatos = pagina.get('metadatos')
+            if isinstance(metadatos, (str, bytes)):
+                metadatos = json.loads(metadatos)
+            # También cuenta como desactualizada si le falta alguna variante configurada
+            faltan_variantes = variantes_config - anchos_variantes.get(pagina['numero_pagina'], set())
+            if faltan_variantes or self._pagina_desactualizada(metadatos):
+                desactualizadas.append(pagina['numero_pagina'])
+        return {
+            'paginas': desactualizadas,
+            'thumbnail': self._thumbnail_desactualizado(self.catalogo_manager.obtener_thumbnail(catalogo_id)),
+            'total': len(paginas)
+        }
+    
+    def rerender_catalogo(self, catalogo_id: int, progress: Optional[Dict] = None) -> Dict:
+        """
+        Re-renderiza solo las páginas (y el thumbnail) cuyos parámetros difieren
+        de la configuración actual.
+        
+        El PDF original se descarga de S3 una sola vez. Las imágenes nuevas se
+        suben con keys versionadas (pdf/{id}/v{version}/...) y los registros se
+        sustituyen en una sola transacción: hasta el commit el catálogo sigue
+        sirviendo las imágenes anteriores, que después se eliminan de S3.
+        """
+        if progress is None:
+            progress = {}
+        start_time = time.time()
+        pdf_path = None
+        nuevas_keys = []
+        
+        try:
+            pendientes = self.paginas_desactualizadas(catalogo_id)
+            paginas = set(pendientes['paginas'])
+            if not paginas and not pendientes['thumbnail']:
+                progress.update({"status": "completed", "percentage": 100})
+                return {'success': True, 'catalogo_id': catalogo_id, 'paginas_rerenderizadas': 0,
+                        'message': 'El catálogo ya usa la configuración actual'}
+            
+            pdf_original = self.catalogo_manager.obtener_pdf_original(catalogo_id)
+            if not pdf_original:
+                return {'success': False, 'error': f'El catálogo {catalogo_id} no tiene PDF original'}
+            
+            progress.update({"status": "processing", "catalogo_id": catalogo_id,
+                             "current_file": pdf_original['nombre_archivo'], "start_time": start_time})
+            
+            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+                pdf_path = tmp.name
+            ok, error = self.s3_manager.download_to_path(pdf_original['s3_key'], pdf_path)
+            if not ok:
+                return {'success': False, 'error': error}
+            
+            # El thumbnail se genera a partir de la página 1
+            if pendientes['thumbnail']:
+                paginas.add(1)
+            
+            settings = self._render_settings()
+            render_hashes = {
+                n: render_hash(h, settings) for n, h in page_content_hashes(pdf_path).items()
+            }
+            paginas &= set(render_hashes)
+            version = datetime.now().strftime('%Y%m%d%H%M%S')
+            key_prefix = f"pdf/{catalogo_id}/v{version}"
+            logger.info(f"🔁 Re-renderizando {len(paginas)} páginas del catálogo {catalogo_id} en {key_prefix}")
+            
+            pages_result = self._process_pdf_pages(
+                catalogo_id, pdf_path, pdf_original['nombre_archivo'], progress,
+                paginas_hechas=set(render_hashes) - paginas,
+                render_hashes=render_hashes,
+                key_prefix=key_prefix,
+                registrar_por_lotes=False
+            )
+            if not pages_result['success']:
+                return pages_result
+            docs = pages_result['pending_docs']
+            nuevas_keys = [doc.s3_key for doc in docs]
+            generadas = sum(1 for doc in docs if doc.tipo_archivo == TipoArchivo.PAGINA_WEBP)
+            if generadas < len(paginas):
+                return {'success': False, 'error': f'Solo se generaron {generadas} de {len(paginas)} páginas'}
+            
+            thumbnail_doc = None
+            if pendientes['thumbnail']:
+                thumbnail_result = self._create_thumbnail_s3(
+                    catalogo_id, pages_result['first_page_data'], key_prefix=key_prefix, registrar=False,
+                    thumbnail=pages_result['thumbnail']
+                )
+                if not thumbnail_result['success']:
+                    return {'success': False, 'error': f"Error creando thumbnail: {thumbnail_result['error']}"}
+                thumbnail_doc = thumbnail_result['doc']
+                nuevas_keys.append(thumbnail_doc.s3_key)
+            
+            # Intercambio atómico de registros
+            anteriores = self.catalogo_manager.reemplazar_documentos(
+                catalogo_id, docs, thumbnail_doc,
+                {'configuracion': self.config, 'version_render': version,
+                 'fecha_rerender': datetime.now().isoformat()}
+            )
+            if anteriores is None:
+                return {'success': False, 'error': 'Error sustituyendo las páginas en la base de datos'}
+            nuevas_keys = []
+            
+            # Eliminar de S3 las imágenes anteriores que ya nadie usa
+            en_uso = self.catalogo_manager.s3_keys_compartidas(None, anteriores)
+            obsoletas = [key for key in anteriores if key not in en_uso]
+            eliminadas = self.s3_manager.delete_keys(obsoletas) if obsoletas else 0
+            
+            progress.update({"status": "completed", "percentage": 100})
+            processing_time = time.time() - start_time
+            logger.info(f"✅ Catálogo {catalogo_id} re-renderizado: {generadas} páginas en {processing_time:.2f}s")
+            return {
+                'success': True,
+                'catalogo_id': catalogo_id,
+                'paginas_rerenderizadas': generadas,
+                'thumbnail_regenerado': thumbnail_doc is not None,
+                'version_render': version,
+                'objetos_eliminados': eliminadas,
+                'processing_time': processing_time
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Error re-renderizando catálogo {catalogo_id}: {e}", exc_info=True)
+            return {'success': False, 'error': str(e), 'catalogo_id': catalogo_id}
+        finally:
+            if nuevas_keys:
+                # Falló antes del intercambio: las imágenes nuevas no las usa nadie
+                self.s3_manager.delete_keys(nuevas_keys)
+            if pdf_path:
+                try:
+                    os.unlink(pdf_path)
+                except OSError:
+                    pass
+    
+    def _handle_error(self, catalogo_id: int, error_message: str, progress: Optional[Dict] = None):
         """Maneja errores durante el procesamiento"""
+        if progress is None:
+            progress = self.current_progress
         logger.error(f"❌ Error en catálogo {catalogo_id}: {error_message}")
         
         # Actualizar estado en BD
@@ -502,9 +1024,9 @@ class PDFProcessorS3:
         )
         
         # Actualizar progreso
-        self.current_progress.update({
+        progress.update({
             "status": "error",
-            "errors": self.current_progress.get("errors", []) + [error_message]
+            "errors": progress.get("errors", []) + [error_message]
         })
     
     def delete_catalogo_complete(self, catalogo_id: int) -> Dict:
@@ -524,9 +1046,14 @@ class PDFProcessorS3:
             if not documentos:
                 logger.warning(f"No se encontraron documentos para catálogo {catalogo_id}")
             
-            # 2. Eliminar archivos de S3
+            # 2. Eliminar archivos de S3 (salvo los que comparten otros catálogos por deduplicación)
+            compartidas = self.catalogo_manager.s3_keys_compartidas(
+                catalogo_id, [doc['s3_key'] for doc in documentos]
+            ) if documentos else set()
             s3_errors = []
             for doc in documentos:
+                if doc['s3_key'] in compartidas:
+                    continue
                 try:
                     success = self.s3_manager.delete_file(doc['url_s3'])
                     if not success:
@@ -0,0 +1,341 @@
+"""
+Motor de renderizado de páginas PDF a WEBP
+Reparte rangos de páginas entre un pool acotado de procesos y devuelve
+las páginas codificadas en orden, sin superar un techo de memoria configurable
+"""
+
+import io
+import os
+import re
+import json
+import hashlib
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+# Configuración por defecto (sobrescribible por variables de entorno)
+RENDER_CONFIG = {
+    'workers': int(os.getenv('PDF_RENDER_WORKERS', 2)),
+    # Memoria total que pueden usar los procesos de renderizado
+    'memory_limit_mb': int(os.getenv('PDF_RENDER_MEMORY_MB', 192)),
+    # Estimación de memoria por proceso (PyMuPDF + pixmap + imagen PIL)
+    'worker_memory_mb': int(os.getenv('PDF_RENDER_WORKER_MEMORY_MB', 96)),
+    # Páginas por tarea enviada a un proceso
+    'chunk_size': int(os.getenv('PDF_RENDER_CHUNK_SIZE', 4)),
+}
+
+
+@dataclass
+class RenderSettings:
+    """Parámetros de renderizado de una página"""
+    target_width_px: int = 1200
+    webp_quality: int = 85
+    webp_method: int = 6
+    # Anchos adicionales (variantes responsive) obtenidos reduciendo el mismo pixmap
+    variant_widths: Tuple[int, ...] = ()
+    # Thumbnail de la página 1 (no forma parte de la imagen de la página)
+    thumbnail_width: Optional[int] = None
+    thumbnail_quality: int = 80
+
+
+# Parámetros que no afectan a la imagen de la página ni a sus variantes
+_HASH_EXCLUDED = ('thumbnail_width', 'thumbnail_quality')
+
+
+@dataclass
+class RenderedImage:
+    """Imagen WEBP derivada del pixmap de una página (variante o thumbnail)"""
+    width: int
+    height: int
+    webp_bytes: bytes = b""
+
+
+@dataclass
+class RenderedPage:
+    """Resultado de renderizar una página"""
+    page_number: int
+    webp_bytes: bytes = b""
+    width: int = 0
+    height: int = 0
+    original_width_points: float = 0.0
+    zoom_factor: float = 1.0
+    variants: List[RenderedImage] = field(default_factory=list)
+    thumbnail: Optional[RenderedImage] = None
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+def _resampling_filter():
+    try:
+        return Image.Resampling.LANCZOS
+    except AttributeError:
+        return Image.LANCZOS
+
+
+def _encode_webp(img, width: int, quality: int, method: int) -> RenderedImage:
+    """Reduce la imagen a `width` px de ancho (si es más ancha) y la codifica a WEBP"""
+    # El pixmap puede salir 1 px más ancho por redondeo: no merece un remuestreo
+    if img.width - width > 1:
+        height = max(1, round(img.height * width / img.width))
+        scaled = img.resize((width, height), _resampling_filter())
+    else:
+        scaled = img
+    buffer = io.BytesIO()
+    scaled.save(buffer, "WEBP", quality=quality, method=method)
+    image = RenderedImage(width=scaled.width, height=scaled.height, webp_bytes=buffer.getvalue())
+    if scaled is not img:
+        scaled.close()
+    return image
+
+
+def render_page(doc, page_number: int, settings: RenderSettings) -> RenderedPage:
+    """
+    Renderiza una página (1-indexada) de un documento fitz abierto a WEBP
+
+    La página se rasteriza una sola vez al mayor de los anchos pedidos; la
+    imagen principal, las variantes y el thumbnail se obtienen reduciendo ese pixmap.
+    """
+    try:
+        page = doc.load_page(page_number - 1)  # fitz usa índice 0
+
+        original_width_points = page.rect.width
+        raster_width = max((settings.target_width_px, *settings.variant_widths))
+        if original_width_points == 0:
+            zoom = 1.0
+            raster_zoom = 1.0
+        else:
+            zoom = settings.target_width_px / original_width_points
+            raster_zoom = raster_width / original_width_points
+
+        pix = page.get_pixmap(matrix=fitz.Matrix(raster_zoom, raster_zoom), alpha=False)
+        mode = "RGBA" if pix.alpha else "RGB"
+        img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+        pix = None
+
+        main = _encode_webp(img, settings.target_width_px, settings.webp_quality, settings.webp_method)
+        variants = [
+            _encode_webp(img, width, settings.webp_quality, settings.webp_method)
+            for width in settings.variant_widths
+        ]
+        thumbnail = None
+        if page_number == 1 and settings.thumbnail_width:
+            thumbnail = _encode_webp(img, settings.thumbnail_width, settings.thumbnail_quality, 6)
+        img.close()
+
+        return RenderedPage(
+            page_number=page_number,
+            webp_bytes=main.webp_bytes,
+            width=main.width,
+            height=main.height,
+            original_width_points=original_width_points,
+            zoom_factor=zoom,
+            variants=variants,
+            thumbnail=thumbnail
+        )
+    except Exception as e:
+        return RenderedPage(page_number=page_number, error=str(e))
+
+
+# ==========================================
+# HASHES DE CONTENIDO (DEDUPLICACIÓN)
+# ==========================================
+
+# Prefijo de subset de fuente: seis mayúsculas y '+'
+_SUBSET_PREFIX = re.compile(r'^[A-Z]{6}\+')
+
+
+def page_content_hash(doc, page_number: int) -> str:
+    """
+    Hash de lo que determina el aspecto de una página (1-indexada): tamaño,
+    rotación, content streams, imágenes, XObjects, fuentes y anotaciones.
+    No renderiza; solo lee los objetos crudos del PDF.
+    """
+    page = doc.load_page(page_number - 1)
+    h = hashlib.md5()
+    h.update(repr((tuple(page.rect), page.rotation)).encode())
+    for xref in page.get_contents():
+        h.update(doc.xref_stream_raw(xref) or b"")
+    for img in page.get_images(full=True):
+        h.update(doc.xref_stream_raw(img[0]) or b"")
+    for xobj in page.get_xobjects():
+        h.update(doc.xref_stream_raw(xobj[0]) or b"")
+    for font in page.get_fonts(full=True):
+        # ext, tipo, basefont, nombre; sin el prefijo de subset de basefont
+        # ('ABCDEF+Arial'), que cambia entre exportaciones del mismo documento
+        ext, tipo, basefont, nombre = font[1:5]
+        h.update(repr((ext, tipo, _SUBSET_PREFIX.sub('', basefont or ''), nombre)).encode())
+    for annot in page.annots() or []:
+        h.update(repr((annot.type, tuple(annot.rect), annot.info.get('content'))).encode())
+    return h.hexdigest()
+
+
+def page_content_hashes(pdf_path: str) -> Dict[int, str]:
+    """Hash de contenido de todas las páginas de un PDF (página -> hash)"""
+    with fitz.open(pdf_path) as doc:
+        return {n: page_content_hash(doc, n) for n in range(1, doc.page_count + 1)}
+
+
+def render_hash(content_hash: str, settings: RenderSettings) -> str:
+    """Hash de contenido + parámetros de renderizado: dos páginas con el mismo valor producen el mismo WEBP"""
+    params = {k: v for k, v in asdict(settings).items() if k not in _HASH_EXCLUDED}
+    if not params['variant_widths']:
+        # Sin variantes el hash coincide con el de las páginas registradas antes de existir
+        del params['variant_widths']
+    params = json.dumps(params, sort_keys=True)
+    return hashlib.md5(f"{content_hash}:{params}".encode()).hexdigest()
+
+
+# ==========================================
+# LADO DEL PROCESO DE RENDERIZADO
+# ==========================================
+
+_worker_doc = None
+
+
+def _init_worker(pdf_path: str):
+    """Abre el PDF una sola vez por proceso (PyMuPDF lee el archivo bajo demanda)"""
+    global _worker_doc
+    _worker_doc = fitz.open(pdf_path)
+
+
+def _render_chunk(page_numbers: List[int], settings: RenderSettings) -> List[RenderedPage]:
+    return [render_page(_worker_doc, n, settings) for n in page_numbers]
+
+
+# ==========================================
+# MOTOR
+# ==========================================
+
+class PageRenderEngine:
+    """
+    Renderiza páginas de un PDF en paralelo y las entrega en orden.
+
+    - El número efectivo de procesos es min(workers, CPUs, memory_limit_mb // worker_memory_mb).
+    - Cada proceso abre el PDF desde la ruta del archivo temporal (sin copiar bytes entre procesos).
+    - Como máximo hay 2 tareas en vuelo por proceso, así la memoria de resultados pendientes
+      queda acotada aunque el consumidor (subida a S3) sea más lento.
+    - Los procesos salen de un servidor forkserver (o spawn), nunca de un fork del proceso
+      que llama: este ya tiene hilos (cola de trabajos, subidas a S3, buffer de eventos) y
+      un hijo podría heredar un lock tomado (logging, boto3, pool de conexiones).
+    - Con un solo proceso efectivo, o sin forkserver/spawn, renderiza en el proceso actual.
+    """
+
+    def __init__(self, workers: Optional[int] = None, memory_limit_mb: Optional[int] = None,
+                 worker_memory_mb: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.workers = workers if workers is not None else RENDER_CONFIG['workers']
+        self.memory_limit_mb = memory_limit_mb if memory_limit_mb is not None else RENDER_CONFIG['memory_limit_mb']
+        self.worker_memory_mb = worker_memory_mb if worker_memory_mb is not None else RENDER_CONFIG['worker_memory_mb']
+        self.chunk_size = max(1, chunk_size if chunk_size is not None else RENDER_CONFIG['chunk_size'])
+
+    def effective_workers(self) -> int:
+        """Procesos que se usarán respetando CPUs y techo de memoria"""
+        by_memory = self.memory_limit_mb // max(1, self.worker_memory_mb)
+        return max(1, min(self.workers, os.cpu_count() or 1, by_memory))
+
+    def render(self, pdf_path: str, settings: RenderSettings,
+               page_numbers: Optional[Sequence[int]] = None) -> Iterator[RenderedPage]:
+        """
+        Renderiza las páginas indicadas (todas si page_numbers es None) y las
+        devuelve en orden ascendente de página a medida que están listas.
+        """
+        if page_numbers is None:
+            with fitz.open(pdf_path) as doc:
+                page_numbers = range(1, doc.page_count + 1)
+        page_numbers = sorted(page_numbers)
+        if not page_numbers:
+            return
+
+        workers = self.effective_workers()
+        mp_context = self._mp_context()
+        if workers <= 1 or mp_context is None or len(page_numbers) <= self.chunk_size:
+            yield from self._render_inline(pdf_path, page_numbers, settings)
+            return
+
+        logger.info(f"🧵 Renderizando {len(page_numbers)} páginas con {workers} procesos")
+        chunks = deque(
+            page_numbers[i:i + self.chunk_size]
+            for i in range(0, len(page_numbers), self.chunk_size)
+        )
+        pending = deque()
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(pdf_path,)
+        )
+        try:
+            while chunks and len(pending) < workers * 2:
+                chunk = chunks.popleft()
+                pending.append((chunk, pool.submit(_render_chunk, chunk, settings)))
+
+            while pending:
+                chunk, future = pending.popleft()
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    # Un proceso murió (p. ej. OOM): terminar el resto en este proceso
+                    logger.warning("⚠️ Pool de renderizado caído, continuando en el proceso principal")
+                    remaining = list(chunk)
+                    for pending_chunk, _ in pending:
+                        remaining.extend(pending_chunk)
+                    for rest in chunks:
+                        remaining.extend(rest)
+                    pending.clear()
+                    chunks.clear()
+                    yield from self._render_inline(pdf_path, remaining, settings)
+                    return
+
+                if chunks:
+                    next_chunk = chunks.popleft()
+                    pending.append((next_chunk, pool.submit(_render_chunk, next_chunk, settings)))
+
+                yield from results
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _render_inline(pdf_path: str, page_numbers: Sequence[int],
+                       settings: RenderSettings) -> Iterator[RenderedPage]:
+        with fitz.open(pdf_path) as doc:
+            for page_number in page_numbers:
+                yield render_page(doc, page_number, settings)
+
+    @staticmethod
+    def _mp_context():
+        return _render_context()
+
+
+_mp_context_cache = None
+
+
+def _render_context():
+    """
+    Contexto de multiprocessing para el pool de renderizado.
+
+    forkserver arranca una vez un intérprete limpio (sin hilos) que importa este
+    módulo, y cada proceso de renderizado es un fork de ese servidor: no se
+    reimporta la aplicación por proceso ni se heredan locks de los hilos del
+    worker. Donde no existe se usa spawn.
+    """
+    global _mp_context_cache
+    if _mp_context_cache is None:
+        methods = multiprocessing.get_all_start_methods()
+        if 'forkserver' in methods:
+            _mp_context_cache = multiprocessing.get_context('forkserver')
+            _mp_context_cache.set_forkserver_preload([__name__])
+        elif 'spawn' in methods:
+            _mp_context_cache = multiprocessing.get_context('spawn')
+    return _mp_context_cache
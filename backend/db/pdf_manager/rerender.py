@@ -0,0 +1,101 @@
+"""
+Re-renderizado incremental de catálogos tras cambiar los parámetros de
+renderizado (PDF_TARGET_WIDTH_PX, PDF_WEBP_QUALITY, PDF_THUMBNAIL_WIDTH).
+
+Solo se regeneran las páginas cuyos parámetros guardados en
+catalogos_docs.metadatos difieren de la configuración actual.
+
+Uso (desde backend/):
+    python -m db.pdf_manager.rerender --dry-run          # listar qué cambiaría
+    python -m db.pdf_manager.rerender                    # encolar todos los catálogos afectados
+    python -m db.pdf_manager.rerender --catalogo 12 --catalogo 15
+    python -m db.pdf_manager.rerender --inline           # procesar aquí, sin la cola de trabajos
+"""
+
+import sys
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from .models import EstadoCatalogo
+
+logger = logging.getLogger(__name__)
+
+
+def catalogos_desactualizados(processor, catalogo_ids: Optional[Iterable[int]] = None) -> List[Dict]:
+    """
+    Revisa los catálogos activos (o los indicados) y devuelve los que tienen
+    páginas o thumbnail generados con otros parámetros
+    """
+    manager = processor.catalogo_manager
+    if catalogo_ids is None:
+        catalogos = manager.listar_catalogos(estado=EstadoCatalogo.ACTIVO, limite=100000)
+    else:
+        catalogos = [c for c in (manager.obtener_catalogo(int(i)) for i in catalogo_ids) if c]
+        catalogos = [{'id': c.id, 'nombre': c.nombre} for c in catalogos]
+
+    afectados = []
+    for catalogo in catalogos:
+        pendientes = processor.paginas_desactualizadas(catalogo['id'])
+        if pendientes['paginas'] or pendientes['thumbnail']:
+            afectados.append({
+                'catalogo_id': catalogo['id'],
+                'nombre': catalogo['nombre'],
+                'paginas_desactualizadas': len(pendientes['paginas']),
+                'total_paginas': pendientes['total'],
+                'thumbnail': pendientes['thumbnail']
+            })
+    return afectados
+
+
+def encolar_rerender(job_runner, afectados: List[Dict]) -> List[Dict]:
+    """Crea un trabajo de re-renderizado por catálogo afectado"""
+    for catalogo in afectados:
+        catalogo['job_id'] = job_runner.enqueue_rerender(catalogo['catalogo_id'], catalogo['nombre'])
+    return afectados
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Re-renderizado incremental de catálogos PDF')
+    parser.add_argument('--catalogo', type=int, action='append', help='ID de catálogo (repetible)')
+    parser.add_argument('--dry-run', action='store_true', help='Solo listar las páginas desactualizadas')
+    parser.add_argument('--inline', action='store_true',
+                        help='Procesar en este proceso, uno a uno, en lugar de encolar trabajos')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from .pdf_processor_s3 import PDFProcessorS3
+    processor = PDFProcessorS3()
+
+    afectados = catalogos_desactualizados(processor, args.catalogo)
+    print(f"📋 {len(afectados)} catálogos con páginas desactualizadas")
+    for catalogo in afectados:
+        print(f"  - {catalogo['catalogo_id']} {catalogo['nombre']}: "
+              f"{catalogo['paginas_desactualizadas']}/{catalogo['total_paginas']} páginas"
+              f"{' + thumbnail' if catalogo['thumbnail'] else ''}")
+
+    if args.dry_run or not afectados:
+        return 0
+
+    if args.inline:
+        errores = 0
+        for catalogo in afectados:
+            result = processor.rerender_catalogo(catalogo['catalogo_id'])
+            if not result['success']:
+                errores += 1
+                print(f"❌ Catálogo {catalogo['catalogo_id']}: {result['error']}")
+        return 1 if errores else 0
+
+    # Solo se crean los trabajos: los procesan los workers de la aplicación
+    # con su límite de concurrencia
+    from .jobs import PDFJobManager
+    job_manager = PDFJobManager()
+    for catalogo in afectados:
+        job_id = job_manager.crear_job_rerender(catalogo['catalogo_id'], catalogo['nombre'])
+        print(f"✅ Catálogo {catalogo['catalogo_id']} encolado (trabajo {job_id})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,10 +8,15 @@ import logging
 from flask import Blueprint, request, jsonify, send_file, redirect, render_template, url_for
 from werkzeug.utils import secure_filename
 from datetime import datetime
+import hashlib
 import requests
 
 from .pdf_processor_s3 import PDFProcessorS3
-from .models import CatalogoManager, EstadoCatalogo, TipoArchivo
+from .models import CatalogoManager, EstadoCatalogo, TipoArchivo, catalogos_cache
+from .jobs import PDFJobRunner, EstadoJob
+from .rerender import catalogos_desactualizados, encolar_rerender
+from .catalog_index import catalogo_index
+from utils.upload_utils import asset_urls
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -30,12 +35,47 @@ pdf_manager_s3_bp = Blueprint(
 # Instancia global del procesador
 processor = PDFProcessorS3()
 catalogo_manager = CatalogoManager()
+# Cola de trabajos: los uploads se procesan en segundo plano
+job_runner = PDFJobRunner(processor)
+
+
+@pdf_manager_s3_bp.before_app_request
+def _start_job_runner():
+    """Arranca la cola en este worker si el hook post_worker_init no lo hizo (solo PDF_JOB_RUNNER=thread)"""
+    job_runner.ensure_started()
+
+
+def _con_urls(filas, campos=(('s3_key', 'url_s3'),)):
+    """
+    Copia de las filas con la URL final de cada archivo (pública, firmada o de
+    CDN según utils.upload_utils.AssetURLService), resuelta en un solo lote.
+    campos: pares (columna con la key de S3, columna donde va la URL)
+    En modo public se conserva la URL guardada y solo se calculan las que faltan.
+    """
+    guardadas = asset_urls.uses_stored_urls()
+    urls = asset_urls.urls_for_keys(
+        fila.get(campo_key) for fila in filas for campo_key, campo_url in campos
+        if not (guardadas and fila.get(campo_url))
+    )
+    resultado = []
+    for fila in filas:
+        fila = dict(fila)
+        for campo_key, campo_url in campos:
+            if fila.get(campo_key) and not (guardadas and fila.get(campo_url)):
+                fila[campo_url] = urls.get(fila[campo_key], fila.get(campo_url))
+        resultado.append(fila)
+    return resultado
+
+
+_CAMPOS_URL_CATALOGO = (('pdf_s3_key', 'pdf_url'), ('thumbnail_s3_key', 'thumbnail_url'))
 
 
 @pdf_manager_s3_bp.route('/upload', methods=['POST'])
 def upload_pdf():
     """
-    Endpoint para subir y procesar un PDF completo
+    Endpoint para subir un PDF y encolar su procesamiento
+    
+    Responde 202 con el ID del trabajo; el avance se consulta en /jobs/<job_id>
     
     Form data:
     - file: Archivo PDF
@@ -80,23 +120,31 @@ def upload_pdf():
         # Sanitizar nombre de archivo
         filename = secure_filename(file.filename)
         
-        logger.info(f"📤 Iniciando procesamiento de PDF: {filename}")
-        
-        # Procesar PDF completo
-        result = processor.process_pdf_complete(
-            pdf_file_data=file,
+        # Encolar procesamiento (el archivo se guarda en disco y la petición termina)
+        job_id = job_runner.enqueue(
+            file,
             filename=filename,
             descripcion=descripcion,
             categoria=categoria,
             usuario_id=usuario_id
         )
         
-        if result['success']:
-            logger.info(f"✅ PDF procesado exitosamente: {result['catalogo_id']}")
-            return jsonify(result), 200
-        else:
-            logger.error(f"❌ Error procesando PDF: {result['error']}")
-            return jsonify(result), 500
+        if not job_id:
+            logger.error(f"❌ Error encolando PDF: {filename}")
+            return jsonify({
+                'success': False,
+                'error': 'Error registrando el trabajo de procesamiento'
+            }), 500
+        
+        logger.info(f"📤 PDF encolado para procesamiento: {filename} (trabajo {job_id})")
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'estado': EstadoJob.PENDIENTE.value,
+            'nombre': os.path.splitext(filename)[0],
+            'status_url': url_for('pdf_manager_s3.get_job', job_id=job_id),
+            'message': 'PDF recibido, procesamiento en cola'
+        }), 202
             
     except Exception as e:
         error_msg = f"Error inesperado en upload: {str(e)}"
@@ -107,11 +155,76 @@ def upload_pdf():
         }), 500
 
 
+@pdf_manager_s3_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Estado, progreso y resultado de un trabajo de procesamiento"""
+    try:
+        job = job_runner.get_job(job_id)
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Trabajo no encontrado'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'job': job
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@pdf_manager_s3_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Lista los trabajos de procesamiento más recientes"""
+    try:
+        estado = request.args.get('estado')
+        limite = min(int(request.args.get('limite', 50)), 200)
+        
+        estado_enum = None
+        if estado:
+            try:
+                estado_enum = EstadoJob(estado)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'error': f'Estado inválido: {estado}'
+                }), 400
+        
+        jobs = job_runner.manager.listar_jobs(estado_enum, limite)
+        return jsonify({
+            'success': True,
+            'jobs': jobs,
+            'total': len(jobs)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @pdf_manager_s3_bp.route('/progress', methods=['GET'])
 def get_progress():
-    """Obtiene el progreso del procesamiento actual"""
+    """
+    Obtiene el progreso de un trabajo (?job_id=) o, sin parámetro, del
+    trabajo en curso más reciente
+    """
     try:
-        progress = processor.get_progress()
+        job_id = request.args.get('job_id', type=int)
+        if job_id is None:
+            en_curso = job_runner.manager.listar_jobs(EstadoJob.PROCESANDO, 1)
+            job_id = en_curso[0]['id'] if en_curso else None
+        
+        job = job_runner.get_job(job_id) if job_id else None
+        progress = (job.get('progreso') or {}) if job else processor.get_progress()
+        if job:
+            progress = dict(progress, job_id=job['id'], job_estado=job['estado'])
         return jsonify({
             'success': True,
             'progress': progress
@@ -171,7 +284,7 @@ def list_catalogos():
         
         return jsonify({
             'success': True,
-            'catalogos': catalogos,
+            'catalogos': _con_urls(catalogos, _CAMPOS_URL_CATALOGO),
             'total': len(catalogos),
             'limite': limite,
             'offset': offset,
@@ -188,9 +301,14 @@ def list_catalogos():
 
 @pdf_manager_s3_bp.route('/catalogos/<int:catalogo_id>', methods=['GET'])
 def get_catalogo(catalogo_id):
-    """Obtiene información completa de un catálogo específico"""
+    """
+    Obtiene información completa de un catálogo específico
+    
+    Responde con ETag; si el cliente envía If-None-Match con el mismo valor
+    (catálogo sin cambios) se devuelve 304 sin cuerpo
+    """
     try:
-        catalogo_info = processor.get_catalogo_info(catalogo_id)
+        catalogo_info, etag = catalogo_manager.obtener_catalogo_completo_etag(catalogo_id)
         
         if not catalogo_info:
             return jsonify({
@@ -198,10 +316,25 @@ def get_catalogo(catalogo_id):
                 'error': f'Catálogo {catalogo_id} no encontrado'
             }), 404
         
-        return jsonify({
+        archivos = catalogo_info['archivos']
+        documentos = _con_urls(
+            [doc for doc in (archivos['pdf_original'], archivos['thumbnail']) if doc] + archivos['paginas']
+        )
+        pdf_original = documentos.pop(0) if archivos['pdf_original'] else None
+        thumbnail = documentos.pop(0) if archivos['thumbnail'] else None
+        catalogo_info = dict(catalogo_info, archivos=dict(
+            archivos, pdf_original=pdf_original, thumbnail=thumbnail, paginas=documentos
+        ))
+        
+        response = jsonify({
             'success': True,
             'catalogo': catalogo_info
-        }), 200
+        })
+        # Las URLs firmadas cambian con el tiempo: forman parte de la versión
+        response.set_etag(hashlib.md5(f"{etag}:{asset_urls.version()}".encode()).hexdigest())
+        # El navegador puede guardar la respuesta pero debe revalidarla con If-None-Match
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
         
     except Exception as e:
         logger.error(f"Error obteniendo catálogo {catalogo_id}: {str(e)}", exc_info=True)
@@ -213,9 +346,24 @@ def get_catalogo(catalogo_id):
 
 @pdf_manager_s3_bp.route('/catalogos/<int:catalogo_id>/paginas', methods=['GET'])
 def get_paginas_catalogo(catalogo_id):
-    """Obtiene todas las páginas de un catálogo"""
+    """
+    Obtiene todas las páginas de un catálogo
+    
+    Con ?width=N devuelve, para cada página, la imagen más pequeña de al menos
+    N píxeles de ancho entre la página y sus variantes (o la mayor disponible)
+    """
     try:
-        paginas = catalogo_manager.obtener_paginas_catalogo(catalogo_id)
+        width = request.args.get('width', type=int)
+        if 'width' in request.args and (width is None or width <= 0):
+            return jsonify({
+                'success': False,
+                'error': 'El parámetro width debe ser un entero positivo'
+            }), 400
+        
+        if width:
+            paginas = catalogo_manager.obtener_paginas_por_ancho(catalogo_id, width)
+        else:
+            paginas = catalogo_manager.obtener_paginas_catalogo(catalogo_id)
         
         if not paginas:
             return jsonify({
@@ -226,8 +374,9 @@ def get_paginas_catalogo(catalogo_id):
         return jsonify({
             'success': True,
             'catalogo_id': catalogo_id,
+            'width': width,
             'total_paginas': len(paginas),
-            'paginas': paginas
+            'paginas': _con_urls(paginas)
         }), 200
         
     except Exception as e:
@@ -253,7 +402,7 @@ def get_pdf_original(catalogo_id):
         return jsonify({
             'success': True,
             'catalogo_id': catalogo_id,
-            'pdf_url': pdf_info['url_s3'],
+            'pdf_url': asset_urls.url_for(pdf_info['s3_key'], pdf_info['url_s3']),
             'nombre_archivo': pdf_info['nombre_archivo'],
             'tamaño_archivo': pdf_info['tamaño_archivo'],
             'fecha_creacion': pdf_info['fecha_creacion']
@@ -282,7 +431,7 @@ def get_thumbnail(catalogo_id):
         return jsonify({
             'success': True,
             'catalogo_id': catalogo_id,
-            'thumbnail_url': thumbnail_info['url_s3'],
+            'thumbnail_url': asset_urls.url_for(thumbnail_info['s3_key'], thumbnail_info['url_s3']),
             'tamaño_archivo': thumbnail_info['tamaño_archivo'],
             'metadatos': thumbnail_info['metadatos']
         }), 200
@@ -372,6 +521,79 @@ def update_estado_catalogo(catalogo_id):
         }), 500
 
 
+@pdf_manager_s3_bp.route('/catalogos/<int:catalogo_id>/rerender', methods=['POST'])
+def rerender_catalogo(catalogo_id):
+    """
+    Encola el re-renderizado incremental de un catálogo con la configuración actual
+    
+    Query params:
+    - dry_run: true para solo consultar qué páginas se regenerarían
+    """
+    try:
+        catalogo = catalogo_manager.obtener_catalogo(catalogo_id)
+        if not catalogo:
+            return jsonify({
+                'success': False,
+                'error': 'Catálogo no encontrado'
+            }), 404
+        
+        pendientes = processor.paginas_desactualizadas(catalogo_id)
+        if request.args.get('dry_run', 'false').lower() == 'true' or not (pendientes['paginas'] or pendientes['thumbnail']):
+            return jsonify({
+                'success': True,
+                'catalogo_id': catalogo_id,
+                'paginas_desactualizadas': pendientes['paginas'],
+                'thumbnail_desactualizado': pendientes['thumbnail']
+            }), 200
+        
+        job_id = job_runner.enqueue_rerender(catalogo_id, catalogo.nombre)
+        return jsonify({
+            'success': True,
+            'catalogo_id': catalogo_id,
+            'job_id': job_id,
+            'paginas_desactualizadas': pendientes['paginas'],
+            'thumbnail_desactualizado': pendientes['thumbnail'],
+            'status_url': url_for('pdf_manager_s3.get_job', job_id=job_id)
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@pdf_manager_s3_bp.route('/rerender', methods=['POST'])
+def rerender_catalogos():
+    """
+    Encola el re-renderizado de todos los catálogos activos (o los indicados)
+    que tengan páginas generadas con otros parámetros
+    
+    JSON body (opcional):
+    - catalogo_ids: lista de IDs
+    - dry_run: true para solo listar los catálogos afectados
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        afectados = catalogos_desactualizados(processor, data.get('catalogo_ids'))
+        
+        if not data.get('dry_run'):
+            encolar_rerender(job_runner, afectados)
+        
+        return jsonify({
+            'success': True,
+            'catalogos': afectados,
+            'total': len(afectados),
+            'dry_run': bool(data.get('dry_run'))
+        }), 202 if afectados and not data.get('dry_run') else 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @pdf_manager_s3_bp.route('/estadisticas', methods=['GET'])
 def get_estadisticas():
     """Obtiene estadísticas generales del sistema"""
@@ -418,16 +640,20 @@ def health_check():
         # Verificar conexión a BD
         estadisticas = catalogo_manager.obtener_estadisticas_catalogos()
         
-        # Verificar estado del procesador
-        progress = processor.get_progress()
+        # Verificar estado de la cola de procesamiento
+        en_curso = job_runner.manager.listar_jobs(EstadoJob.PROCESANDO, 1)
+        pendientes = job_runner.manager.listar_jobs(EstadoJob.PENDIENTE, 200)
         
         return jsonify({
             'success': True,
             'status': 'healthy',
             'timestamp': datetime.now().isoformat(),
             'database_connected': bool(estadisticas),
-            'processor_status': progress.get('status', 'unknown'),
-            'total_catalogos': estadisticas.get('total_catalogos', 0)
+            'processor_status': 'processing' if en_curso else 'idle',
+            'jobs_pendientes': len(pendientes),
+            'total_catalogos': estadisticas.get('total_catalogos', 0),
+            'indice_catalogos': catalogo_index.stats(),
+            'cache_catalogos': catalogos_cache.stats()
         }), 200
         
     except Exception as e:
@@ -702,7 +928,13 @@ def upload_page_route():
                 
                 const result = await response.json();
                 
-                if (result.success) {
+                if (!result.success) {
+                    showMessage(`Error: ${result.error}`, 'error');
+                    return;
+                }
+                
+                const job = await waitForJob(result.status_url);
+                if (job.estado === 'completado') {
                     showMessage(`¡Catálogo "${result.nombre}" procesado exitosamente!`, 'success');
                     uploadForm.reset();
                     fileName.textContent = '';
@@ -710,7 +942,7 @@ def upload_page_route():
                         window.history.back();
                     }, 2000);
                 } else {
-                    showMessage(`Error: ${result.error}`, 'error');
+                    showMessage(`Error: ${job.error || 'Error procesando el PDF'}`, 'error');
                 }
             } catch (error) {
                 showMessage(`Error de conexión: ${error.message}`, 'error');
@@ -720,6 +952,30 @@ def upload_page_route():
             }
         });
 
+        // Consulta el trabajo hasta que termine, actualizando la barra de progreso
+        async function waitForJob(statusUrl) {
+            while (true) {
+                const response = await fetch(statusUrl);
+                const data = await response.json();
+                if (!data.success) {
+                    throw new Error(data.error);
+                }
+                const job = data.job;
+                const info = job.progreso || {};
+                if (job.estado === 'completado' || job.estado === 'error') {
+                    return job;
+                }
+                if (job.estado === 'pendiente') {
+                    progressText.textContent = 'PDF en cola para procesamiento...';
+                } else if (info.total_pages) {
+                    const percent = info.percentage || 0;
+                    progressFill.style.width = percent + '%';
+                    progressText.textContent = `Procesando página ${info.current_page} de ${info.total_pages} (${percent}%)`;
+                }
+                await new Promise(resolve => setTimeout(resolve, 2000));
+            }
+        }
+
         function showMessage(text, type) {
             message.textContent = text;
             message.className = `message ${type}`;
@@ -831,7 +1087,7 @@ def listar_pdfs_procesados_api():
         
         # Procesar cada catálogo para el formato de compatibilidad
         processed_catalogs = []
-        for catalogo in catalogos:
+        for catalogo in _con_urls(catalogos, _CAMPOS_URL_CATALOGO):
             # Construir la información básica del catálogo
             catalog_info = {
                 'name': catalogo.get('nombre', ''),
@@ -898,30 +1154,17 @@ def delete_pdf_legacy():
         
         pdf_name = data['pdf_name']
         
-        # Buscar catálogo por nombre
-        catalogos = catalogo_manager.buscar_catalogos(pdf_name)
-        
-        if not catalogos:
-            return jsonify({
-                'success': False,
-                'error': f'Catálogo "{pdf_name}" no encontrado'
-            }), 404
-        
-        # Tomar el primer resultado que coincida exactamente
-        catalogo_encontrado = None
-        for cat in catalogos:
-            if cat['nombre'] == pdf_name:
-                catalogo_encontrado = cat
-                break
+        # Buscar catálogo por nombre exacto
+        catalogo_id = catalogo_index.catalogo_id(pdf_name)
         
-        if not catalogo_encontrado:
+        if not catalogo_id:
             return jsonify({
                 'success': False,
                 'error': f'Catálogo "{pdf_name}" no encontrado'
             }), 404
         
         # Eliminar usando el sistema S3
-        result = processor.delete_catalogo_complete(catalogo_encontrado['id'])
+        result = processor.delete_catalogo_complete(catalogo_id)
         
         if result['success']:
             return jsonify({
@@ -964,7 +1207,7 @@ def serve_processed_pdf_files_legacy(filepath):
             if 'amazonaws.com/' in filepath:
                 s3_key = filepath.split('amazonaws.com/', 1)[1]
                 logger.info(f"🔗 Extrayendo S3 key de URL completa: {s3_key}")
-                return redirect(filepath)
+                return redirect(asset_urls.url_for_key(s3_key))
             else:
                 logger.warning(f"⚠️ URL S3 malformada: {filepath}")
                 return serve_fallback_image("unknown")
@@ -982,33 +1225,19 @@ def serve_processed_pdf_files_legacy(filepath):
                         numero_pagina = int(archivo_nombre.replace('page_', '').replace('.webp', ''))
                         logger.info(f"🔍 Buscando página {numero_pagina} del catálogo '{catalogo_nombre}'")
                         
-                        # Buscar catálogo por nombre
-                        catalogos = catalogo_manager.buscar_catalogos(catalogo_nombre)
+                        # Nombre y página se resuelven en el índice en memoria
+                        catalogo_id = catalogo_index.catalogo_id(catalogo_nombre)
                         
-                        if catalogos:
-                            # Buscar coincidencia exacta
-                            catalogo_encontrado = None
-                            for cat in catalogos:
-                                if cat['nombre'] == catalogo_nombre:
-                                    catalogo_encontrado = cat
-                                    break
+                        if catalogo_id:
+                            pagina = catalogo_index.pagina(catalogo_id, numero_pagina)
+                            if pagina:
+                                s3_url = asset_urls.url_for(pagina['s3_key'], pagina['url_s3'])
+                                logger.info(f"✅ Página encontrada, redirigiendo a: {s3_url}")
+                                return redirect(s3_url)
                             
-                            if catalogo_encontrado:
-                                catalogo_id = catalogo_encontrado['id']
-                                
-                                # Obtener páginas del catálogo
-                                paginas = catalogo_manager.obtener_paginas_catalogo(catalogo_id)
-                                
-                                # Buscar la página específica
-                                for pagina in paginas:
-                                    if pagina['numero_pagina'] == numero_pagina:
-                                        s3_url = pagina['url_s3']
-                                        logger.info(f"✅ Página encontrada, redirigiendo a: {s3_url}")
-                                        return redirect(s3_url)
-                                
-                                logger.warning(f"⚠️ Página {numero_pagina} no encontrada para catálogo '{catalogo_nombre}'")
-                            else:
-                                logger.warning(f"⚠️ Catálogo '{catalogo_nombre}' no encontrado")
+                            logger.warning(f"⚠️ Página {numero_pagina} no encontrada para catálogo '{catalogo_nombre}'")
+                        else:
+                            logger.warning(f"⚠️ Catálogo '{catalogo_nombre}' no encontrado")
                     except ValueError:
                         logger.warning(f"⚠️ No se pudo extraer número de página de: {archivo_nombre}")
         
@@ -1016,12 +1245,12 @@ def serve_processed_pdf_files_legacy(filepath):
         doc = catalogo_manager.obtener_documento_por_s3_key(filepath)
         
         if doc and doc.get('url_s3'):
-            s3_url = doc['url_s3']
+            s3_url = asset_urls.url_for(doc.get('s3_key'), doc['url_s3'])
             logger.info(f"✅ Archivo encontrado en BD: {s3_url}")
             return redirect(s3_url)
         
         # Si no se encuentra en BD, construir URL directa de S3
-        s3_url = f"https://redkossodo.s3.us-east-2.amazonaws.com/{filepath}"
+        s3_url = asset_urls.url_for_key(filepath)
         logger.info(f"🔄 Intentando URL directa S3: {s3_url}")
         
         # Validar que la URL parece correcta antes de redirigir
@@ -1166,31 +1395,24 @@ def get_paginas_catalogo_por_nombre(nombre):
     try:
         logger.info(f"📖 Buscando páginas para catálogo: {nombre}")
         
-        # Buscar catálogo por nombre exacto
-        catalogos = catalogo_manager.buscar_catalogos(nombre)
+        # Buscar catálogo por nombre exacto (índice en memoria)
+        catalogo_id = catalogo_index.catalogo_id(nombre)
+        nombre_encontrado = nombre
         
-        if not catalogos:
-            return jsonify({
-                'success': False,
-                'error': f'Catálogo "{nombre}" no encontrado'
-            }), 404
-        
-        # Buscar coincidencia exacta
-        catalogo_encontrado = None
-        for cat in catalogos:
-            if cat['nombre'] == nombre:
-                catalogo_encontrado = cat
-                break
-        
-        if not catalogo_encontrado:
-            # Si no hay coincidencia exacta, usar el primero
-            catalogo_encontrado = catalogos[0]
-            logger.warning(f"⚠️ No se encontró coincidencia exacta para '{nombre}', usando: {catalogo_encontrado['nombre']}")
-        
-        catalogo_id = catalogo_encontrado['id']
+        if not catalogo_id:
+            # Sin coincidencia exacta: búsqueda parcial en BD, usar el primero
+            catalogos = catalogo_manager.buscar_catalogos(nombre)
+            if not catalogos:
+                return jsonify({
+                    'success': False,
+                    'error': f'Catálogo "{nombre}" no encontrado'
+                }), 404
+            catalogo_id = catalogos[0]['id']
+            nombre_encontrado = catalogos[0]['nombre']
+            logger.warning(f"⚠️ No se encontró coincidencia exacta para '{nombre}', usando: {nombre_encontrado}")
         
         # Obtener páginas del catálogo
-        paginas = catalogo_manager.obtener_paginas_catalogo(catalogo_id)
+        paginas = [pagina for _, pagina in sorted(catalogo_index.paginas(catalogo_id).items())]
         
         if not paginas:
             return jsonify({
@@ -1198,12 +1420,12 @@ def get_paginas_catalogo_por_nombre(nombre):
                 'error': f'No se encontraron páginas para el catálogo "{nombre}"'
             }), 404
         
-        # Formatear respuesta con URLs directas de S3
+        # Formatear respuesta con las URLs finales (S3, firmadas o CDN)
         paginas_formateadas = []
-        for pagina in paginas:
+        for pagina in _con_urls(paginas):
             paginas_formateadas.append({
                 'numero_pagina': pagina['numero_pagina'],
-                'url': pagina['url_s3'],  # URL directa de S3
+                'url': pagina['url_s3'],  # URL final, sin pasar por /processed_files
                 's3_key': pagina['s3_key'],
                 'tamaño': pagina['tamaño_archivo']
             })
@@ -1213,7 +1435,7 @@ def get_paginas_catalogo_por_nombre(nombre):
         return jsonify({
             'success': True,
             'catalogo_id': catalogo_id,
-            'nombre': catalogo_encontrado['nombre'],
+            'nombre': nombre_encontrado,
             'total_paginas': len(paginas_formateadas),
             'paginas': paginas_formateadas
         }), 200
@@ -0,0 +1,214 @@
+"""
+Pipeline productor/consumidor para subir páginas renderizadas a S3
+El renderizado encola buffers WEBP en una cola acotada y un pool de hilos
+los sube en paralelo, con reintentos y métricas por etapa
+"""
+
+import io
+import os
+import time
+import random
+import logging
+import threading
+import queue
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+UPLOAD_PIPELINE_CONFIG = {
+    'workers': int(os.getenv('PDF_UPLOAD_WORKERS', 4)),
+    # Páginas que pueden esperar en cola antes de frenar al renderizado
+    'queue_size': int(os.getenv('PDF_UPLOAD_QUEUE_SIZE', 8)),
+    'max_retries': int(os.getenv('PDF_UPLOAD_MAX_RETRIES', 3)),
+    'backoff_base': float(os.getenv('PDF_UPLOAD_BACKOFF_BASE', 0.5)),
+}
+
+_SENTINEL = object()
+
+
+@dataclass
+class UploadTask:
+    """Archivo a subir con la key S3 de destino"""
+    s3_key: str
+    data: bytes
+    # Datos del llamador que viajan con la tarea (p. ej. metadatos de la página)
+    payload: Any = None
+
+
+@dataclass
+class UploadResult:
+    """Resultado de subir una tarea"""
+    s3_key: str
+    success: bool
+    url: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    size_bytes: int = 0
+    payload: Any = None
+    # Valor devuelto por el callback on_uploaded (p. ej. ID del registro en BD)
+    extra: Any = None
+
+
+@dataclass
+class _StageStats:
+    items: int = 0
+    bytes: int = 0
+    busy_seconds: float = 0.0
+
+
+@dataclass
+class _PipelineStats:
+    uploaded: _StageStats = field(default_factory=_StageStats)
+    failed: int = 0
+    retries: int = 0
+    producer_wait_seconds: float = 0.0
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+
+class S3UploadPipeline:
+    """
+    Sube archivos a S3 con varios hilos que comparten el mismo cliente boto3.
+
+    - put() bloquea cuando la cola está llena (backpressure sobre el productor).
+    - Cada subida se reintenta hasta max_retries veces con backoff exponencial y jitter.
+    - on_uploaded(result) se ejecuta en el hilo que subió el archivo; su valor
+      de retorno se guarda en result.extra.
+
+    Uso:
+        with S3UploadPipeline(s3_manager) as pipeline:
+            pipeline.put(UploadTask(key, data))
+        resultados = pipeline.results
+    """
+
+    def __init__(self, s3_manager, workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 max_retries: Optional[int] = None, backoff_base: Optional[float] = None,
+                 on_uploaded: Optional[Callable[[UploadResult], Any]] = None):
+        self.s3_manager = s3_manager
+        self.workers = max(1, workers if workers is not None else UPLOAD_PIPELINE_CONFIG['workers'])
+        self.queue_size = max(1, queue_size if queue_size is not None else UPLOAD_PIPELINE_CONFIG['queue_size'])
+        self.max_retries = max(0, max_retries if max_retries is not None else UPLOAD_PIPELINE_CONFIG['max_retries'])
+        self.backoff_base = backoff_base if backoff_base is not None else UPLOAD_PIPELINE_CONFIG['backoff_base']
+        self.on_uploaded = on_uploaded
+
+        self.results: List[UploadResult] = []
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._stats = _PipelineStats()
+        self._closed = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        self._stats.started_at = time.monotonic()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"s3-upload-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, task: UploadTask):
+        """Encola una tarea; bloquea mientras la cola esté llena"""
+        if self._closed:
+            raise RuntimeError("El pipeline de subida ya está cerrado")
+        started = time.monotonic()
+        self._queue.put(task)
+        waited = time.monotonic() - started
+        with self._lock:
+            self._stats.producer_wait_seconds += waited
+
+    def close(self) -> List[UploadResult]:
+        """Espera a que terminen todas las subidas y devuelve los resultados"""
+        if not self._closed:
+            self._closed = True
+            for _ in self._threads:
+                self._queue.put(_SENTINEL)
+            for thread in self._threads:
+                thread.join()
+            self._stats.finished_at = time.monotonic()
+        return self.results
+
+    def stats(self) -> Dict:
+        """Métricas de la etapa de subida"""
+        with self._lock:
+            s = self._stats
+            end = s.finished_at or time.monotonic()
+            wall = max(end - s.started_at, 1e-9) if s.started_at else 0.0
+            return {
+                'workers': self.workers,
+                'uploaded': s.uploaded.items,
+                'failed': s.failed,
+                'retries': s.retries,
+                'bytes_uploaded': s.uploaded.bytes,
+                'wall_seconds': round(wall, 3),
+                'upload_busy_seconds': round(s.uploaded.busy_seconds, 3),
+                'producer_wait_seconds': round(s.producer_wait_seconds, 3),
+                'items_per_second': round(s.uploaded.items / wall, 2) if wall else 0.0,
+                'mb_per_second': round(s.uploaded.bytes / (1024 * 1024) / wall, 3) if wall else 0.0,
+            }
+
+    # ------------------------------------------------------------------
+
+    def _worker(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is _SENTINEL:
+                    return
+                result = self._upload_with_retry(task)
+                if result.success and self.on_uploaded:
+                    try:
+                        result.extra = self.on_uploaded(result)
+                    except Exception as e:
+                        logger.error(f"Error en callback tras subir {task.s3_key}: {e}", exc_info=True)
+                with self._lock:
+                    self.results.append(result)
+            finally:
+                self._queue.task_done()
+
+    def _upload_with_retry(self, task: UploadTask) -> UploadResult:
+        size = len(task.data)
+        error_msg = None
+        for attempt in range(1, self.max_retries + 2):
+            started = time.monotonic()
+            success, url, error_msg = self.s3_manager.upload_file_with_custom_key(
+                io.BytesIO(task.data),
+                task.s3_key
+            )
+            elapsed = time.monotonic() - started
+
+            if success:
+                with self._lock:
+                    self._stats.uploaded.items += 1
+                    self._stats.uploaded.bytes += size
+                    self._stats.uploaded.busy_seconds += elapsed
+                # Liberar el buffer en cuanto ya está en S3
+                task.data = b""
+                return UploadResult(
+                    s3_key=task.s3_key, success=True, url=url, attempts=attempt,
+                    size_bytes=size, payload=task.payload
+                )
+
+            if attempt <= self.max_retries:
+                delay = self.backoff_base * (2 ** (attempt - 1))
+                delay += random.uniform(0, delay / 2)
+                logger.warning(f"⚠️ Reintentando subida de {task.s3_key} en {delay:.2f}s "
+                               f"(intento {attempt}/{self.max_retries + 1}): {error_msg}")
+                with self._lock:
+                    self._stats.retries += 1
+                time.sleep(delay)
+
+        with self._lock:
+            self._stats.failed += 1
+        task.data = b""
+        return UploadResult(
+            s3_key=task.s3_key, success=False, error=error_msg,
+            attempts=self.max_retries + 1, size_bytes=size, payload=task.payload
+        )
@@ -1,6 +1,15 @@
 # Configuración de Gunicorn optimizada para procesamiento de PDFs
 import multiprocessing
 import os
+import subprocess
+import sys
+
+# La cola de PDFs corre en un proceso propio, hijo del master (db/pdf_manager/job_worker.py):
+# el timeout y el reciclado por max_requests del worker web no interrumpen los trabajos.
+# Se fija antes de cargar la app (preload_app) para que el worker web solo encole.
+os.environ.setdefault('PDF_JOB_RUNNER', 'process')
+JOB_PROCESS_STOP_TIMEOUT = 60  # segundos para devolver a la cola los trabajos en curso al apagar
+_job_process = None
 
 # Configuración del servidor
 port = os.getenv('PORT', '8000')
@@ -8,8 +17,10 @@ bind = f"0.0.0.0:{port}"
 workers = 1  # Reducir workers para evitar problemas de memoria en Render
 worker_class = "sync"
 
-# Configuración de timeouts (CRÍTICO para PDFs grandes)
-timeout = 300  # 5 minutos para requests normales
+# Configuración de timeouts
+# Los PDFs se procesan en segundo plano (db/pdf_manager/jobs.py); la petición
+# de upload solo recibe el archivo
+timeout = 300  # 5 minutos (subidas grandes con conexiones lentas)
 keepalive = 5
 max_requests = 100  # Reiniciar worker después de 100 requests para liberar memoria
 max_requests_jitter = 10
@@ -28,21 +39,62 @@ access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"
 if os.getenv('RENDER'):
     # En Render, usar configuración más conservadora
     workers = 1
-    timeout = 600  # 10 minutos para PDFs grandes
     worker_memory_limit = 400 * 1024 * 1024  # 400MB en Render
     
+def _start_job_process(server):
+    """Lanza (o relanza si terminó) el proceso de la cola de PDFs"""
+    global _job_process
+    if os.environ.get('PDF_JOB_RUNNER') != 'process':
+        return
+    if _job_process is not None:
+        if _job_process.poll() is None:
+            return
+        server.log.warning("PDF job process exited (code %s), restarting", _job_process.returncode)
+    _job_process = subprocess.Popen(
+        [sys.executable, '-m', 'db.pdf_manager.job_worker'],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    server.log.info("PDF job process started (pid: %s)", _job_process.pid)
+
 # Configuración de señales
 def when_ready(server):
     server.log.info("Gunicorn server is ready. Listening on: %s", server.address)
+    _start_job_process(server)
 
 def worker_int(worker):
     worker.log.info("Worker received INT or QUIT signal")
 
 def pre_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
+    # Cada (re)creación de worker sirve de vigilancia del proceso de la cola
+    _start_job_process(server)
 
 def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
+
+def post_worker_init(worker):
+    # Solo con PDF_JOB_RUNNER=thread la cola corre en el worker (si no, no hace nada);
+    # con preload_app los hilos creados en el master no existen en el worker
+    from db.pdf_manager.routes_s3 import job_runner
+    job_runner.ensure_started()
+    # Índice nombre -> catálogo de las rutas legacy de archivos (flipbook)
+    from db.pdf_manager.catalog_index import catalogo_index
+    catalogo_index.calentar()
     
+def worker_exit(server, worker):
+    # Volcar contadores y auditoría acumulados antes de que el worker se recicle (max_requests)
+    from db.event_sink import event_sink
+    event_sink.shutdown()
+
+def on_exit(server):
+    # Apagado: SIGTERM para que la cola devuelva sus trabajos en curso a 'pendiente'
+    if _job_process is not None and _job_process.poll() is None:
+        _job_process.terminate()
+        try:
+            _job_process.wait(JOB_PROCESS_STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            server.log.warning("PDF job process did not stop in %ss, killing it", JOB_PROCESS_STOP_TIMEOUT)
+            _job_process.kill()
+
 def worker_abort(worker):
     worker.log.info("Worker received SIGABRT signal") 
\ No newline at end of file
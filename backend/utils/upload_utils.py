@@ -1,13 +1,22 @@
 import os
+import time
 import pathlib
-from typing import Optional, Tuple
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import quote
 import logging
 from enum import Enum
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 
 logger = logging.getLogger(__name__)
 
+# Región del bucket (us-east-2 como en CatalogoManager.generar_url_s3)
+S3_REGION = os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION') or 'us-east-2'
+
 class UploadType(Enum):
     """Tipos de upload permitidos"""
     POSTS = "posts"
@@ -70,7 +79,13 @@ class S3UploadManager:
     def __init__(self):
         """Inicializar cliente S3"""
         try:
-            self.s3_client = boto3.client('s3')
+            # Un único cliente (thread-safe) compartido por los hilos de subida:
+            # el pool HTTP debe admitir tantas conexiones como hilos concurrentes
+            self.s3_client = boto3.client('s3', region_name=S3_REGION, config=Config(
+                max_pool_connections=int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 16)),
+                retries={'max_attempts': 3, 'mode': 'standard'},
+                tcp_keepalive=True
+            ))
             self.bucket_name = os.environ.get('S3_BUCKET')
             
             if not self.bucket_name:
@@ -152,7 +167,7 @@ class S3UploadManager:
             )
             
             # Generar URL pública
-            url = f"https://{self.bucket_name}.s3.{os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')}.amazonaws.com/{s3_key}"
+            url = self.public_url(s3_key)
             
             logger.info(f"Archivo subido exitosamente a S3: {s3_key}")
             return True, url, None
@@ -189,7 +204,7 @@ class S3UploadManager:
             )
             
             # Generar URL pública
-            url = f"https://{self.bucket_name}.s3.{os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')}.amazonaws.com/{s3_key}"
+            url = self.public_url(s3_key)
             
             logger.info(f"Archivo subido exitosamente a S3 con key personalizado: {s3_key}")
             return True, url, None
@@ -201,6 +216,48 @@ class S3UploadManager:
             logger.error(f"Error inesperado subiendo archivo: {str(e)}")
             return False, None, f"Error inesperado: {str(e)}"
 
+    def upload_path_with_custom_key(self, file_path: str, s3_key: str) -> Tuple[bool, Optional[str], Optional[str]]:
+        """
+        Sube un archivo local a S3 leyéndolo desde disco por partes (multipart
+        a partir de S3_MULTIPART_THRESHOLD_MB), sin cargarlo completo en memoria
+        
+        Args:
+            file_path: Ruta del archivo local
+            s3_key: Key S3 completo (incluyendo estructura de carpetas)
+            
+        Returns:
+            Tuple[bool, Optional[str], Optional[str]]: (success, url, error_message)
+        """
+        try:
+            chunk_bytes = int(os.environ.get('S3_MULTIPART_CHUNK_MB', 8)) * 1024 * 1024
+            transfer_config = TransferConfig(
+                multipart_threshold=int(os.environ.get('S3_MULTIPART_THRESHOLD_MB', 16)) * 1024 * 1024,
+                multipart_chunksize=chunk_bytes,
+                max_concurrency=int(os.environ.get('S3_MULTIPART_CONCURRENCY', 4))
+            )
+            self.s3_client.upload_file(
+                file_path,
+                self.bucket_name,
+                s3_key,
+                ExtraArgs={
+                    'ContentType': self._get_content_type(s3_key),
+                    'CacheControl': 'max-age=31536000'  # Cache por 1 año
+                },
+                Config=transfer_config
+            )
+            
+            url = self.public_url(s3_key)
+            
+            logger.info(f"Archivo local subido exitosamente a S3: {s3_key}")
+            return True, url, None
+            
+        except ClientError as e:
+            logger.error(f"Error subiendo archivo a S3: {str(e)}")
+            return False, None, f"Error subiendo archivo: {str(e)}"
+        except Exception as e:
+            logger.error(f"Error inesperado subiendo archivo: {str(e)}")
+            return False, None, f"Error inesperado: {str(e)}"
+
     def delete_file(self, file_url: str) -> bool:
         """
         Elimina un archivo de S3 basado en su URL
@@ -231,12 +288,60 @@ class S3UploadManager:
             logger.error(f"Error inesperado eliminando archivo: {str(e)}")
             return False
 
+    def download_to_path(self, s3_key: str, file_path: str) -> Tuple[bool, Optional[str]]:
+        """
+        Descarga un objeto de S3 a un archivo local por partes (sin cargarlo en memoria)
+        
+        Returns:
+            Tuple[bool, Optional[str]]: (success, error_message)
+        """
+        try:
+            self.s3_client.download_file(self.bucket_name, s3_key, file_path)
+            return True, None
+        except ClientError as e:
+            logger.error(f"Error descargando {s3_key} de S3: {str(e)}")
+            return False, f"Error descargando archivo: {str(e)}"
+        except Exception as e:
+            logger.error(f"Error inesperado descargando {s3_key}: {str(e)}")
+            return False, f"Error inesperado: {str(e)}"
+
+    def delete_keys(self, s3_keys) -> int:
+        """
+        Elimina varios objetos de S3 por key (DeleteObjects, hasta 1000 por llamada)
+        
+        Returns:
+            int: Objetos eliminados
+        """
+        s3_keys = list(s3_keys)
+        eliminados = 0
+        for i in range(0, len(s3_keys), 1000):
+            lote = s3_keys[i:i + 1000]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in lote], 'Quiet': True}
+                )
+                errores = response.get('Errors', [])
+                for error in errores:
+                    logger.error(f"Error eliminando {error.get('Key')} de S3: {error.get('Message')}")
+                eliminados += len(lote) - len(errores)
+            except ClientError as e:
+                logger.error(f"Error eliminando lote de archivos de S3: {str(e)}")
+        return eliminados
+
+    def public_url(self, s3_key: str) -> str:
+        """URL pública del objeto, con la región del cliente de S3 (la del bucket configurado)"""
+        region = self.s3_client.meta.region_name or S3_REGION
+        return f"https://{self.bucket_name}.s3.{region}.amazonaws.com/{s3_key}"
+
     def _extract_s3_key_from_url(self, url: str) -> Optional[str]:
         """Extrae la key S3 de una URL"""
         try:
-            # URL formato: https://bucket.s3.region.amazonaws.com/key
-            if f"{self.bucket_name}.s3." in url:
-                return url.split(f"{self.bucket_name}.s3.{os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')}.amazonaws.com/")[1]
+            # URL formato: https://bucket.s3.region.amazonaws.com/key (cualquier región:
+            # las URLs guardadas antes pueden llevar otra)
+            prefijo = f"{self.bucket_name}.s3."
+            if prefijo in url:
+                return url.split(prefijo, 1)[1].split(".amazonaws.com/", 1)[1]
             return None
         except:
             return None
@@ -286,6 +391,139 @@ class S3UploadManager:
 # Instancia global del manager
 upload_manager = S3UploadManager()
 
+
+# Cómo se entregan al navegador las URLs de los archivos de S3
+ASSET_URL_CONFIG = {
+    # public: URL directa del bucket | presigned: URL firmada con caducidad | cdn: ASSET_CDN_BASE_URL + key
+    'mode': os.environ.get('ASSET_URL_MODE', 'public'),
+    'cdn_base_url': os.environ.get('ASSET_CDN_BASE_URL', ''),
+    'presigned_ttl': int(os.environ.get('ASSET_PRESIGNED_TTL', 3600)),
+    'cache_size': int(os.environ.get('ASSET_URL_CACHE_SIZE', 20000)),
+}
+
+
+class AssetURLService:
+    """
+    Genera la URL final (la que usa el navegador) de un objeto de S3 a partir de su key.
+
+    - public: https://{bucket}.s3.{region}.amazonaws.com/{key}
+    - cdn: {cdn_base_url}/{key}
+    - presigned: URL firmada (cálculo local, sin llamada a S3). Las firmas se
+      agrupan en ventanas de presigned_ttl/2 segundos: dentro de una ventana la
+      misma key devuelve la misma URL (cacheable por el navegador) y cualquier
+      URL entregada sigue siendo válida al menos presigned_ttl/2 segundos.
+
+    Las URLs se cachean por key (LRU acotado); urls_for_keys() resuelve un lote
+    de una vez para las respuestas con muchas páginas.
+    """
+
+    MODES = ('public', 'presigned', 'cdn')
+
+    def __init__(self, s3_manager: S3UploadManager, mode: Optional[str] = None,
+                 cdn_base_url: Optional[str] = None, presigned_ttl: Optional[int] = None,
+                 cache_size: Optional[int] = None):
+        self.s3_manager = s3_manager
+        self.mode = (mode or ASSET_URL_CONFIG['mode']).lower()
+        self.cdn_base_url = (cdn_base_url if cdn_base_url is not None else ASSET_URL_CONFIG['cdn_base_url']).rstrip('/')
+        self.presigned_ttl = max(60, presigned_ttl or ASSET_URL_CONFIG['presigned_ttl'])
+        self.cache_size = max(1, cache_size or ASSET_URL_CONFIG['cache_size'])
+
+        if self.mode not in self.MODES:
+            logger.warning(f"ASSET_URL_MODE desconocido '{self.mode}', se usa 'public'")
+            self.mode = 'public'
+        if self.mode == 'cdn' and not self.cdn_base_url:
+            logger.warning("ASSET_URL_MODE=cdn sin ASSET_CDN_BASE_URL, se usa 'public'")
+            self.mode = 'public'
+
+        self._cache = OrderedDict()
+        self._window = None
+        self._lock = threading.Lock()
+
+    def version(self) -> str:
+        """Cambia cuando cambian las URLs generadas (sirve para componer ETags)"""
+        if self.mode == 'presigned':
+            return f"presigned:{self._current_window()}"
+        return f"{self.mode}:{self.cdn_base_url}"
+
+    def uses_stored_urls(self) -> bool:
+        """En modo public la URL guardada en BD al subir el archivo ya es la URL final"""
+        return self.mode == 'public'
+
+    def url_for_key(self, s3_key: Optional[str]) -> Optional[str]:
+        if not s3_key:
+            return None
+        return self.urls_for_keys([s3_key]).get(s3_key)
+
+    def urls_for_keys(self, s3_keys: Iterable[str]) -> Dict[str, str]:
+        """URLs de un lote de keys (las ya calculadas salen de la caché)"""
+        keys = [k for k in dict.fromkeys(s3_keys) if k]
+        urls = {}
+        faltan = []
+        with self._lock:
+            self._check_window()
+            for key in keys:
+                url = self._cache.get(key)
+                if url is None:
+                    faltan.append(key)
+                else:
+                    self._cache.move_to_end(key)
+                    urls[key] = url
+
+        if faltan:
+            nuevas = {key: self._build_url(key) for key in faltan}
+            with self._lock:
+                for key, url in nuevas.items():
+                    if url:
+                        self._cache[key] = url
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            urls.update({k: u for k, u in nuevas.items() if u})
+        return urls
+
+    def url_for(self, s3_key: Optional[str] = None, stored_url: Optional[str] = None) -> Optional[str]:
+        """
+        URL final a partir de la key o de la URL guardada en BD
+        (en modo public, la guardada tiene prioridad)
+        """
+        if stored_url and self.uses_stored_urls():
+            return stored_url
+        if not s3_key and stored_url:
+            s3_key = self.s3_manager._extract_s3_key_from_url(stored_url)
+            if not s3_key:
+                return stored_url
+        return self.url_for_key(s3_key)
+
+    def _build_url(self, s3_key: str) -> Optional[str]:
+        if self.mode == 'cdn':
+            return f"{self.cdn_base_url}/{quote(s3_key)}"
+        if self.mode == 'presigned':
+            try:
+                return self.s3_manager.s3_client.generate_presigned_url(
+                    'get_object',
+                    Params={'Bucket': self.s3_manager.bucket_name, 'Key': s3_key},
+                    ExpiresIn=self.presigned_ttl
+                )
+            except (ClientError, NoCredentialsError) as e:
+                logger.error(f"Error firmando URL de {s3_key}: {str(e)}")
+                return None
+        return self.s3_manager.public_url(s3_key)
+
+    def _current_window(self) -> int:
+        return int(time.time() // (self.presigned_ttl // 2))
+
+    def _check_window(self):
+        """Al cambiar de ventana las firmas cacheadas se descartan. Requiere tener el lock"""
+        if self.mode != 'presigned':
+            return
+        window = self._current_window()
+        if window != self._window:
+            self._window = window
+            self._cache.clear()
+
+
+# Instancia global del servicio de URLs
+asset_urls = AssetURLService(upload_manager)
+
 # Mantener compatibilidad con código existente
 class UploadManager:
     """Clase de compatibilidad que redirige al S3UploadManager"""
@@ -324,7 +562,7 @@ class UploadManager:
     def get_relative_path(cls, upload_type: UploadType, filename: str) -> str:
         """Método legacy - devuelve URL de S3"""
         safe_filename = upload_manager.sanitize_filename(filename)
-        return f"https://{upload_manager.bucket_name}.s3.{os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')}.amazonaws.com/{upload_type.value}/{safe_filename}"
+        return upload_manager.public_url(f"{upload_type.value}/{safe_filename}")
 
     @classmethod
     def cleanup_temp_files(cls, max_age_hours: int = 24) -> int:
@@ -85,14 +85,21 @@ export default function AdvancedSearchBar({
   const searchRef = useRef<HTMLFormElement>(null);
   const inputRef = useRef<HTMLInputElement>(null);
   const timeoutRef = useRef<NodeJS.Timeout | null>(null);
+  // Petición de sugerencias en curso: una nueva consulta cancela la anterior
+  const suggestionsAbortRef = useRef<AbortController | null>(null);
 
   // Función para obtener sugerencias del backend
   const fetchSuggestions = useCallback(async (query: string) => {
+    suggestionsAbortRef.current?.abort();
+
     if (query.length < 2) {
       setSuggestions({ suggestions: [], categories: [], tags: [] });
       return;
     }
 
+    const controller = new AbortController();
+    suggestionsAbortRef.current = controller;
+
     try {
       setIsLoading(true);
       const response = await fetch(
@@ -100,7 +107,8 @@ export default function AdvancedSearchBar({
         {
           headers: {
             'Authorization': `Bearer ${localStorage.getItem('token')}`
-          }
+          },
+          signal: controller.signal
         }
       );
 
@@ -109,9 +117,14 @@ export default function AdvancedSearchBar({
         setSuggestions(data.data);
       }
     } catch (error) {
-      console.error('Error obteniendo sugerencias:', error);
+      // Cancelada por una consulta más reciente: su respuesta ya no interesa
+      if ((error as Error).name !== 'AbortError') {
+        console.error('Error obteniendo sugerencias:', error);
+      }
     } finally {
-      setIsLoading(false);
+      if (suggestionsAbortRef.current === controller) {
+        setIsLoading(false);
+      }
     }
   }, []);
 
@@ -165,12 +178,13 @@ export default function AdvancedSearchBar({
     return () => document.removeEventListener('mousedown', handleClickOutside);
   }, []);
 
-  // Limpiar timeout al desmontar
+  // Limpiar timeout y petición pendiente al desmontar
   useEffect(() => {
     return () => {
       if (timeoutRef.current) {
         clearTimeout(timeoutRef.current);
       }
+      suggestionsAbortRef.current?.abort();
     };
   }, []);
 
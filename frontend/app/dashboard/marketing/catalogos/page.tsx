@@ -6,6 +6,11 @@ import { useCatalogosPermissions } from '@/lib/permissions';
 // Define la URL base de tu backend Flask usando la variable de entorno
 const BACKEND_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || 'http://localhost:8000'; 
 
+// El backend ya entrega URLs finales (S3, firmadas o CDN); las rutas relativas
+// antiguas se siguen resolviendo a través de /processed_files
+const assetUrl = (path: string) =>
+  /^https?:\/\//.test(path) ? path : `${BACKEND_BASE_URL}/api/pdfs/processed_files/${path}`;
+
 // Interfaz para el objeto catálogo como lo devuelve la API del backend
 interface CatalogoFromAPI {
   name: string; // Nombre del catálogo (directorio y base del nombre del PDF)
@@ -208,7 +213,7 @@ export default function Catalogos() {
         return;
     }
     // La ruta es NombreCatalogo/NombreCatalogo.pdf
-    const downloadUrl = `${BACKEND_BASE_URL}/api/pdfs/processed_files/${catalogo.original_pdf_path_relative}`;
+    const downloadUrl = assetUrl(catalogo.original_pdf_path_relative);
     console.log("Intentando descargar desde:", downloadUrl);
 
     try {
@@ -417,7 +422,7 @@ export default function Catalogos() {
                 <div className="w-[120px] h-[170px] border border-gray-300 rounded-md overflow-hidden bg-gray-100 flex items-center justify-center mx-auto md:mx-0">
                   {catalogo.thumbnail_path_relative ? (
                     <img
-                      src={`${BACKEND_BASE_URL}/api/pdfs/processed_files/${catalogo.thumbnail_path_relative}`}
+                      src={assetUrl(catalogo.thumbnail_path_relative)}
                       alt={formatearNombreCatalogo(catalogo.name)}
                       className="w-full h-full object-cover"
                       onError={(e) => {
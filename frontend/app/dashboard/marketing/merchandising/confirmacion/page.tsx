@@ -19,6 +19,7 @@ const PRODUCTOS_MAPPING = {
 export default function ConfirmacionesSolicitudes() {
   // Estados
   const [solicitudes, setSolicitudes] = useState<any[]>([]);
+  const [siguienteCursor, setSiguienteCursor] = useState<string | null>(null);
   const [modalConfirmacionVisible, setModalConfirmacionVisible] = useState(false);
   const [modalAgregarProductoVisible, setModalAgregarProductoVisible] = useState(false);
   const [modalCancelarVisible, setModalCancelarVisible] = useState(false);
@@ -57,23 +58,27 @@ export default function ConfirmacionesSolicitudes() {
     cargarSolicitudesPendientes();
   }, []);
   
-  // Función para cargar solicitudes pendientes
-  const cargarSolicitudesPendientes = async () => {
+  // Función para cargar solicitudes pendientes (con cursor, añade la página siguiente)
+  const cargarSolicitudesPendientes = async (cursor: string | null = null) => {
     setCargando(true);
     setMensaje(null);
     try {
       const apiBaseUrl = process.env.NEXT_PUBLIC_API_BASE_URL || '';
       // Por defecto, pedimos las pendientes. Ajusta si necesitas otro status inicial.
-      const response = await fetch(`${apiBaseUrl}/api/marketing/solicitudes?status=pending`);
+      const params = new URLSearchParams({ status: 'pending' });
+      if (cursor) params.append('cursor', cursor);
+      const response = await fetch(`${apiBaseUrl}/api/marketing/solicitudes?${params.toString()}`);
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({message: `Error ${response.status}`}));
         throw new Error(errorData.error || errorData.message || `Error ${response.status} al cargar solicitudes.`);
       }
       const data = await response.json();
-      setSolicitudes(data || []); // Asegurar que sea un array
+      const registros = data.records || []; // Asegurar que sea un array
+      setSolicitudes(prev => (cursor ? [...prev, ...registros] : registros));
+      setSiguienteCursor(data.has_more ? data.next_cursor : null);
     } catch (error: any) {
       console.error("Error al cargar solicitudes pendientes:", error);
-      setSolicitudes([]);
+      if (!cursor) setSolicitudes([]);
       setMensaje({ tipo: 'error', texto: error.message || 'No se pudo cargar la lista de solicitudes.' });
     } finally {
       setCargando(false);
@@ -353,6 +358,18 @@ export default function ConfirmacionesSolicitudes() {
               </tbody>
             </table>
           </div>
+
+          {siguienteCursor && (
+            <div className="flex justify-center mb-6">
+              <button
+                onClick={() => cargarSolicitudesPendientes(siguienteCursor)}
+                disabled={cargando}
+                className="px-4 py-2 text-sm font-medium text-[#2e3954] bg-white border border-[#2e3954] rounded-md hover:bg-gray-50 disabled:opacity-50"
+              >
+                Cargar más solicitudes
+              </button>
+            </div>
+          )}
           
           {/* Mensajes de error o éxito Globales (fuera de modales) */}
           {mensaje && !modalConfirmacionVisible && !modalAgregarProductoVisible && !modalCancelarVisible && (
@@ -22,6 +22,10 @@ export default function HistorialConfirmaciones() {
   const [registrosPorPagina] = useState<number>(10); // O hacerlo configurable
   const [totalPaginas, setTotalPaginas] = useState<number>(0);
   const [totalRegistros, setTotalRegistros] = useState<number>(0);
+  // cursores[i] es el cursor de la página i + 1 (la primera no lleva cursor)
+  const [cursores, setCursores] = useState<(string | null)[]>([null]);
+  // Páginas que el servidor resuelve por número (sin cursor); más allá solo se avanza por cursor
+  const [paginasPorNumero, setPaginasPorNumero] = useState<number>(1);
   
   // Efecto para cargar datos al montar el componente y cuando cambie la página
   useEffect(() => {
@@ -34,7 +38,12 @@ export default function HistorialConfirmaciones() {
     setMensaje(null);
     try {
       const apiBaseUrl = process.env.NEXT_PUBLIC_API_BASE_URL || '';
-      const response = await fetch(`${apiBaseUrl}/api/marketing/confirmaciones?page=${pagina}&limit=${registrosPorPagina}`);
+      // Con cursor conocido se continúa desde él; si no, se pide la página por número
+      const params = new URLSearchParams({ limit: String(registrosPorPagina) });
+      const cursor = cursores[pagina - 1];
+      if (cursor) params.append('cursor', cursor);
+      else params.append('page', String(pagina));
+      const response = await fetch(`${apiBaseUrl}/api/marketing/confirmaciones?${params.toString()}`);
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({message: `Error ${response.status}`}));
         throw new Error(errorData.error || errorData.message || `Error ${response.status} al cargar historial.`);
@@ -43,7 +52,15 @@ export default function HistorialConfirmaciones() {
       setConfirmaciones(data.records || []);
       setTotalPaginas(data.total_pages || 0);
       setTotalRegistros(data.total_records || 0);
-      setPaginaActual(data.page || 1); // Asegurar que la página actual se sincronice con la respuesta
+      setPaginasPorNumero(data.max_offset_page || 1);
+      if (data.has_more && data.next_cursor) {
+        const cursorSiguiente: string = data.next_cursor;
+        setCursores(prev => {
+          const actualizados = prev.slice(0, pagina);
+          actualizados[pagina] = cursorSiguiente;
+          return actualizados;
+        });
+      }
 
     } catch (err: any) {
       console.error('Error cargando historial de confirmaciones:', err);
@@ -118,9 +135,11 @@ export default function HistorialConfirmaciones() {
     }
   };
 
-  // Funciones para la paginación
+  // Funciones para la paginación (páginas cercanas por número; las siguientes, por cursor desde la última visitada)
+  const paginasAccesibles = Math.min(totalPaginas, Math.max(cursores.length, paginasPorNumero));
+
   const cambiarPagina = (nuevaPagina: number) => {
-    if (nuevaPagina >= 1 && nuevaPagina <= totalPaginas) {
+    if (nuevaPagina >= 1 && nuevaPagina <= paginasAccesibles) {
       setPaginaActual(nuevaPagina);
     }
   };
@@ -129,12 +148,12 @@ export default function HistorialConfirmaciones() {
     const numeros = [];
     const maxBotonesVisibles = 5; // Número máximo de botones de página a mostrar (ej. 1, 2, ..., 5, 6)
     let inicio = Math.max(1, paginaActual - Math.floor(maxBotonesVisibles / 2));
-    let fin = Math.min(totalPaginas, inicio + maxBotonesVisibles - 1);
+    let fin = Math.min(paginasAccesibles, inicio + maxBotonesVisibles - 1);
 
-    if (totalPaginas > maxBotonesVisibles) {
-        if (fin === totalPaginas) {
-            inicio = Math.max(1, totalPaginas - maxBotonesVisibles + 1);
-        } else if (inicio === 1 && fin < totalPaginas) {
+    if (paginasAccesibles > maxBotonesVisibles) {
+        if (fin === paginasAccesibles) {
+            inicio = Math.max(1, paginasAccesibles - maxBotonesVisibles + 1);
+        } else if (inicio === 1 && fin < paginasAccesibles) {
             fin = maxBotonesVisibles;
         }
     }
@@ -168,17 +187,17 @@ export default function HistorialConfirmaciones() {
       );
     }
 
-    if (fin < totalPaginas) {
-      if (fin < totalPaginas - 1) {
+    if (fin < paginasAccesibles) {
+      if (fin < paginasAccesibles - 1) {
         numeros.push(<span key="puntos-fin" className="px-3 py-1 mx-1">...</span>);
       }
       numeros.push(
         <button
           key="fin"
-          onClick={() => cambiarPagina(totalPaginas)}
+          onClick={() => cambiarPagina(paginasAccesibles)}
           className="px-3 py-1 mx-1 border rounded hover:bg-gray-100 transition-colors"
         >
-          {totalPaginas}
+          {paginasAccesibles}
         </button>
       );
     }
@@ -261,7 +280,7 @@ export default function HistorialConfirmaciones() {
                 {renderizarNumerosDePagina()}
                 <button
                   onClick={() => cambiarPagina(paginaActual + 1)}
-                  disabled={paginaActual === totalPaginas}
+                  disabled={paginaActual >= paginasAccesibles}
                   className="px-3 py-1 mx-1 border rounded hover:bg-gray-100 disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
                 >
                   Siguiente